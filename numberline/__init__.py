@@ -1,15 +1,73 @@
+import sys
+import importlib
 import numberline.oracles
 from numberline.grid import Grid
 from numberline.registry import Register
 from numberline.controllers import *
 from numberline.constants import *
-from numberline.discrete import Discrete
 from numberline.ai import zoom_solution
 from numberline.utils import nearest_obj, euc_distance, get_unaligned_items, get_rows_and_cols, get_row_and_col_counts
+from numberline.utils import get_coord_array, count_rows_and_cols, count_coords, get_majority_row, get_unaligned_mask, get_nearest_idx
 
-from gym.envs.registration import register
+"""
+The core engine above only depends on numpy. Everything else, including
+the gym spaces, is imported on first access so that `import numberline`
+stays cheap for short lived worker processes. See
+`tests/import_benchmark.py`.
+"""
 
-register(
-    id='numberline-v0',
-    entry_point='numberline.envs:NumberLine',
-)
+ENV_ID = "numberline-v0"
+
+# The names that are imported from their modules on first access
+_LAZY = {
+    "Discrete": "numberline.discrete",
+    "BatchDiscrete": "numberline.discrete",
+    "FrameBuffer": "numberline.framestack",
+    "FrameStack": "numberline.framestack",
+    "lookahead": "numberline.batch",
+    "step_states": "numberline.batch",
+    "render_states": "numberline.batch",
+    "get_action_masks": "numberline.batch",
+    "TransitionTable": "numberline.tables",
+    "compile_table": "numberline.tables",
+    "ObservationAtlas": "numberline.atlas",
+    "TrajectoryRecorder": "numberline.recorder",
+    "Shard": "numberline.recorder",
+    "list_shards": "numberline.recorder",
+    "ReplayBuffer": "numberline.replay",
+    "decode_frames": "numberline.decoder",
+    "decode_states": "numberline.decoder",
+    "numberline_stream": "numberline.stream",
+    "NumberLine": "numberline.envs",
+}
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(
+            "module 'numberline' has no attribute '{}'".format(name)
+        )
+    attr = getattr(importlib.import_module(_LAZY[name]), name)
+    globals()[name] = attr
+    # gym may have been imported since numberline was
+    if sys.modules.get("gym") is not None: register_envs()
+    return attr
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
+def register_envs():
+    """
+    Registers the numberline envs with gym. Called when numberline is
+    imported after gym, by gym itself through the "gym.envs" entry
+    point of the installed package, and on the first access of a lazily
+    imported name or the import of `numberline.envs` once gym is
+    imported.
+    """
+    from gym.envs.registration import register, registry
+    if ENV_ID in registry: return
+    register(
+        id=ENV_ID,
+        entry_point='numberline.envs:NumberLine',
+    )
+
+if sys.modules.get("gym") is not None: register_envs()
@@ -0,0 +1,179 @@
+import os
+import numpy as np
+from numberline.constants import *
+from numberline.registry import STATE_DTYPE
+from numberline.tables import TransitionTable, compile_table
+from numberline.utils import get_operand
+import numberline.batch as batch
+
+"""
+A persistent atlas of the frames of a bounded game configuration. The
+frame of every reachable register state of every task is rendered once
+into a memory mapped .npy file. Controllers with an atlas return
+read-only slices of the memory map as their observations instead of
+drawing the grid, and every process that opens the same atlas shares
+its pages through the page cache.
+
+An atlas directory holds the transition table of the configuration
+(see `TransitionTable.save`), the tasks and the frames with shape
+(n_tasks, n_states, H, W). A task is an (operator, operand) pair,
+which determines the meta units of the frame.
+"""
+
+# The layout used to store the tasks of an atlas
+TASK_DTYPE = np.dtype([
+    ("operator", np.int8),
+    ("operand", np.float64),
+])
+
+def get_tasks(contr):
+    """
+    Enumerates the (operator, operand) pairs that the argued
+    controller can sample at reset with integer initial and target
+    values.
+
+    Args:
+      contr: Controller
+    Returns:
+      tasks: ndarray (T,) of dtype TASK_DTYPE
+    """
+    tasks = set()
+    for init_val in range(contr.init_range[0], contr.init_range[1]+1):
+        for targ_val in range(contr.targ_range[0], contr.targ_range[1]+1):
+            for operator in contr.operators:
+                operator, operand = get_operand(
+                    operator,
+                    init_val,
+                    targ_val
+                )
+                tasks.add((OPERATOR2IDX[operator], operand))
+    return np.asarray(sorted(tasks), dtype=TASK_DTYPE)
+
+class ObservationAtlas:
+    def __init__(self, frames, tasks, table: TransitionTable):
+        """
+        Args:
+          frames: ndarray (n_tasks, n_states, H, W)
+            usually a read-only memory map
+          tasks: ndarray (n_tasks,) of dtype TASK_DTYPE
+          table: TransitionTable
+            the table whose state indices index the frames
+        """
+        self.frames = frames
+        self.tasks = tasks
+        self.table = table
+        self.task2idx = {
+            (IDX2OPERATOR[op], operand): i
+            for i,(op, operand) in enumerate(tasks.tolist())
+        }
+
+    @property
+    def nbytes(self):
+        return self.frames.nbytes
+
+    def get_frame(self, register):
+        """
+        Returns the frame of the current state of the argued register
+        as a view into the atlas.
+
+        Args:
+          register: Register
+        Returns:
+          frame: ndarray (H, W) or None
+            None if the state or the task is not in the atlas
+        """
+        task_idx = self.task2idx.get((register.operator, register.operand))
+        if task_idx is None: return None
+        # States beyond the range of the table's records, e.g. at deep
+        # zooms, are never in the atlas
+        if not register.in_record_range(): return None
+        fill, zoom, trans, _, _ = register.get_record()
+        key = self.table.key_space.get_key(fill, zoom, trans)
+        if key < 0: return None
+        idx = self.table.key2idx[key]
+        if idx < 0: return None
+        return self.frames[task_idx, idx]
+
+    def get_frames(self, task_idxs, states):
+        """
+        Returns the frames of the argued states. This is a gather and
+        therefore a copy.
+
+        Args:
+          task_idxs: ndarray (N,) of ints
+            the index of the task of each state within `self.tasks`
+          states: ndarray (N,) of dtype STATE_DTYPE
+            the states must be in the table
+        Returns:
+          frames: ndarray (N, H, W)
+        """
+        idxs = self.table.get_indices(states)
+        assert np.all(idxs >= 0), "states must be in the atlas"
+        return self.frames[task_idxs, idxs]
+
+    @staticmethod
+    def build(directory,
+              contr,
+              fill_range: tuple or None=None,
+              dtype=np.float64,
+              batch_size: int=4096):
+        """
+        Renders every frame of the argued controller's configuration
+        into an atlas directory and opens it.
+
+        Args:
+          directory: str
+            created if it does not exist
+          contr: Controller
+            must have a zoom_range and a scroll_range. See
+            `compile_table`
+          fill_range: tuple of inclusive ints | None
+            see `compile_table`
+          dtype: numpy dtype
+            the dtype of the stored frames. float64 reproduces the grid
+            exactly, float32 halves the size of the atlas.
+          batch_size: int
+            the number of frames rendered at once
+        Returns:
+          atlas: ObservationAtlas
+        """
+        table = compile_table(contr, fill_range=fill_range)
+        table.save(directory)
+        tasks = get_tasks(contr)
+        np.save(os.path.join(directory, "tasks.npy"), tasks)
+        shape = contr.grid.raw_shape
+        frames = np.lib.format.open_memmap(
+            os.path.join(directory, "frames.npy"),
+            mode="w+",
+            dtype=dtype,
+            shape=(len(tasks), table.n_states, *shape),
+        )
+        states = np.asarray(table.states).copy()
+        for i,task in enumerate(tasks):
+            states["operator"] = task["operator"]
+            states["operand"] = task["operand"]
+            for start in range(0, table.n_states, batch_size):
+                chunk = states[start:start+batch_size]
+                frames[i, start:start+len(chunk)] = batch.render_states(
+                    chunk,
+                    contr.density
+                )
+        frames.flush()
+        del frames
+        return ObservationAtlas.load(directory)
+
+    @staticmethod
+    def load(directory):
+        """
+        Opens an atlas built with `build`. The frames are memory mapped
+        read-only.
+
+        Args:
+          directory: str
+        Returns:
+          atlas: ObservationAtlas
+        """
+        table = TransitionTable.load(directory)
+        tasks = np.load(os.path.join(directory, "tasks.npy"))
+        frames = np.load(os.path.join(directory, "frames.npy"), mmap_mode="r")
+        return ObservationAtlas(frames, tasks, table)
@@ -0,0 +1,378 @@
+import numpy as np
+from numberline.constants import *
+from numberline.grid import Grid
+from numberline.registry import STATE_DTYPE, to_fixed
+
+"""
+Vectorized counterparts of the register arithmetic and of the register
+drawing. These functions operate on numpy arrays of register states
+with dtype `STATE_DTYPE` (see `Register.get_record`) so that many
+states can be advanced or rendered in a single call without creating
+any Register, Grid or Controller objects.
+
+The fill of the states is an int64 count of units valued 10**FILL_EXP
+so all of the fill arithmetic is exact. Zooms finer than FILL_EXP and
+translations beyond the int64 range are not supported, nor are states
+holding `registry.RECORD_OVERFLOW`.
+"""
+
+N_ACTIONS = len(IDX2ACTION)
+
+# Powers of ten that fit in an int64
+POW10 = 10**np.arange(19, dtype=np.int64)
+
+# Operator colors indexed by `OPERATOR2IDX`
+OPERATOR_COLORS = np.asarray([
+    COLORS[IDX2OPERATOR[i]] for i in range(len(IDX2OPERATOR))
+])
+
+def get_states(controllers):
+    """
+    Collects the register states and target values of the argued
+    controllers into arrays.
+
+    Args:
+        controllers: sequence of Controllers
+    Returns:
+        states: ndarray (N,) of dtype STATE_DTYPE
+        targ_vals: ndarray (N,)
+    """
+    states = np.zeros(len(controllers), dtype=STATE_DTYPE)
+    targ_vals = np.zeros(len(controllers))
+    for i,contr in enumerate(controllers):
+        states[i] = contr.register.get_record()
+        targ_vals[i] = contr.targ_val
+    return states, targ_vals
+
+def val2fill(vals):
+    """
+    Converts values to the integer fill units of `STATE_DTYPE`,
+    rounding to the nearest unit.
+
+    Args:
+        vals: array like of floats
+    Returns:
+        fills: ndarray of int64
+    """
+    vals = np.asarray(vals, dtype=np.float64)
+    return np.round(vals*10.0**(-FILL_EXP)).astype(np.int64)
+
+def fill2units(fill, zoom):
+    """
+    Converts the fill of states into the number of grid units that it
+    spans at the argued zoom levels, truncated toward zero exactly like
+    `Register.get_fill_units`.
+
+    Args:
+        fill: ndarray of int64
+            fill in units valued 10**FILL_EXP
+        zoom: ndarray of int64
+    Returns:
+        units: ndarray of int64
+    """
+    diff = zoom - FILL_EXP
+    finer = diff < 0
+    scale = POW10[np.clip(np.abs(diff), 0, len(POW10)-1)]
+    return np.where(
+        finer,
+        fill*scale,
+        np.sign(fill)*(np.abs(fill)//scale)
+    )
+
+def get_scroll_units(zoom, scroll_range):
+    """
+    Vectorized `Register.get_scroll_units`. Returns the minimum and
+    maximum translations that keep the center of the view within the
+    scroll range at each of the argued zoom levels.
+
+    Args:
+        zoom: ndarray of int64
+        scroll_range: tuple of inclusive ints
+    Returns:
+        min_trans: ndarray of int64
+        max_trans: ndarray of int64
+    """
+    bounds = []
+    for i,bound in enumerate(scroll_range):
+        val, exp = to_fixed(bound)
+        diff = exp - zoom
+        scale = POW10[np.clip(np.abs(diff), 0, len(POW10)-1)]
+        # ceil for the lower bound and floor for the upper
+        if i == 0: coarse = -((-val)//scale)
+        else: coarse = val//scale
+        bounds.append(np.where(diff >= 0, val*scale, coarse))
+    return bounds[0], bounds[1]
+
+def get_action_masks(states,
+                     zoom_range: tuple or None=None,
+                     scroll_range: tuple or None=None):
+    """
+    Vectorized `Register.get_action_mask`. Computes the legal
+    primitive actions of each state under the argued ranges.
+
+    Args:
+        states: ndarray (N,) of dtype STATE_DTYPE
+        zoom_range: tuple of inclusive floats | None
+        scroll_range: tuple of inclusive ints | None
+    Returns:
+        masks: ndarray (N, 7) of bools
+            true for each legal action. Indexed by ACTION2IDX
+    """
+    masks = np.ones((len(states), N_ACTIONS), dtype=bool)
+    zoom = states["zoom"]
+    trans = states["trans"]
+    if zoom_range is not None:
+        masks[:, ACTION2IDX[ZOOM_IN]] = zoom-1 >= zoom_range[0]
+        masks[:, ACTION2IDX[ZOOM_OUT]] = zoom+1 <= zoom_range[1]
+    if scroll_range is not None:
+        min_trans, max_trans = get_scroll_units(zoom, scroll_range)
+        masks[:, ACTION2IDX[RIGHT]] = trans+1 <= max_trans
+        masks[:, ACTION2IDX[LEFT]] = trans-1 >= min_trans
+    return masks
+
+def step_states(states,
+                actns,
+                targ_vals,
+                zoom_range: tuple or None=None,
+                scroll_range: tuple or None=None):
+    """
+    Applies one action to each of the argued states. Equivalent to
+    `Controller.apply_action` for each of the primitive actions.
+
+    Args:
+        states: ndarray (N,) of dtype STATE_DTYPE
+        actns: ndarray (N,) of ints
+            the primitive action for each state. See IDX2ACTION
+        targ_vals: ndarray (N,)
+            the target value of the game of each state. Values are
+            compared exactly after rounding to 10**FILL_EXP.
+        zoom_range: tuple of inclusive floats | None
+            zooms that would leave the range are ignored
+        scroll_range: tuple of inclusive ints | None
+            translations that would leave the range are ignored
+    Returns:
+        next_states: ndarray (N,) of dtype STATE_DTYPE
+        rews: ndarray (N,) of ints
+        dones: ndarray (N,) of bools
+    """
+    actns = np.asarray(actns)
+    if zoom_range is not None or scroll_range is not None:
+        masks = get_action_masks(states, zoom_range, scroll_range)
+        legal = masks[np.arange(len(actns)), actns]
+        actns = np.where(legal, actns, -1)
+    next_states = states.copy()
+    fill = next_states["fill"]
+    zoom = next_states["zoom"]
+    trans = next_states["trans"]
+
+    trans += actns == ACTION2IDX[RIGHT]
+    trans -= actns == ACTION2IDX[LEFT]
+
+    zin = actns == ACTION2IDX[ZOOM_IN]
+    zoom[zin] -= 1
+    trans[zin] *= 10
+
+    # Truncates toward zero like int(trans/10)
+    zout = actns == ACTION2IDX[ZOOM_OUT]
+    zoom[zout] += 1
+    trans[zout] = np.sign(trans[zout])*(np.abs(trans[zout])//10)
+
+    # Units finer than 10**FILL_EXP do not change the stored fill
+    adds = (actns == ACTION2IDX[ADD_ONE]).astype(np.int64)
+    adds -= actns == ACTION2IDX[SUBTRACT_ONE]
+    diff = zoom - FILL_EXP
+    unit = POW10[np.clip(diff, 0, len(POW10)-1)]*(diff >= 0)
+    fill += adds*FILL_INCREMENT*unit
+
+    dones = actns == ACTION2IDX[END_GAME]
+    rews = np.where(fill == val2fill(targ_vals), 1, -1)*dones
+    return next_states, rews, dones
+
+def lookahead(states,
+              targ_vals,
+              pixel_density: int or None=None,
+              zoom_range: tuple or None=None,
+              scroll_range: tuple or None=None):
+    """
+    Evaluates every primitive action from each of the argued states.
+
+    Args:
+        states: ndarray (N,) of dtype STATE_DTYPE
+        targ_vals: ndarray (N,)
+            the target value of the game of each state
+        pixel_density: int or None
+            if not None, the frame of each successor state is rendered
+            at this pixel density.
+        zoom_range: tuple of inclusive floats | None
+        scroll_range: tuple of inclusive ints | None
+            illegal actions leave the state unchanged. See
+            `get_action_masks`
+    Returns:
+        next_states: ndarray (N, 7) of dtype STATE_DTYPE
+            next_states[i,a] is the state after taking action a from
+            states[i]
+        rews: ndarray (N, 7) of ints
+        dones: ndarray (N, 7) of bools
+        frames: ndarray (N, 7, H, W) or None
+            None if pixel_density is None
+    """
+    n = len(states)
+    actns = np.tile(np.arange(N_ACTIONS), n)
+    next_states, rews, dones = step_states(
+        np.repeat(states, N_ACTIONS),
+        actns,
+        np.repeat(targ_vals, N_ACTIONS),
+        zoom_range=zoom_range,
+        scroll_range=scroll_range,
+    )
+    shape = (n, N_ACTIONS)
+    frames = None
+    if pixel_density is not None:
+        frames = render_states(next_states, pixel_density)
+        frames = frames.reshape(*shape, *frames.shape[1:])
+    return next_states.reshape(shape), rews.reshape(shape),\
+           dones.reshape(shape), frames
+
+def floor_log10(n):
+    """
+    Vectorized `registry.floor_log10` for int64 arrays.
+
+    Args:
+        n: ndarray of int64
+            must be positive
+    Returns:
+        log10: ndarray of int64
+    """
+    return np.searchsorted(POW10, n, side="right")-1
+
+def trunc_log10(units, exp):
+    """
+    Vectorized `registry.trunc_log10` for int64 arrays. Returns
+    int(log10(units*10**exp)) computed exactly.
+
+    Args:
+        units: ndarray of int64
+            must be positive
+        exp: ndarray of int64
+    Returns:
+        log10: ndarray of int64
+    """
+    log10 = floor_log10(units)
+    inexact = POW10[log10] != units
+    return log10 + exp + ((log10+exp < 0) & inexact)
+
+def get_marker_colors(zoom, trans, grid):
+    """
+    Computes the colors that the markers at the 10s and 5s places add
+    to the value units, following `Register.draw_register`.
+
+    Args:
+        zoom: ndarray (N,) of int64
+        trans: ndarray (N,) of int64
+        grid: Grid
+            a grid with the desired specifications. It is not drawn to.
+    Returns:
+        marks: ndarray (N, n_val_units)
+            0 for the units without a marker
+    """
+    cols = np.arange(grid.n_val_units)
+    dist = trans[:,None] - grid.middle + cols
+    absd = np.abs(dist)
+    tens = (dist != 0) & (absd % 10 == 0)
+    fives = (dist != 0) & ((absd+5) % 10 == 0) & ~tens
+    marked = tens | fives
+    mark_dist = np.where(fives, absd+5, np.where(marked, absd, 1))
+    log10 = trunc_log10(mark_dist, zoom[:,None])
+    marks = log10*COLORS[MARKER]+COLORS[MARKER_BASE]
+    marks = np.where(fives, marks/2, marks)
+    return np.where(marked, marks, 0)
+
+def get_unit_colors(states, grid):
+    """
+    Computes the color of every unit of the grid for each of the
+    argued states, following the same steps as
+    `Register.draw_register`.
+
+    Args:
+        states: ndarray (N,) of dtype STATE_DTYPE
+        grid: Grid
+            a grid with the desired specifications. It is not drawn to.
+    Returns:
+        colors: ndarray (N, n_val_units+n_meta_units)
+    """
+    n = len(states)
+    n_val = grid.n_val_units
+    n_units = n_val + grid.n_meta_units
+    colors = np.full((n, n_units), COLORS[DEFAULT], dtype=np.float64)
+    zoom = states["zoom"]
+    trans = states["trans"]
+    fill = states["fill"]
+
+    # Meta units
+    colors[:, grid.zoom_idx] = zoom/ZOOM_DIVISOR
+    colors[:, grid.operator_idx] = OPERATOR_COLORS[states["operator"]]
+    colors[:, grid.operand_idx] = states["operand"]/OPERAND_DIVISOR
+    colors[:, grid.trans_idx] = trans/TRANS_DIVISOR
+
+    # Zero point
+    rows = np.arange(n)
+    zero_idx = grid.middle - trans
+    visible = (zero_idx >= 0) & (zero_idx < n_val)
+    colors[rows[visible], zero_idx[visible]] = COLORS[ZERO]
+
+    # Markers at the 10s and 5s places
+    colors[:, :n_val] += get_marker_colors(zoom, trans, grid)
+
+    # Fill
+    cols = np.arange(n_val)
+    col0ufz = trans - grid.middle
+    fill_units = fill2units(fill, states["zoom"])
+    fillx = fill_units - col0ufz
+    startx = np.where(fillx > zero_idx, zero_idx+1, fillx)
+    endx = np.where(fillx > zero_idx, fillx+1, zero_idx)
+    startx = np.maximum(startx, 0)[:,None]
+    endx = np.minimum(endx, n_val)[:,None]
+    filled = (fill_units != 0) & (fillx != zero_idx)
+    fill_mask = filled[:,None] & (cols >= startx) & (cols < endx)
+    colors[:, :n_val] += np.where(fill_mask, COLORS[FILL], 0)
+    return colors
+
+def colors2frames(colors, pixel_density):
+    """
+    Expands unit colors into pixel frames in the same way as
+    `Grid.draw`. Each unit occupies a pixel_density square of which
+    the rightmost column and lowermost row are left blank when the
+    density is greater than 1.
+
+    Args:
+        colors: ndarray (N, n_units)
+        pixel_density: int
+    Returns:
+        frames: ndarray (N, pixel_density, n_units*pixel_density)
+    """
+    n, n_units = colors.shape
+    d = pixel_density
+    frames = np.full(
+        (n, d, n_units*d),
+        COLORS[DEFAULT],
+        dtype=np.float64
+    )
+    draw_space = max(1, d-1)
+    units = frames.reshape(n, d, n_units, d)
+    units[:, :draw_space, :, :draw_space] = colors[:, None, :, None]
+    return frames
+
+def render_states(states, pixel_density: int=5):
+    """
+    Renders the frame of each of the argued states. The frames are
+    identical to those produced by `Register.draw_register`.
+
+    Args:
+        states: ndarray (N,) of dtype STATE_DTYPE
+        pixel_density: int
+    Returns:
+        frames: ndarray (N, H, W)
+    """
+    grid = Grid(pixel_density=pixel_density)
+    colors = get_unit_colors(states, grid)
+    return colors2frames(colors, pixel_density)
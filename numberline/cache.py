@@ -0,0 +1,90 @@
+from collections import OrderedDict
+
+"""
+A bounded least recently used cache of rendered frames. The Register
+uses it to skip drawing views that it has already drawn. Frames are
+keyed by everything that determines them: the visible span of the
+fill, the zoom, the translation, the operator and the operand.
+"""
+
+class FrameCache:
+    def __init__(self, max_bytes: int=64*2**20):
+        """
+        Args:
+          max_bytes: int
+            the budget for the total size of the cached frames. The
+            least recently used frames are evicted once the budget is
+            exceeded.
+        """
+        assert max_bytes >= 0
+        self.max_bytes = max_bytes
+        self.frames = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __contains__(self, key):
+        return key in self.frames
+
+    def get(self, key):
+        """
+        Returns the cached frame of the key and marks it as the most
+        recently used. Counts a hit or a miss.
+
+        Args:
+          key: hashable
+        Returns:
+          frame: ndarray or None
+            None if the key is not cached. The frame must not be
+            modified.
+        """
+        frame = self.frames.get(key)
+        if frame is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.frames.move_to_end(key)
+        return frame
+
+    def put(self, key, frame):
+        """
+        Caches a copy of the frame under the key, evicting the least
+        recently used frames as needed. Frames larger than the budget
+        are not cached.
+
+        Args:
+          key: hashable
+          frame: ndarray
+        """
+        if frame.nbytes > self.max_bytes: return
+        if key in self.frames:
+            self.nbytes -= self.frames.pop(key).nbytes
+        self.frames[key] = frame.copy()
+        self.nbytes += frame.nbytes
+        while self.nbytes > self.max_bytes:
+            _, evicted = self.frames.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        """
+        Removes all frames and resets the counters.
+        """
+        self.frames.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self):
+        """
+        Returns:
+          hit_rate: float
+            the fraction of lookups that were hits. 0 if there were no
+            lookups.
+        """
+        n_lookups = self.hits + self.misses
+        if n_lookups == 0: return 0.
+        return self.hits/n_lookups
@@ -18,6 +18,15 @@ OPERATORS = {
     MULTIPLY,
     DIVIDE
 }
+# Fixed ordering of the operators for storing operators in arrays
+operators = [
+    ADD,
+    SUBTRACT,
+    MULTIPLY,
+    DIVIDE,
+]
+OPERATOR2IDX = {op: i for i,op in enumerate(operators)}
+IDX2OPERATOR = {i: op for i,op in enumerate(operators)}
 OPERATOR2SYMBOL = {
     ADD: "+",
     SUBTRACT: "-",
@@ -46,6 +55,24 @@ actns = [
 ACTION2IDX = {actn: i for i,actn in enumerate(actns)}
 IDX2ACTION = {i: actn for i,actn in enumerate(actns)}
 
+# Macro Actions
+# Only available when a controller is created with macro_actions=True.
+# Macros that take an argument are argued as (idx, arg) tuples.
+ADD_UNITS = "add_units" # arg: number of units to add at current zoom
+TRANSLATE_TO_FILL = "translate_to_fill" # no arg
+SET_ZOOM = "set_zoom" # arg: the new zoom level
+macro_actns = [
+    ADD_UNITS,
+    TRANSLATE_TO_FILL,
+    SET_ZOOM,
+]
+MACRO2IDX = {actn: i+len(actns) for i,actn in enumerate(macro_actns)}
+IDX2MACRO = {i+len(actns): actn for i,actn in enumerate(macro_actns)}
+# The inclusive bounds of the macro arguments in the action space of
+# the env. The fill of the step info is a float, so much deeper zooms
+# can overflow it.
+MACRO_ARG_RANGE = (-100, 100)
+
 
 # COLORS
 COLORS = {
@@ -70,3 +97,7 @@ FILL_INCREMENT = 1
 ZOOM_DIVISOR = 10
 OPERAND_DIVISOR = 100
 TRANS_DIVISOR = 100
+
+# Register states stored in numpy arrays (see `registry.STATE_DTYPE`)
+# hold the fill as an integer count of units valued 10**FILL_EXP
+FILL_EXP = -6
@@ -1,7 +1,11 @@
 from numberline.grid import Grid
-from numberline.registry import Register
+from numberline.registry import Register, STATE_DTYPE
+from numberline.cache import FrameCache
+from numberline.tasks import TaskSampler
 from numberline.constants import *
+from numberline.utils import copy_rng, get_operand
 import numpy as np
+import copy
 
 """
 This file contains each of the game controller classes for each of the
@@ -23,6 +27,13 @@ class Controller:
                  zoom_range: tuple or None=None,
                  scroll_range: tuple or None=None,
                  ep_reset: bool=True,
+                 macro_actions: bool=False,
+                 rng=None,
+                 atlas=None,
+                 cache_bytes: int or None=None,
+                 task_stream: bool=False,
+                 exact_tasks: bool=False,
+                 copy_obs: bool=True,
                  *args, **kwargs):
         """
         pixel_density: int
@@ -57,6 +68,38 @@ class Controller:
             if true, the value of the numberline resets after each
             episode. If false the value of the numberline persists
             through episodes.
+        macro_actions: bool
+            if true, the macro actions in
+            `numberline.constants.MACRO2IDX` can be argued to `step`.
+            Each macro applies a composite change to the register and
+            renders the grid only once.
+        rng: numpy Generator or None
+            the generator used to sample each game. if None, a new
+            generator is seeded from numpy's global generator, so
+            `np.random.seed` makes the games reproducible.
+        atlas: ObservationAtlas or None
+            if not None, observations of states that are in the atlas
+            are returned as read-only views into the atlas rather than
+            drawn. See `numberline.atlas`
+        cache_bytes: int or None
+            if not None, the register caches drawn frames in a least
+            recently used cache with this byte budget. See
+            `numberline.cache`
+        task_stream: bool
+            if true, a successful END_GAME does not end the episode.
+            Instead the next task is issued in place from the current
+            fill and only the meta units of the grid are redrawn. See
+            `next_task`
+        exact_tasks: bool
+            if true, the games sampled at reset and the tasks of a
+            task stream only have integer operands. MULTIPLY targets
+            are multiples of the initial value and MULTIPLY and DIVIDE
+            never have an initial value of 0. See `numberline.tasks`
+        copy_obs: bool
+            if false, observations are returned as read-only views of
+            the grid instead of copies. A view is overwritten by the
+            next draw, so this is only for callers that copy each
+            observation themselves, such as `FrameStack`.
         """
         if type(targ_range) == int:
             targ_range = (targ_range, targ_range)
@@ -74,8 +117,28 @@ class Controller:
         self._zoom_range = zoom_range
         self._scroll_range = scroll_range
         self._ep_reset = ep_reset
+        self.macro_actions = macro_actions
+        self.task_stream = task_stream
+        self.exact_tasks = exact_tasks
+        self._task_sampler = None
+        # true if the last action issued a new task in place
+        self.new_task = False
+        # true if the grid only needs its meta units redrawn
+        self._meta_only = False
+        self.atlas = atlas
+        if rng is None: rng = np.random.default_rng(np.random.randint(2**31))
+        self.rng = rng
+        self.copy_obs = copy_obs
         self.grid = Grid(pixel_density=pixel_density)
-        self.register = Register(grid=self.grid)
+        frame_cache = None
+        if cache_bytes is not None:
+            frame_cache = FrameCache(max_bytes=cache_bytes)
+        self.register = Register(
+            grid=self.grid,
+            zoom_range=zoom_range,
+            scroll_range=scroll_range,
+            frame_cache=frame_cache,
+        )
 
     @property
     def targ_range(self):
@@ -175,6 +238,7 @@ class Controller:
             represents 10. A zoom of -1 has each unit represent 0.1.
         """
         self._zoom_range = new_range
+        self.register.zoom_range = new_range
 
     @property
     def scroll_range(self):
@@ -189,6 +253,7 @@ class Controller:
             min and maximum scrollable values on the numberline. 
         """
         self._scroll_range = new_range
+        self.register.scroll_range = new_range
 
     @property
     def ep_reset(self):
@@ -204,18 +269,183 @@ class Controller:
         """
         self._ep_reset = new_val
 
+    def get_state(self):
+        """
+        Returns the compact state of the game. The state can be
+        restored with `set_state`. The game must have been reset at
+        least once.
+
+        Returns:
+            state: tuple (register_state, targ_val, rng_state)
+                register_state is the tuple returned by
+                `Register.get_state` and rng_state is the state of the
+                bit generator of `self.rng`
+        """
+        return (
+            self.register.get_state(),
+            self.targ_val,
+            self.rng.bit_generator.state
+        )
+
+    def set_state(self, state):
+        """
+        Restores a state returned by `get_state`. The grid is redrawn
+        lazily, see `observe`.
+
+        Args:
+            state: tuple (register_state, targ_val, rng_state)
+        """
+        reg_state, self.targ_val, rng_state = state
+        self.register.set_state(reg_state)
+        self.operator = self.register.operator
+        self.operand = self.register.operand
+        self.rng.bit_generator.state = rng_state
+
+    def clone(self):
+        """
+        Returns an independent copy of the controller that shares none
+        of its mutable state. Only the compact state is copied, the
+        grid of the copy is drawn lazily.
+
+        Returns:
+            controller: Controller
+        """
+        contr = copy.copy(self)
+        contr.register = self.register.clone()
+        contr.grid = contr.register.grid
+        contr.rng = copy_rng(self.rng)
+        return contr
+
+    def observe(self):
+        """
+        Returns the current observation, drawing the grid first if the
+        state was restored since the last draw.
+
+        Returns:
+            grid: ndarray
+        """
+        self.register.refresh()
+        return self.get_obs()
+
+    def get_obs(self):
+        """
+        Returns the grid as an observation without drawing it, see
+        `copy_obs`.
+
+        Returns:
+            grid: ndarray
+        """
+        if self.copy_obs: return self.grid.grid
+        return self.grid.view()
+
+    @property
+    def frame_cache(self):
+        return self.register.frame_cache
+
+    def draw(self):
+        """
+        Returns the observation of the current state. The frame is
+        taken from the atlas when possible, in which case the grid is
+        drawn lazily by `observe`.
+
+        Returns:
+            grid: ndarray
+        """
+        if self.atlas is not None:
+            frame = self.atlas.get_frame(self.register)
+            if frame is not None:
+                self.register.needs_draw = True
+                return frame
+        self.register.draw_register()
+        return self.get_obs()
+
     def calculate_reward(self):
-        if self.register.fill == self.targ_val:
+        if self.register.fill_equals(self.targ_val):
             return 1
         return -1
 
-    def step(self, actn: int):
+    def apply_macro(self, actn: int, arg=None):
+        """
+        Applies a macro action to the register without drawing.
+
+        Args:
+          actn: int [7, 8, 9]
+            Check IDX2MACRO dict to ensure these values haven't changed
+                7: add arg units at the current zoom (arg may be
+                   negative)
+                8: translate the view onto the edge of the fill
+                9: set the zoom to arg
+          arg: int or None
+            the argument of the macro
+        Returns:
+          n_steps: int
+            the number of primitive actions that the macro replaces
+        Raises:
+          ValueError: if ADD_UNITS or SET_ZOOM is not argued an int
+        """
+        assert self.macro_actions, "macro actions are not enabled"
+        macro = IDX2MACRO[actn]
+        if macro in {ADD_UNITS, SET_ZOOM}:
+            if arg is None or isinstance(arg, bool) or int(arg) != arg:
+                raise ValueError(
+                    "{} requires an int argument, got {!r}".format(macro, arg)
+                )
+            arg = int(arg)
+        if macro == ADD_UNITS:
+            self.register.add_fill(arg*FILL_INCREMENT)
+            return abs(arg)
+        elif macro == TRANSLATE_TO_FILL:
+            return abs(self.register.translate_to_fill())
+        elif macro == SET_ZOOM:
+            # The zoom is clamped to the zoom range, so the steps are
+            # counted from the zoom that is actually reached
+            zoom = self.register.zoom
+            self.register.set_zoom(arg)
+            return abs(self.register.zoom - zoom)
+
+    def apply_action(self, actn: int or tuple):
+        """
+        Performs the argued action within the register without drawing
+        the grid.
+
+        Args:
+          actn: int or tuple (int, arg)
+            see `step` for details
+        Returns:
+          rew: int
+          done: bool
+          n_steps: int
+            the number of primitive actions that the action amounts to
+        """
+        self.new_task = False
+        self._meta_only = False
+        arg = None
+        if isinstance(actn, tuple): actn, arg = actn
+        reg = self.register
+        if actn == 0: reg.translate(1)
+        elif actn == 1: reg.translate(-1)
+        elif actn == 2: reg.zoom_in()
+        elif actn == 3: reg.zoom_out()
+        elif actn == 4: reg.add_fill(FILL_INCREMENT)
+        elif actn == 5: reg.add_fill(-FILL_INCREMENT)
+        elif actn == ACTION2IDX[END_GAME]:
+            rew = self.calculate_reward()
+            if self.task_stream and rew > 0:
+                self.next_task()
+                return rew, False, 1
+            return rew, True, 1
+        else:
+            return 0, False, self.apply_macro(actn, arg)
+        return 0, False, 1
+
+    def step(self, actn: int or tuple):
         """
         This function takes a step in the environment. The action can
-        be a directional movement, a grab action, or a decomposition.
+        be a directional movement, a zoom, a change to the fill, or
+        a macro action if macro actions are enabled.
 
         Args:
-          actn: int [0, 1, 2, 3, 4, 5, 6]
+          actn: int [0, 1, 2, 3, 4, 5, 6] or tuple (int, arg)
             Check IDX2ACTION dict to ensure these values haven't changed
                 0: translate right
                 1: translate left
@@ -224,20 +454,21 @@ class Controller:
                 4: add value to numberline
                 5: subtract value from numberline
                 6: end episode
+            Macro actions (see IDX2MACRO) that take an argument are
+            argued as a tuple (actn, arg).
+        Returns:
+          grid: ndarray
+          rew: int
+          done: bool
+          info: dict
+            includes the key "n_steps" which is the number of
+            primitive actions that the action amounts to, the key
+            "action_mask" which is a bool array marking the primitive
+            actions that are legal under the zoom and scroll ranges
+            and the key "new_task" which is true if a new task was
+            issued in place, see `task_stream`.
         """
-        actn2fxn = {
-            0: lambda: self.register.translate(1),
-            1: lambda: self.register.translate(-1),
-            2: self.register.zoom_in,
-            3: self.register.zoom_out,
-            4: lambda: self.register.add_fill(FILL_INCREMENT),
-            5: lambda: self.register.add_fill(-FILL_INCREMENT),
-            6: lambda: None,
-        }
-
-        # Perform the action within the register
-        actn2fxn[actn]()
-
+        rew, done, n_steps = self.apply_action(actn)
         info = {
             "fill": self.register.fill,
             "zoom": self.register.zoom,
@@ -245,48 +476,189 @@ class Controller:
             "operator": self.register.operator,
             "trans": self.register.trans,
             "targ_val": self.targ_val,
+            "n_steps": n_steps,
+            "action_mask": self.register.get_action_mask(),
+            "new_task": self.new_task,
         }
+        if self._meta_only:
+            # Only the meta units changed and they were patched in place
+            self._meta_only = False
+            return self.get_obs(), rew, done, info
+        return self.draw(), rew, done, info
+
+    def step_sequence(self,
+                      actns,
+                      frame_stride: int or None=None,
+                      step_hook=None,
+                      return_states: bool=True):
+        """
+        Applies a whole sequence of actions in a single call, stopping
+        early if the episode ends. The grid is only drawn for the
+        requested frames and once after the final action.
+
+        Args:
+          actns: sequence of ints or (int, arg) tuples
+            the actions to apply in order. See `step` for details.
+          frame_stride: int or None
+            if None, no frames are returned. Otherwise the observation
+            following every frame_stride-th action is returned, i.e.
+            the observations after actions frame_stride-1,
+            2*frame_stride-1, etc. A stride of 1 returns every frame.
+          step_hook: callable or None
+            optional function with signature
+            `step_hook(rew, done, n_steps) -> (rew, done)` that is
+            called after every action. Envs use this to enforce their
+            step limits.
+          return_states: bool
+            if false, the register states are not recorded
+        Returns:
+          frames: ndarray (N, H, W) or None
+            the requested observations. None if frame_stride is None
+          rews: ndarray (T,)
+            the reward after each applied action. T is less than
+            len(actns) if the episode ended early.
+          dones: ndarray (T,)
+          states: ndarray (T,) of dtype `STATE_DTYPE` or None
+            the register state after each applied action. None if
+            return_states is false. A fill or translation beyond the
+            range of the record, e.g. at deep zooms, is recorded as
+            `registry.RECORD_OVERFLOW`
+        """
+        n_actns = len(actns)
+        rews = np.zeros(n_actns, dtype=np.float64)
+        dones = np.zeros(n_actns, dtype=bool)
+        states = None
+        if return_states: states = np.zeros(n_actns, dtype=STATE_DTYPE)
+        frames = None
+        if frame_stride is not None:
+            frames = np.zeros(
+                (n_actns//frame_stride, *self.grid.raw_shape),
+                dtype=self.grid._grid.dtype
+            )
+        reg = self.register
+        n_frames = 0
+        t = 0
         done = False
-        rew = 0
-        if actn == ACTION2IDX[END_GAME]:
-            done = True
-            rew = self.calculate_reward()
-        self.register.draw_register()
-        return self.grid.grid, rew, done, info
+        while t < n_actns and not done:
+            rew, done, n_steps = self.apply_action(actns[t])
+            if step_hook is not None:
+                rew, done = step_hook(rew, done, n_steps)
+            rews[t] = rew
+            dones[t] = done
+            if return_states: states[t] = reg.get_record(saturate=True)
+            t += 1
+            if frame_stride is not None and t % frame_stride == 0:
+                reg.draw_register()
+                frames[n_frames] = self.grid._grid
+                n_frames += 1
+        if frame_stride is None or t % frame_stride != 0:
+            reg.draw_register()
+        if frames is not None: frames = frames[:n_frames]
+        if states is not None: states = states[:t]
+        return frames, rews[:t], dones[:t], states
 
     def reset(self, targ_val=None, operator=None, init_val=None):
         """
-        This member must be overridden
+        Starts a new game. The register is reset, the initial value
+        is set and a task is sampled, see `set_task`.
+
+        Args:
+            targ_val: int or None
+            operator: str or None
+            init_val: int or None
+        Returns:
+            grid: ndarray
         """
         self.register.reset(reset_fill=self.ep_reset)
+        if self.exact_tasks and targ_val is None and operator is None\
+                and init_val is None:
+            task = self.get_task_sampler().sample(1, self.rng)[0]
+            init_val = int(task["init_val"])
+            operator = IDX2OPERATOR[int(task["operator"])]
+            targ_val = int(task["targ_val"])
         if init_val is None:
-            init_val = np.random.randint(
+            init_val = int(self.rng.integers(
                 self.init_range[0],
                 self.init_range[1]+1
-            )
+            ))
         self.register.fill = init_val
+        self.set_task(targ_val=targ_val, operator=operator)
+        self.new_task = False
+        self._meta_only = False
+        return self.draw()
+
+    def set_task(self, targ_val=None, operator=None):
+        """
+        Sets the target value, operator and operand of the game
+        relative to the current fill without drawing. Unargued values
+        are sampled.
+
+        Args:
+            targ_val: int or None
+            operator: str or None
+        """
         if operator is None:
-            i = np.random.randint(0, len(self.operators))
+            i = self.rng.integers(0, len(self.operators))
             operator = self.operators[i]
         if targ_val is None:
-            targ_val = np.random.randint(
+            targ_val = int(self.rng.integers(
                 self.targ_range[0],
                 self.targ_range[1]+1
-            )
-        if operator == SUBTRACT:
-            operand = self.register.fill - targ_val
-        elif operator == ADD or self.register.fill == 0:
-            operator = ADD
-            operand = targ_val - self.register.fill
-        elif operator == MULTIPLY:
-            operand = targ_val/self.register.fill
-        elif operator == DIVIDE:
-            operand = targ_val*self.register.fill
+            ))
+        operator, operand = get_operand(
+            operator,
+            self.register.fill,
+            targ_val
+        )
         self.targ_val = targ_val
         self.operator = operator
         self.operand = operand
         self.register.operator = self.operator
         self.register.operand = self.operand
-        self.register.draw_register()
-        return self.grid.grid
 
+    def get_task_sampler(self):
+        """
+        Returns the exact task sampler of the current ranges and
+        operators. The sampler is rebuilt when they change.
+
+        Returns:
+            sampler: TaskSampler
+        """
+        key = (
+            tuple(self.init_range),
+            tuple(self.targ_range),
+            tuple(self.operators)
+        )
+        if self._task_sampler is None or self._task_sampler[0] != key:
+            sampler = TaskSampler(
+                self.init_range,
+                self.targ_range,
+                self.operators
+            )
+            self._task_sampler = (key, sampler)
+        return self._task_sampler[1]
+
+    def next_task(self, targ_val=None, operator=None):
+        """
+        Issues the next task of a task stream in place. The fill, zoom
+        and translation carry over and, if the grid is up to date, only
+        its operator and operand units are redrawn. Under exact_tasks,
+        unargued tasks are sampled exactly from the current fill, see
+        `TaskSampler.sample_next`.
+
+        Args:
+            targ_val: int or None
+            operator: str or None
+        """
+        if self.exact_tasks and targ_val is None and operator is None:
+            operator, targ_val = self.get_task_sampler().sample_next(
+                self.register.fill,
+                self.rng
+            )
+        self.set_task(targ_val=targ_val, operator=operator)
+        self.new_task = True
+        reg = self.register
+        if self.atlas is None and reg.grid_is_current():
+            self.grid.set_operator_color(COLORS[reg.operator])
+            self.grid.set_operand_color(reg.operand/OPERAND_DIVISOR)
+            self._meta_only = True
@@ -0,0 +1,87 @@
+"""
+Detects episodes that keep revisiting the same register states, such as
+a policy that oscillates between LEFT and RIGHT. The visit counts are
+kept in a small direct mapped table indexed by the low bits of a state
+key (see `Register.get_state_key`), so each step costs a few integer
+operations and the memory does not grow with the episode. A state whose
+slot is taken over by another state starts counting from scratch, so
+collisions can only delay a detection, never cause a false one.
+"""
+
+class CycleDetector:
+    def __init__(self, max_repeats: int, table_size: int=64):
+        """
+        Args:
+            max_repeats: int
+                a cycle is detected once a state has been visited more
+                than this many times
+            table_size: int
+                the number of slots of the table. Must be a power of 2.
+        """
+        assert max_repeats >= 1
+        assert table_size > 0 and table_size & (table_size-1) == 0,\
+            "table_size must be a power of 2"
+        self.max_repeats = max_repeats
+        self.table_size = table_size
+        self.mask = table_size - 1
+        self.reset()
+
+    def reset(self, key=None):
+        """
+        Clears the table and optionally counts a first state.
+
+        Args:
+            key: int or None
+                the key of the initial state of the episode
+        """
+        self.keys = [None]*self.table_size
+        self.counts = [0]*self.table_size
+        if key is not None: self.add(key)
+
+    def add(self, key: int):
+        """
+        Counts a visit to the state of the argued key.
+
+        Args:
+            key: int
+        Returns:
+            is_cycle: bool
+                true if the state has now been visited more than
+                max_repeats times
+        """
+        slot = key & self.mask
+        if self.keys[slot] == key:
+            self.counts[slot] += 1
+        else:
+            self.keys[slot] = key
+            self.counts[slot] = 1
+        return self.counts[slot] > self.max_repeats
+
+    def get_state(self):
+        """
+        Returns:
+            state: tuple (keys, counts)
+                the contents of the table as tuples
+        """
+        return tuple(self.keys), tuple(self.counts)
+
+    def set_state(self, state):
+        """
+        Restores the table from a state returned by `get_state`.
+
+        Args:
+            state: tuple (keys, counts)
+        """
+        self.keys = list(state[0])
+        self.counts = list(state[1])
+
+    def clone(self):
+        """
+        Returns:
+            detector: CycleDetector
+                an independent copy with the same counts
+        """
+        detector = CycleDetector(self.max_repeats, self.table_size)
+        detector.keys = list(self.keys)
+        detector.counts = list(self.counts)
+        return detector
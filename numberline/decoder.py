@@ -0,0 +1,218 @@
+import numpy as np
+from numberline.constants import *
+from numberline.grid import Grid
+from numberline.registry import STATE_DTYPE
+from numberline.batch import OPERATOR_COLORS, POW10, trunc_log10
+
+"""
+Recovers the register state from rendered frames. This is the inverse
+of `batch.render_states` and `Register.draw_register` and is used to
+analyze or relabel stored observations without the states that
+produced them.
+
+Only the (0,0) pixel of each unit is read, like `Grid.__getitem__`.
+The meta units hold the zoom, operator, operand and translation. The
+fill is read from the value units:
+
+    Units off the 5s places are either empty or filled, so their
+    colors alone give the filled range. Units on the 5s places carry
+    a marker whose color depends on the zoom and translation, so the
+    only marked units that are checked are the two just outside the
+    filled range, against their recomputed marker colors.
+
+The fill can only be recovered at the resolution of the zoom and only
+while its far end is on screen. A fill that extends beyond the screen
+decodes as the largest fill that renders the same frame, and a fill
+that is entirely off screen decodes as 0.
+"""
+
+# The layout of a decoded frame
+DECODED_DTYPE = np.dtype([
+    ("zoom", np.int64),
+    ("operator", np.int8),
+    ("operand", np.float64),
+    ("trans", np.int64),
+    # the column of the zero unit. Can be off screen.
+    ("zero_idx", np.int64),
+    # the visible range of filled columns [fill_start, fill_end)
+    ("fill_start", np.int64),
+    ("fill_end", np.int64),
+    # the fill measured in units of the zoom, see `fill2units`
+    ("fill_units", np.int64),
+    # true if the far end of the fill may be beyond the screen
+    ("fill_clipped", bool),
+])
+
+def units2fill(units, zoom):
+    """
+    Converts fills measured in grid units at the argued zoom levels into
+    the integer fill units of `STATE_DTYPE`. Inverse of
+    `batch.fill2units` for fills at the resolution of the zoom.
+
+    Args:
+        units: ndarray of int64
+        zoom: ndarray of int64
+    Returns:
+        fill: ndarray of int64
+    """
+    diff = zoom - FILL_EXP
+    scale = POW10[np.clip(np.abs(diff), 0, len(POW10)-1)]
+    return np.where(
+        diff >= 0,
+        units*scale,
+        np.sign(units)*(np.abs(units)//scale)
+    )
+
+def read_unit_colors(frames, pixel_density: int):
+    """
+    Reads the color of every unit of the argued frames.
+
+    Args:
+        frames: ndarray (N, H, W)
+        pixel_density: int
+    Returns:
+        colors: ndarray (N, n_val_units+n_meta_units)
+            a strided view of the frames
+    """
+    grid = Grid(pixel_density=pixel_density)
+    n_units = grid.n_val_units + grid.n_meta_units
+    frames = np.asarray(frames)
+    if frames.ndim != 3 or frames.shape[2] != n_units*pixel_density:
+        raise ValueError(
+            "frames of shape {} do not match a pixel_density of {}".format(
+                frames.shape, pixel_density
+            )
+        )
+    return frames[:, 0, ::pixel_density]
+
+def get_marked_cols(trans, grid):
+    """
+    Finds the columns on the 5s places, including the zero unit.
+
+    Args:
+        trans: ndarray (N,) of int64
+        grid: Grid
+    Returns:
+        marked: ndarray (N, n_val_units) of bools
+    """
+    # Only the phase of the translation matters, so the masks of the
+    # 5 phases are tabled and gathered
+    cols = np.arange(grid.n_val_units)
+    table = (np.arange(5)[:,None] - grid.middle + cols) % 5 == 0
+    return np.take(table, trans % 5, axis=0)
+
+def is_marked_fill(colors, cols, zoom, trans, grid):
+    """
+    Determines whether the argued marked columns are filled by removing
+    their marker colors.
+
+    Args:
+        colors: ndarray (N, n_val_units)
+        cols: ndarray (N,) of int64
+            a column of each frame. Columns that are off screen, not on
+            the 5s places or that are the zero unit are never filled.
+        zoom: ndarray (N,) of int64
+        trans: ndarray (N,) of int64
+        grid: Grid
+    Returns:
+        filled: ndarray (N,) of bools
+    """
+    n_val = grid.n_val_units
+    dist = trans - grid.middle + cols
+    absd = np.abs(dist)
+    valid = (cols >= 0) & (cols < n_val) & (dist != 0) & (absd % 5 == 0)
+    fives = absd % 10 != 0
+    mark_dist = np.where(valid, absd + 5*fives, 1)
+    marks = trunc_log10(mark_dist, zoom)*COLORS[MARKER]+COLORS[MARKER_BASE]
+    marks = np.where(fives, marks/2, marks)
+    color = colors[np.arange(len(cols)), np.clip(cols, 0, n_val-1)]
+    return valid & (color - marks > COLORS[FILL]/2)
+
+def decode_frames(frames, pixel_density: int):
+    """
+    Decodes the register state shown by each of the argued frames.
+
+    Args:
+        frames: ndarray (N, H, W)
+            frames rendered at the argued pixel_density
+        pixel_density: int
+    Returns:
+        decoded: ndarray (N,) of dtype DECODED_DTYPE
+    """
+    grid = Grid(pixel_density=pixel_density)
+    colors = read_unit_colors(frames, pixel_density)
+    n, n_val = len(colors), grid.n_val_units
+    decoded = np.zeros(n, dtype=DECODED_DTYPE)
+
+    # Meta units
+    zoom = np.rint(colors[:, grid.zoom_idx]*ZOOM_DIVISOR).astype(np.int64)
+    trans = np.rint(colors[:, grid.trans_idx]*TRANS_DIVISOR).astype(np.int64)
+    diffs = np.abs(colors[:, grid.operator_idx, None] - OPERATOR_COLORS)
+    decoded["zoom"] = zoom
+    decoded["trans"] = trans
+    decoded["operator"] = np.argmin(diffs, axis=-1)
+    # Division by OPERAND_DIVISOR is not exactly invertible, so the
+    # operand is rounded to the fill resolution whenever the rounded
+    # operand renders to the same color
+    color = colors[:, grid.operand_idx]
+    operand = color*OPERAND_DIVISOR
+    rounded = np.round(operand, -FILL_EXP)
+    decoded["operand"] = np.where(
+        rounded/OPERAND_DIVISOR == color,
+        rounded,
+        operand
+    )
+    zero_idx = grid.middle - trans
+    decoded["zero_idx"] = zero_idx
+
+    # Filled range of the unmarked columns
+    vals = colors[:, :n_val]
+    filled = vals > COLORS[FILL]/2
+    filled &= ~get_marked_cols(trans, grid)
+    any_fill = filled.any(-1)
+    start = np.where(any_fill, np.argmax(filled, -1), 0)
+    end = np.where(any_fill, n_val - np.argmax(filled[:, ::-1], -1), n_val)
+    # The marked columns just outside of the range, or a single marked
+    # column at either edge of the screen
+    before = is_marked_fill(vals, start-1, zoom, trans, grid) & any_fill
+    after = is_marked_fill(vals, end, zoom, trans, grid) & any_fill
+    first = is_marked_fill(vals, start, zoom, trans, grid) & ~any_fill
+    last = is_marked_fill(vals, end-1, zoom, trans, grid) & ~any_fill
+    start = np.where(first, 0, np.where(last, n_val-1, start-before))
+    end = np.where(first, 1, np.where(last, n_val, end+after))
+    any_fill |= first | last
+    decoded["fill_start"] = np.where(any_fill, start, 0)
+    decoded["fill_end"] = np.where(any_fill, end, 0)
+
+    # The far end of the fill is the end away from the zero unit
+    positive = start > zero_idx
+    col0ufz = trans - grid.middle
+    decoded["fill_units"] = np.where(
+        any_fill,
+        np.where(positive, end-1, start) + col0ufz,
+        0
+    )
+    decoded["fill_clipped"] = any_fill & np.where(
+        positive,
+        end == n_val,
+        start == 0
+    )
+    return decoded
+
+def decode_states(frames, pixel_density: int):
+    """
+    Decodes the register state shown by each of the argued frames as
+    `STATE_DTYPE` records. Rendering the states reproduces the frames.
+
+    Args:
+        frames: ndarray (N, H, W)
+        pixel_density: int
+    Returns:
+        states: ndarray (N,) of dtype STATE_DTYPE
+    """
+    decoded = decode_frames(frames, pixel_density)
+    states = np.zeros(len(decoded), dtype=STATE_DTYPE)
+    for name in ["zoom", "trans", "operator", "operand"]:
+        states[name] = decoded[name]
+    states["fill"] = units2fill(decoded["fill_units"], decoded["zoom"])
+    return states
@@ -0,0 +1,225 @@
+import os
+import time
+import argparse
+import multiprocessing
+import numpy as np
+from numberline.constants import *
+from numberline.ai import zoom_solution
+from numberline.recorder import TrajectoryRecorder
+
+"""
+Generates expert demonstrations of the numberline game with
+`zoom_solution` across a pool of processes and writes them as recorder
+shards (see `numberline.recorder`).
+
+The episodes are split into chunks. Each chunk is generated by a single
+worker into its own subdirectory and every episode of a chunk is seeded
+from a SeedSequence spawned for that chunk, so the output does not
+depend on the number of workers or on the order in which chunks finish.
+
+Usage:
+    $ python -m numberline.demos --out demos/ --n_episodes 100000
+"""
+
+def get_episode_seeds(seed, n_chunks, chunk_size):
+    """
+    Returns the seed of every episode of every chunk.
+
+    Args:
+      seed: int
+        the seed of the whole generation
+      n_chunks: int
+      chunk_size: int
+    Returns:
+      seeds: ndarray (n_chunks, chunk_size) of int64
+    """
+    seqs = np.random.SeedSequence(seed).spawn(n_chunks)
+    # 32 bit seeds as NumberLine.seed also seeds the global generator
+    seeds = [seq.generate_state(chunk_size, dtype=np.uint32) for seq in seqs]
+    return np.asarray(seeds).astype(np.int64)
+
+def check_task_stream(task_stream):
+    """
+    Raises a ValueError if tasks are streamed. A streamed episode only
+    ends at the step limit or on a failure, so the expert would play a
+    single episode until it outgrows the shard.
+
+    Args:
+      task_stream: bool
+    """
+    if task_stream:
+        raise ValueError("expert demos cannot be generated with task_stream")
+
+def generate_chunk(directory,
+                   seeds,
+                   env_kwargs=None,
+                   record_colors: bool=False,
+                   shard_size: int=2**16):
+    """
+    Generates one expert episode for each of the argued seeds into the
+    argued directory. The controller is only drawn if colors are
+    recorded.
+
+    Args:
+      directory: str
+      seeds: sequence of ints
+        the seed of each episode
+      env_kwargs: dict or None
+        keyword arguments for the NumberLine env
+      record_colors: bool
+        if true, the color of each grid unit is recorded with every
+        transition
+      shard_size: int
+        the number of transitions in each shard
+    Returns:
+      n_transitions: int
+        the total number of recorded transitions
+    Raises:
+      ValueError: if the env streams tasks
+    """
+    from numberline.envs import NumberLine
+    env = NumberLine(**(env_kwargs or dict()))
+    check_task_stream(env.task_stream)
+    rec = TrajectoryRecorder(
+        env,
+        directory,
+        shard_size=shard_size,
+        record_colors=record_colors,
+    )
+    contr = env.controller
+    n_transitions = 0
+    for seed in seeds:
+        seed = int(seed)
+        env.seed(seed)
+        env.reset()
+        rec.start_episode(seed)
+        done = False
+        while not done:
+            actn = zoom_solution(contr)
+            rew, done, n_steps = contr.apply_action(actn)
+            rew, done = env.step_hook(rew, done, n_steps)
+            obs = None
+            if record_colors:
+                contr.register.draw_register()
+                obs = contr.grid._grid
+            rec.add_transition(actn, rew, done, obs)
+            n_transitions += 1
+    rec.close()
+    return n_transitions
+
+def _generate_chunk(args):
+    return generate_chunk(**args)
+
+def generate_demos(directory,
+                   n_episodes: int,
+                   n_workers: int or None=None,
+                   seed: int=0,
+                   env_kwargs=None,
+                   record_colors: bool=False,
+                   chunk_size: int=1000,
+                   shard_size: int=2**16,
+                   verbose: bool=True):
+    """
+    Generates expert episodes across a pool of processes.
+
+    Args:
+      directory: str
+        the output directory. Each chunk of episodes is written into
+        the subdirectory chunk_<idx>. Use `recorder.list_shards` to
+        find all of the shards.
+      n_episodes: int
+        the total number of episodes
+      n_workers: int or None
+        the number of processes. defaults to the number of cpus
+      seed: int
+        the seed of the generation. Determines every episode.
+      env_kwargs: dict or None
+        keyword arguments for the NumberLine envs, e.g. targ_range and
+        operators
+      record_colors: bool
+        if true, the color of each grid unit is recorded with every
+        transition so that the frames can be recovered
+      chunk_size: int
+        the number of episodes generated by a worker at a time
+      shard_size: int
+        the number of transitions in each shard
+      verbose: bool
+        if true, the progress and throughput are printed as chunks
+        finish
+    Returns:
+      n_transitions: int
+        the total number of recorded transitions
+    Raises:
+      ValueError: if the env streams tasks
+    """
+    check_task_stream((env_kwargs or dict()).get("task_stream", False))
+    if n_workers is None: n_workers = os.cpu_count()
+    n_chunks = (n_episodes + chunk_size - 1)//chunk_size
+    seeds = get_episode_seeds(seed, n_chunks, chunk_size)
+    tasks = []
+    for i in range(n_chunks):
+        n = min(chunk_size, n_episodes - i*chunk_size)
+        tasks.append({
+            "directory": os.path.join(directory, "chunk_{:06d}".format(i)),
+            "seeds": seeds[i,:n],
+            "env_kwargs": env_kwargs,
+            "record_colors": record_colors,
+            "shard_size": shard_size,
+        })
+    start_t = time.time()
+    n_transitions = 0
+    n_done = 0
+    with multiprocessing.Pool(n_workers) as pool:
+        for n in pool.imap_unordered(_generate_chunk, tasks):
+            n_transitions += n
+            n_done += 1
+            if verbose:
+                elapsed = time.time() - start_t
+                print(
+                    "Chunks: {}/{} - Transitions: {} - {:.0f} trans/s".format(
+                        n_done, n_chunks, n_transitions,
+                        n_transitions/max(elapsed, 1e-9)
+                    ),
+                    flush=True
+                )
+    return n_transitions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generates expert numberline demonstrations"
+    )
+    parser.add_argument("--out", required=True,
+                        help="the output directory")
+    parser.add_argument("--n_episodes", type=int, required=True)
+    parser.add_argument("--n_workers", type=int, default=None,
+                        help="defaults to the number of cpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--targ_range", type=int, nargs=2, default=[1,100])
+    parser.add_argument("--init_range", type=int, nargs=2, default=[0,0])
+    parser.add_argument("--operators", nargs="+", default=[ADD, SUBTRACT],
+                        choices=OPERATORS)
+    parser.add_argument("--pixel_density", type=int, default=5)
+    parser.add_argument("--frames", action="store_true",
+                        help="record the unit colors of every frame")
+    parser.add_argument("--chunk_size", type=int, default=1000)
+    parser.add_argument("--shard_size", type=int, default=2**16)
+    args = parser.parse_args(argv)
+    env_kwargs = {
+        "targ_range": tuple(args.targ_range),
+        "init_range": tuple(args.init_range),
+        "operators": set(args.operators),
+        "pixel_density": args.pixel_density,
+    }
+    generate_demos(
+        args.out,
+        n_episodes=args.n_episodes,
+        n_workers=args.n_workers,
+        seed=args.seed,
+        env_kwargs=env_kwargs,
+        record_colors=args.frames,
+        chunk_size=args.chunk_size,
+        shard_size=args.shard_size,
+    )
+
+if __name__=="__main__":
+    main()
@@ -1,17 +1,185 @@
 import numpy as np
+try:
+    from gym import spaces
+except ImportError:
+    spaces = None
 
-class Discrete():
-    def __init__(self, n_actions):
-        self.dtype = np.int32
-        self.n = n_actions
-        self.actions = np.arange(self.n, dtype=self.dtype)
-        self.shape = self.actions.shape
+"""
+The action spaces subclass the gym spaces when gym is installed.
+Without gym they are plain classes with the same interface so that the
+core engine does not depend on gym. `rng` is the `np_random` of the gym
+space, so `seed` and `np_random` drive the same sampling.
+"""
+
+class _SharedGenerator:
+    """
+    Stores the generator of a space as gym's `_np_random` so that it can
+    be shared with an environment through `rng`.
+    """
+    @property
+    def rng(self):
+        return self.np_random
+
+    @rng.setter
+    def rng(self, rng):
+        self._np_random = rng
+
+    @property
+    def np_random(self):
+        if self._np_random is None: self.seed()
+        return self._np_random
+
+    def seed(self, seed=None):
+        """
+        Replaces the generator with a newly seeded one.
+
+        Args:
+          seed: int or None
+        """
+        self._np_random = np.random.default_rng(seed)
+        return [seed]
+
+class Discrete(_SharedGenerator,
+               spaces.Discrete if spaces is not None else object):
+    """
+    The action space of the numberline environments. It is a
+    `gym.spaces.Discrete` so that vectorization libraries can treat it
+    like any other gym space, but sampling is driven by a numpy
+    Generator that is usually shared with the environment.
+    """
+    def __init__(self, n_actions, rng=None):
+        """
+        Args:
+          n_actions: int
+            the number of actions
+          rng: numpy Generator or None
+            the generator used for sampling. if None, a new unseeded
+            generator is created.
+        """
+        if spaces is not None: super().__init__(n_actions)
+        else:
+            self.shape = ()
+            self.dtype = np.dtype(np.int64)
+            self.start = 0
+        self.n = int(n_actions)
+        self.actions = np.arange(self.n, dtype=np.int32)
+        if rng is None: rng = np.random.default_rng()
+        self.rng = rng
+
+    def contains(self, argument):
+        """
+        Returns true if the argument is a valid action. Runs in
+        constant time.
+
+        Args:
+          argument: int
+        """
+        try:
+            idx = int(argument)
+        except (TypeError, ValueError):
+            return False
+        return idx == argument and 0 <= idx < self.n
+
+    def sample(self, mask=None):
+        """
+        Samples uniformly from the actions, the same as
+        `gym.spaces.Discrete.sample`.
+
+        Args:
+          mask: ndarray (n,) of int8 or bool or None
+            if not None, only the actions with a mask of 1 are
+            sampled. 0 is returned if no action is valid.
+        Returns:
+          actn: int
+        """
+        if mask is None: return int(self.rng.integers(self.n))
+        valid = np.flatnonzero(np.asarray(mask) == 1)
+        if len(valid) == 0: return 0
+        return int(self.rng.choice(valid))
+
+    def sample_n(self, n):
+        """
+        Samples n actions uniformly in a single call.
+
+        Args:
+          n: int
+        Returns:
+          actns: ndarray (n,)
+        """
+        return self.rng.integers(self.n, size=n)
+
+class BatchDiscrete(_SharedGenerator,
+                    spaces.MultiDiscrete if spaces is not None else object):
+    """
+    The action space for a batch of numberline environments that each
+    use the same Discrete action set. Equivalent to the space that gym
+    vector envs create from a Discrete space.
+    """
+    def __init__(self, n_actions, n_envs, rng=None):
+        """
+        Args:
+          n_actions: int
+            the number of actions of each env
+          n_envs: int
+            the number of envs in the batch
+          rng: numpy Generator or None
+            the generator used for sampling. if None, a new unseeded
+            generator is created.
+        """
+        nvec = np.full(n_envs, n_actions, dtype=np.int64)
+        if spaces is not None: super().__init__(nvec)
+        else:
+            self.nvec = nvec
+            self.shape = nvec.shape
+            self.dtype = np.dtype(np.int64)
+        self.n = int(n_actions)
+        self.n_envs = int(n_envs)
+        if rng is None: rng = np.random.default_rng()
+        self.rng = rng
 
     def contains(self, argument):
-        for action in self.actions:
-            if action == argument:
-                return True
-        return False
+        """
+        Returns true if the argument holds a valid action for every
+        env in the batch.
+
+        Args:
+          argument: array like (n_envs,)
+        """
+        argument = np.asarray(argument)
+        if argument.shape != (self.n_envs,): return False
+        if argument.dtype.kind not in "iu":
+            if not np.array_equal(argument, argument.astype(np.int64)):
+                return False
+        return bool(np.all((argument >= 0) & (argument < self.n)))
+
+    def sample(self, mask=None):
+        """
+        Samples uniformly from the actions for every env, the same as
+        `gym.spaces.MultiDiscrete.sample`.
+
+        Args:
+          mask: array like (n_envs, n) of int8 or bool or None
+            if not None, only the actions with a mask of 1 are sampled
+            for each env, e.g. the masks of `batch.get_action_masks`.
+            0 is sampled for envs without a valid action.
+        Returns:
+          actns: ndarray (n_envs,)
+        """
+        if mask is None: return self.rng.integers(self.n, size=self.n_envs)
+        mask = np.asarray(mask) == 1
+        # The valid action with the largest random key is uniform over
+        # the valid actions
+        keys = self.rng.random(mask.shape)
+        keys[~mask] = -1
+        return np.argmax(keys, axis=-1).astype(np.int64)
+
+    def sample_n(self, n):
+        """
+        Samples n batches of actions uniformly in a single call.
 
-    def sample(self):
-        return np.random.choice(self.n)
+        Args:
+          n: int
+        Returns:
+          actns: ndarray (n, n_envs)
+        """
+        return self.rng.integers(self.n, size=(n, self.n_envs))
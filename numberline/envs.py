@@ -1,18 +1,29 @@
-import os, subprocess, time, signal
+import os, subprocess, time, signal, copy
 import gym
 from gym import error, spaces, utils
 from gym.utils import seeding
-from numberline import Discrete
+from numberline import register_envs
+from numberline.discrete import Discrete
 from numberline.controllers import *
+from numberline.cycles import CycleDetector
 from numberline.constants import *
 from numberline.utils import decompose, get_magnitude_counts
 import numpy as np
 
-try:
-    import matplotlib.pyplot as plt
-    import matplotlib
-except ImportError as e:
-    raise error.DependencyNotInstalled("{}. (HINT: see matplotlib documentation for installation https://matplotlib.org/faq/installing_faq.html#installation".format(e))
+def import_pyplot():
+    """
+    Imports matplotlib on the first render so that the envs can be used
+    headless without paying for, or installing, matplotlib.
+
+    Returns:
+        plt: module
+            matplotlib.pyplot
+    """
+    try:
+        import matplotlib.pyplot as plt
+    except ImportError as e:
+        raise error.DependencyNotInstalled("{}. (HINT: see matplotlib documentation for installation https://matplotlib.org/faq/installing_faq.html#installation".format(e))
+    return plt
 
 
 class NumberLine(gym.Env):
@@ -31,6 +42,14 @@ class NumberLine(gym.Env):
                  zoom_range: tuple or None=None,
                  scroll_range: tuple or None=None,
                  ep_reset: bool=True,
+                 macro_actions: bool=False,
+                 count_macro_steps: bool=True,
+                 cache_bytes: int or None=None,
+                 max_repeats: int or None=None,
+                 cycle_table_size: int=64,
+                 task_stream: bool=False,
+                 exact_tasks: bool=False,
+                 copy_obs: bool=True,
                  *args, **kwargs):
         """
         pixel_density: int
@@ -65,6 +84,47 @@ class NumberLine(gym.Env):
             if true, the value of the numberline resets after each
             episode. If false the value of the numberline persists
             through episodes.
+        macro_actions: bool
+            if true, the macro actions in
+            `numberline.constants.MACRO2IDX` can be argued to `step`.
+            Macros that take an argument are argued as (actn, arg)
+            tuples. The action space is then a Tuple of the action
+            index and the argument within `MACRO_ARG_RANGE`, which is
+            ignored by the actions that take no argument.
+        count_macro_steps: bool
+            if true, a macro action counts toward the step limit as
+            the number of primitive actions that it replaces. Thus the
+            episode step limit and the timeout penalty behave as if
+            the primitive actions had been taken. If false, each macro
+            counts as a single step.
+        cache_bytes: int or None
+            if not None, drawn frames are kept in a least recently used
+            cache with this byte budget and reused when the same view
+            is drawn again. The cache is available as
+            `self.controller.frame_cache`
+        max_repeats: int or None
+            if not None, the episode is truncated once a register state
+            (fill, zoom and translation) has been visited more than
+            this many times. The info of the truncating step has
+            "cycle" set to true and the reward is -1, the same as for
+            reaching the step limit. See `numberline.cycles`
+        cycle_table_size: int
+            the number of slots of the table of visit counts. Must be
+            a power of 2.
+        task_stream: bool
+            if true, a successful END_GAME issues the next task in
+            place instead of ending the episode. The fill, view and
+            step count carry over, the step limit is extended by the
+            budget of the new task and only the meta units of the grid
+            are redrawn. The info of the step has "new_task" set to
+            true. An unsuccessful END_GAME still ends the episode.
+        exact_tasks: bool
+            if true, the games sampled at reset and the tasks of a
+            task stream only have integer operands, see
+            `numberline.tasks`
+        copy_obs: bool
+            if false, observations are read-only views of the grid that
+            are overwritten by the next step. See `Controller.copy_obs`
         """
         self._targ_range = targ_range
         self._pixel_density = pixel_density
@@ -75,6 +135,12 @@ class NumberLine(gym.Env):
         self._zoom_range = zoom_range
         self._scroll_range = scroll_range
         self._ep_reset = ep_reset
+        self._macro_actions = macro_actions
+        self._task_stream = task_stream
+        self._exact_tasks = exact_tasks
+        self.count_macro_steps = count_macro_steps
+        self.cache_bytes = cache_bytes
+        self._copy_obs = copy_obs
 
         # ENVIRONMENT SPECIFIC MEMBERS
         # tracks number of steps in episode
@@ -82,11 +148,45 @@ class NumberLine(gym.Env):
         # limits number of steps per episode. Set in `self.reset()`
         self.max_steps = 0
         self.viewer = None
-        self.action_space = Discrete(7)
+        self.cycles = None
+        if max_repeats is not None:
+            self.cycles = CycleDetector(max_repeats, cycle_table_size)
         self.set_controller()
+        self.action_space = self.make_action_space()
         self.grid = self.controller.grid
+        # The meta units hold unbounded values, like the translation
+        self.observation_space = spaces.Box(
+            low=-np.inf,
+            high=np.inf,
+            shape=self.grid.raw_shape,
+            dtype=self.controller.get_obs().dtype,
+        )
         self.register = self.controller.register
 
+    def make_action_space(self):
+        """
+        Returns the action space of the env. It shares the generator of
+        the controller.
+
+        Returns:
+            space: Discrete or gym.spaces.Tuple
+                a Tuple of the action index and the macro argument if
+                macro actions are enabled
+        """
+        rng = self.controller.rng
+        if not self.macro_actions:
+            return Discrete(len(IDX2ACTION), rng=rng)
+        return spaces.Tuple((
+            Discrete(len(IDX2ACTION)+len(IDX2MACRO), rng=rng),
+            spaces.Box(
+                low=MACRO_ARG_RANGE[0],
+                high=MACRO_ARG_RANGE[1],
+                shape=(),
+                dtype=np.int64,
+                seed=rng,
+            ),
+        ))
+
     def set_controller(self):
         """
         Must override this function and set a member `self.controller`
@@ -100,7 +200,12 @@ class NumberLine(gym.Env):
             is_discrete=self.is_discrete,
             zoom_range=self.zoom_range,
             scroll_range=self.scroll_range,
-            ep_reset=self.ep_reset
+            ep_reset=self.ep_reset,
+            macro_actions=self.macro_actions,
+            cache_bytes=self.cache_bytes,
+            task_stream=self.task_stream,
+            exact_tasks=self._exact_tasks,
+            copy_obs=self._copy_obs,
         )
 
     @property
@@ -239,10 +344,66 @@ class NumberLine(gym.Env):
         self._ep_reset = new_val
         self.controller.ep_reset = new_val
 
+    @property
+    def macro_actions(self):
+        return self._macro_actions
+
+    @macro_actions.setter
+    def macro_actions(self, new_val):
+        """
+        new_val: bool
+            if true, the macro actions in
+            `numberline.constants.MACRO2IDX` can be argued to `step`.
+        """
+        self._macro_actions = new_val
+        self.controller.macro_actions = new_val
+        self.action_space = self.make_action_space()
+
+    @property
+    def copy_obs(self):
+        return self._copy_obs
+
+    @copy_obs.setter
+    def copy_obs(self, new_val):
+        """
+        new_val: bool
+            if false, observations are read-only views of the grid.
+        """
+        self._copy_obs = new_val
+        self.controller.copy_obs = new_val
+
+    @property
+    def task_stream(self):
+        return self._task_stream
+
+    @task_stream.setter
+    def task_stream(self, new_val):
+        """
+        new_val: bool
+            if true, a successful END_GAME issues the next task in
+            place instead of ending the episode.
+        """
+        self._task_stream = new_val
+        self.controller.task_stream = new_val
+
+    @property
+    def exact_tasks(self):
+        return self._exact_tasks
+
+    @exact_tasks.setter
+    def exact_tasks(self, new_val):
+        """
+        new_val: bool
+            if true, the games sampled at reset only have integer
+            operands.
+        """
+        self._exact_tasks = new_val
+        self.controller.exact_tasks = new_val
+
     def step(self, action):
         """
         Args:
-            action: int
+            action: int or tuple (int, arg)
                 the action should be an int of either a direction or
                 a grab command
                     0: null action
@@ -251,6 +412,9 @@ class NumberLine(gym.Env):
                     3: move down one unit
                     4: move left one unit
                     5: grab/drop object
+                if macro actions are enabled, macros with arguments
+                are argued as (actn, arg) tuples. See
+                `numberline.constants.IDX2MACRO`
         Returns:
             last_obs: ndarray
                 the observation
@@ -259,43 +423,270 @@ class NumberLine(gym.Env):
             done: bool
                 if true, the episode has ended
             info: dict
-                whatever information the game contains
+                whatever information the game contains. "cycle" is
+                true if the episode was truncated for repeating a
+                state, see `max_repeats`
         """
-        self.step_count += 1
         self.last_obs,rew,done,info = self.controller.step(action)
-        if self.step_count > self.max_steps: done = True
-        elif self.step_count == self.max_steps and rew == 0:
-            rew = -1
-            done = True
+        rew, done = self.update_step_count(rew, done, info["n_steps"])
+        if info["new_task"] and not done: self.start_next_task()
+        info["cycle"] = False
+        if self.cycles is not None and not done:
+            rew, done = self.update_cycles(rew, done)
+            info["cycle"] = done
         return self.last_obs, rew, done, info
 
-    def reset(self, targ_val=None, operator=None):
-        self.controller.reset(
-            targ_val=targ_val,
-            operator=operator
-        )
-        mag_counts = get_magnitude_counts(self.controller.targ_val)
+    def set_atlas(self, atlas):
+        """
+        Sets the observation atlas of the controller. Observations of
+        states in the atlas are then returned as read-only views into
+        the atlas. See `numberline.atlas`
+
+        Args:
+            atlas: ObservationAtlas or None
+        """
+        self.controller.atlas = atlas
+
+    def get_action_mask(self):
+        """
+        Returns the mask of legal primitive actions for the current
+        state. The same mask is included in the info of each step as
+        "action_mask".
+
+        Returns:
+            mask: ndarray (7,) of bools
+                true for each action that is legal under the zoom and
+                scroll ranges
+        """
+        return self.controller.register.get_action_mask()
+
+    def get_task_steps(self, val):
+        """
+        Returns the step budget of a task that requires changing the
+        fill by the argued value.
+
+        Args:
+            val: int or float
+        Returns:
+            n_steps: int
+        """
+        mag_counts = get_magnitude_counts(val)
         n_zooms = len(mag_counts)
         n_fills = np.sum(list(mag_counts.values()))
         n_trans = n_fills
         n_actns = n_zooms + n_fills + n_trans
-        self.max_steps = n_actns + ARBITRARY_MAX_STEPS
+        return n_actns + ARBITRARY_MAX_STEPS
+
+    def start_next_task(self):
+        """
+        Extends the step limit by the budget of the task that the
+        controller issued in place and clears the cycle counts, as
+        states may be revisited under the new task.
+        """
+        contr = self.controller
+        dist = contr.targ_val - contr.register.fill
+        self.max_steps = self.step_count + self.get_task_steps(dist)
+        if self.cycles is not None:
+            self.cycles.reset(contr.register.get_state_key())
+
+    def update_cycles(self, rew, done):
+        """
+        Counts the visit to the current register state and truncates
+        the episode if the state has been visited more than
+        `max_repeats` times.
+
+        Args:
+            rew: float
+            done: bool
+        Returns:
+            rew: float
+            done: bool
+        """
+        key = self.controller.register.get_state_key()
+        if self.cycles.add(key) and not done:
+            if rew == 0: rew = -1
+            done = True
+        return rew, done
+
+    def update_step_count(self, rew, done, n_steps):
+        """
+        Increments the step count and enforces the step limit of the
+        episode.
+
+        Args:
+            rew: float
+                the reward from the controller
+            done: bool
+                the done signal from the controller
+            n_steps: int
+                the number of primitive actions the action amounts to
+        Returns:
+            rew: float
+                the reward after applying the step limit
+            done: bool
+                the done signal after applying the step limit
+        """
+        prev_count = self.step_count
+        if self.count_macro_steps: self.step_count += n_steps
+        else: self.step_count += 1
+        if prev_count >= self.max_steps: done = True
+        elif self.step_count >= self.max_steps and rew == 0:
+            rew = -1
+            done = True
+        return rew, done
+
+    def step_sequence(self, actions, frame_stride=None, return_states=True):
+        """
+        Applies a whole sequence of actions in a single call. The
+        sequence stops early when the episode ends, either from the
+        END_GAME action, from the step limit or from a detected cycle.
+        Intermediate frames are only rendered if requested.
+
+        Args:
+            actions: sequence of ints or (int, arg) tuples
+                the actions to apply in order
+            frame_stride: int or None
+                if None, no frames are returned. Otherwise the
+                observation following every frame_stride-th action is
+                returned.
+            return_states: bool
+                if false, states is None
+        Returns:
+            frames: ndarray (N, H, W) or None
+                the requested observations
+            rews: ndarray (T,)
+            dones: ndarray (T,)
+            states: ndarray (T,) of dtype `STATE_DTYPE` or None
+                the register state after each applied action. Fills
+                and translations beyond the range of the record are
+                recorded as `registry.RECORD_OVERFLOW`
+        """
+        frames,rews,dones,states = self.controller.step_sequence(
+            actions,
+            frame_stride=frame_stride,
+            step_hook=self.step_hook,
+            return_states=return_states
+        )
+        self.last_obs = self.controller.get_obs()
+        return frames, rews, dones, states
+
+    def step_hook(self, rew, done, n_steps):
+        """
+        Applies the step limit and the cycle detection to the outcome
+        of an action that was applied by the controller.
+
+        Args:
+            rew: float
+            done: bool
+            n_steps: int
+                the number of primitive actions the action amounts to
+        Returns:
+            rew: float
+            done: bool
+        """
+        rew, done = self.update_step_count(rew, done, n_steps)
+        if self.controller.new_task and not done: self.start_next_task()
+        if self.cycles is not None and not done:
+            rew, done = self.update_cycles(rew, done)
+        return rew, done
+
+    def reset(self, targ_val=None, operator=None, init_val=None):
+        self.last_obs = self.controller.reset(
+            targ_val=targ_val,
+            operator=operator,
+            init_val=init_val
+        )
+        self.max_steps = self.get_task_steps(self.controller.targ_val)
         self.step_count = 0
-        self.last_obs = self.controller.grid.grid
+        if self.cycles is not None:
+            self.cycles.reset(self.controller.register.get_state_key())
         return self.last_obs
 
+    def get_state(self):
+        """
+        Returns the compact state of the environment, for example to
+        branch during tree search. The state can be restored with
+        `set_state`.
+
+        Returns:
+            state: tuple (controller_state, step_count, max_steps,
+                          cycle_state)
+                see `Controller.get_state` for controller_state and
+                `CycleDetector.get_state` for cycle_state, which is
+                None if cycles are not detected
+        """
+        cycle_state = None
+        if self.cycles is not None: cycle_state = self.cycles.get_state()
+        return (
+            self.controller.get_state(),
+            self.step_count,
+            self.max_steps,
+            cycle_state,
+        )
+
+    def set_state(self, state):
+        """
+        Restores a state returned by `get_state`. The grid is only
+        redrawn when the next observation is needed.
+
+        Args:
+            state: tuple (controller_state, step_count, max_steps,
+                          cycle_state)
+        """
+        contr_state, self.step_count, self.max_steps, cycle_state = state
+        self.controller.set_state(contr_state)
+        if self.cycles is not None: self.cycles.set_state(cycle_state)
+        self.last_obs = None
+
+    def clone(self):
+        """
+        Returns an independent copy of the environment without deep
+        copying any pixel arrays or the viewer. The grid of the copy is
+        drawn lazily.
+
+        Returns:
+            env: NumberLine
+        """
+        env = copy.copy(self)
+        env.controller = self.controller.clone()
+        env.grid = env.controller.grid
+        env.register = env.controller.register
+        env.action_space = env.make_action_space()
+        if self.cycles is not None: env.cycles = self.cycles.clone()
+        env.viewer = None
+        env.last_obs = None
+        return env
+
     def render(self, mode='human', close=False, frame_speed=.1):
+        plt = import_pyplot()
         if self.viewer is None:
             self.fig = plt.figure()
             self.viewer = self.fig.add_subplot(111)
             plt.ion()
             self.fig.show()
         else:
+            if self.last_obs is None:
+                self.last_obs = self.controller.observe()
             self.viewer.clear()
             self.viewer.imshow(self.last_obs)
             plt.pause(frame_speed)
         self.fig.canvas.draw()
 
+    @property
+    def rng(self):
+        """
+        The numpy Generator that drives the sampling of games and of
+        the action space.
+        """
+        return self.controller.rng
+
     def seed(self, x):
         np.random.seed(x)
+        self.controller.rng = np.random.default_rng(x)
+        self.action_space = self.make_action_space()
+        return [x]
+
 
+# gym is imported by now, so the envs can be made with gym.make even if
+# numberline was imported before gym
+register_envs()
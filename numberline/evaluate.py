@@ -0,0 +1,367 @@
+import os
+import json
+import hashlib
+import multiprocessing
+import numpy as np
+from numberline.constants import *
+from numberline.ai import zoom_solution
+
+"""
+Evaluates policies on a fixed suite of tasks across a process pool.
+
+A suite is an array of (init_val, operator, targ_val, seed) tasks that
+is generated deterministically by `make_suite`. Any `Oracle`-style
+callable, `policy(env) -> action`, can be evaluated. Every task is
+played once by the policy and once by `zoom_solution`, whose number of
+steps is the reference for the optimality gap.
+
+Results can be cached in a directory keyed by the policy id and the
+hash of the env config. The results are cached per task, so evaluating
+a grown suite only runs the tasks that have not been played yet.
+"""
+
+# The layout of a task of a suite
+TASK_DTYPE = np.dtype([
+    ("init_val", np.int64),
+    ("operator", np.int8),
+    ("targ_val", np.int64),
+    ("seed", np.int64),
+])
+
+# The layout of the result of a task
+RESULT_DTYPE = np.dtype([
+    ("task", TASK_DTYPE),
+    ("success", bool),
+    ("n_steps", np.int64),
+    ("expert_steps", np.int64),
+    ("rew", np.float64),
+])
+
+def make_suite(init_range: tuple=(0,0),
+               targ_range: tuple=(1,100),
+               operators: list or set={ADD, SUBTRACT},
+               n_tasks: int or None=None,
+               seed: int=0):
+    """
+    Creates a deterministic suite of tasks.
+
+    Args:
+        init_range: tuple of inclusive ints
+        targ_range: tuple of inclusive ints
+        operators: list or set of str
+        n_tasks: int or None
+            if None, every combination of initial value, operator and
+            target value is included. Otherwise n_tasks tasks are
+            sampled uniformly with replacement.
+        seed: int
+            determines the sampled tasks and the seeds of the tasks,
+            see `get_task_seeds`
+    Returns:
+        suite: ndarray (N,) of dtype TASK_DTYPE
+    """
+    rng = np.random.default_rng(seed)
+    ops = np.asarray(sorted(OPERATOR2IDX[op] for op in operators))
+    inits = np.arange(init_range[0], init_range[1]+1)
+    targs = np.arange(targ_range[0], targ_range[1]+1)
+    if n_tasks is None:
+        grid = np.meshgrid(inits, ops, targs, indexing="ij")
+        inits, ops, targs = [g.ravel() for g in grid]
+    else:
+        inits = rng.choice(inits, n_tasks)
+        ops = rng.choice(ops, n_tasks)
+        targs = rng.choice(targs, n_tasks)
+    suite = np.zeros(len(inits), dtype=TASK_DTYPE)
+    suite["init_val"] = inits
+    suite["operator"] = ops
+    suite["targ_val"] = targs
+    suite["seed"] = get_task_seeds(suite, seed)
+    return suite
+
+def splitmix64(x):
+    """
+    Scrambles unsigned 64 bit integers with the splitmix64 finalizer.
+
+    Args:
+        x: ndarray of uint64
+    Returns:
+        x: ndarray of uint64
+    """
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30)))*np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27)))*np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def get_task_seeds(suite, seed: int=0):
+    """
+    Derives the seed of each task from its contents so that a task
+    keeps its seed, and thus its cached result, in any suite.
+
+    Args:
+        suite: ndarray (N,) of dtype TASK_DTYPE
+        seed: int
+    Returns:
+        seeds: ndarray (N,) of int64 in [0, 2**32)
+    """
+    h = np.full(len(suite), seed, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for name in ["init_val", "operator", "targ_val"]:
+            vals = suite[name].astype(np.int64).view(np.uint64)
+            h = splitmix64(h ^ vals)
+    return (h >> np.uint64(32)).astype(np.int64)
+
+def get_config_hash(env_kwargs=None):
+    """
+    Returns a hash of the env config under which a suite is played.
+
+    Args:
+        env_kwargs: dict or None
+    Returns:
+        config_hash: str
+    """
+    config = json.dumps(
+        env_kwargs or dict(),
+        sort_keys=True,
+        default=lambda x: sorted(x) if isinstance(x, set) else str(x)
+    )
+    return hashlib.sha1(config.encode()).hexdigest()[:16]
+
+def get_suite_hash(suite, env_kwargs=None):
+    """
+    Returns a hash of the argued suite and env config.
+
+    Args:
+        suite: ndarray (N,) of dtype TASK_DTYPE
+        env_kwargs: dict or None
+    Returns:
+        suite_hash: str
+    """
+    h = hashlib.sha1(np.ascontiguousarray(suite).tobytes())
+    h.update(get_config_hash(env_kwargs).encode())
+    return h.hexdigest()[:16]
+
+def check_task_stream(task_stream):
+    """
+    Raises a ValueError if tasks are streamed. A streamed episode does
+    not end when its task is solved, so the task could not be scored.
+
+    Args:
+        task_stream: bool
+    """
+    if task_stream:
+        raise ValueError("tasks cannot be evaluated with task_stream")
+
+def play_task(env, policy, task):
+    """
+    Plays a single task with the policy and with the expert.
+
+    Args:
+        env: NumberLine
+        policy: callable
+            `policy(env) -> action`
+        task: numpy record of dtype TASK_DTYPE
+    Returns:
+        result: tuple
+            a row of RESULT_DTYPE
+    Raises:
+        ValueError: if the env streams tasks
+    """
+    check_task_stream(env.task_stream)
+    seed = int(task["seed"])
+    kwargs = {
+        "targ_val": int(task["targ_val"]),
+        "operator": IDX2OPERATOR[int(task["operator"])],
+        "init_val": int(task["init_val"]),
+    }
+    # Oracles such as RandOracle use the global generator
+    np.random.seed(seed)
+    env.seed(seed)
+    env.reset(**kwargs)
+    done = False
+    rew = 0
+    while not done:
+        _, rew, done, _ = env.step(policy(env))
+    n_steps = env.step_count
+
+    # The expert plays the same task without drawing
+    env.reset(**kwargs)
+    contr = env.controller
+    done = False
+    while not done:
+        r, done, n = contr.apply_action(zoom_solution(contr))
+        _, done = env.step_hook(r, done, n)
+    expert_steps = env.step_count
+    return (task, rew > 0, n_steps, expert_steps, rew)
+
+# The policy and env of each worker process
+_worker = dict()
+
+def _init_worker(policy, env_kwargs):
+    from numberline.envs import NumberLine
+    _worker["policy"] = policy
+    _worker["env"] = NumberLine(**(env_kwargs or dict()))
+
+def _play_tasks(tasks):
+    env, policy = _worker["env"], _worker["policy"]
+    results = np.zeros(len(tasks), dtype=RESULT_DTYPE)
+    for i,task in enumerate(tasks):
+        results[i] = play_task(env, policy, task)
+    return results
+
+def run_tasks(tasks,
+              policy,
+              env_kwargs=None,
+              n_workers: int or None=None,
+              chunk_size: int=64):
+    """
+    Plays the argued tasks across a process pool.
+
+    Args:
+        tasks: ndarray (N,) of dtype TASK_DTYPE
+        policy: callable
+            `policy(env) -> action`
+        env_kwargs: dict or None
+            keyword arguments for the NumberLine envs
+        n_workers: int or None
+            the number of processes. defaults to the number of cpus. if
+            0, the tasks are played in the calling process.
+        chunk_size: int
+            the number of tasks sent to a worker at a time
+    Returns:
+        results: ndarray (N,) of dtype RESULT_DTYPE
+            in the order of the tasks
+    Raises:
+        ValueError: if the env streams tasks
+    """
+    check_task_stream((env_kwargs or dict()).get("task_stream", False))
+    chunks = [
+        tasks[i:i+chunk_size] for i in range(0, len(tasks), chunk_size)
+    ]
+    if len(chunks) == 0: return np.zeros(0, dtype=RESULT_DTYPE)
+    if n_workers == 0:
+        _init_worker(policy, env_kwargs)
+        results = [_play_tasks(chunk) for chunk in chunks]
+        _worker.clear()
+    else:
+        if n_workers is None: n_workers = os.cpu_count()
+        # The policy is passed to the workers at creation, so it does
+        # not need to be picklable with the fork start method
+        with multiprocessing.Pool(
+                n_workers,
+                initializer=_init_worker,
+                initargs=(policy, env_kwargs)) as pool:
+            results = pool.map(_play_tasks, chunks)
+    return np.concatenate(results)
+
+def get_magnitudes(vals):
+    """
+    Returns the base 10 magnitude of each value, 0 for zeros.
+
+    Args:
+        vals: ndarray of ints
+    Returns:
+        mags: ndarray of ints
+    """
+    absvals = np.abs(np.asarray(vals, dtype=np.float64))
+    mags = np.zeros(absvals.shape, dtype=np.int64)
+    nonzero = absvals > 0
+    mags[nonzero] = np.floor(np.log10(absvals[nonzero])).astype(np.int64)
+    return mags
+
+def summarize(results):
+    """
+    Aggregates the results of an evaluation.
+
+    Args:
+        results: ndarray (N,) of dtype RESULT_DTYPE
+    Returns:
+        summary: dict
+            "n_tasks": int
+            "success_rate": float
+            "mean_steps": float
+            "optimality_gap": float
+                the mean number of steps beyond the expert's over the
+                successful tasks. nan if there are none.
+            "by_magnitude": dict
+                the same statistics for the tasks of each target
+                magnitude
+    """
+    def stats(res):
+        success = res["success"]
+        gaps = res["n_steps"][success] - res["expert_steps"][success]
+        return {
+            "n_tasks": len(res),
+            "success_rate": float(np.mean(success)) if len(res) else 0.,
+            "mean_steps": float(np.mean(res["n_steps"])) if len(res) else 0.,
+            "optimality_gap": float(np.mean(gaps)) if len(gaps) else np.nan,
+        }
+    summary = stats(results)
+    mags = get_magnitudes(results["task"]["targ_val"])
+    summary["by_magnitude"] = {
+        int(mag): stats(results[mags == mag]) for mag in np.unique(mags)
+    }
+    return summary
+
+def evaluate(policy,
+             suite,
+             env_kwargs=None,
+             policy_id: str or None=None,
+             cache_dir: str or None=None,
+             n_workers: int or None=None,
+             chunk_size: int=64):
+    """
+    Evaluates the policy on the suite. Cached results are reused and
+    only the tasks that have not been played are run.
+
+    Args:
+        policy: callable
+            `policy(env) -> action`, for example an Oracle
+        suite: ndarray (N,) of dtype TASK_DTYPE
+            see `make_suite`
+        env_kwargs: dict or None
+            keyword arguments for the NumberLine envs
+        policy_id: str or None
+            identifies the policy in the cache, e.g. a checkpoint name.
+            Required to use the cache.
+        cache_dir: str or None
+            the directory of the cached results. if None, nothing is
+            cached.
+        n_workers: int or None
+            see `run_tasks`
+        chunk_size: int
+            see `run_tasks`
+    Returns:
+        summary: dict
+            see `summarize`. Also includes "suite_hash".
+        results: ndarray (N,) of dtype RESULT_DTYPE
+            in the order of the suite
+    """
+    use_cache = cache_dir is not None and policy_id is not None
+    cached = np.zeros(0, dtype=RESULT_DTYPE)
+    if use_cache:
+        path = os.path.join(
+            cache_dir,
+            "{}_{}.npy".format(policy_id, get_config_hash(env_kwargs))
+        )
+        if os.path.exists(path): cached = np.load(path)
+    task2row = {task.tobytes(): i for i,task in enumerate(cached["task"])}
+    is_new = np.asarray([
+        task.tobytes() not in task2row for task in suite
+    ], dtype=bool)
+    new_tasks = np.unique(suite[is_new])
+    new_results = run_tasks(
+        new_tasks,
+        policy,
+        env_kwargs=env_kwargs,
+        n_workers=n_workers,
+        chunk_size=chunk_size
+    )
+    cached = np.concatenate([cached, new_results])
+    if use_cache and len(new_results) > 0:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.save(path, cached)
+    task2row = {task.tobytes(): i for i,task in enumerate(cached["task"])}
+    rows = [task2row[task.tobytes()] for task in suite]
+    results = cached[rows]
+    summary = summarize(results)
+    summary["suite_hash"] = get_suite_hash(suite, env_kwargs)
+    return summary, results
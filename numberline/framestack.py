@@ -0,0 +1,255 @@
+import numpy as np
+
+"""
+Frame stacking for the numberline environments. Stacked observations
+are handed out as zero-copy views into a single preallocated buffer
+rather than concatenated copies of the last k frames.
+
+The buffer holds `capacity` frames along its first axis. Each new frame
+is written once into the slot following the most recent frame, so the
+last k frames always occupy a contiguous block of the buffer and the
+stacked observation is just a slice of it. When the write head reaches
+the end of the buffer, the most recent k-1 frames are moved to the
+front in a single memmove, which amortizes to (k-1)/(capacity-k+1)
+extra frame writes per step.
+"""
+class FrameBuffer:
+    def __init__(self, n_frames: int=4, capacity: int or None=None):
+        """
+        Args:
+          n_frames: int
+            the number of frames in each stacked observation
+          capacity: int or None
+            the number of frames held by the preallocated buffer. Must
+            be at least n_frames. Larger capacities make rollovers
+            less frequent and keep returned stacks valid for longer.
+            defaults to 4*n_frames
+        """
+        if capacity is None: capacity = 4*n_frames
+        assert n_frames >= 1
+        assert capacity >= n_frames
+        self._n_frames = n_frames
+        self._capacity = capacity
+        self._buffer = None
+        self._head = -1
+
+    @property
+    def n_frames(self):
+        """
+        Returns:
+          n_frames: int
+            the number of frames in each stacked observation
+        """
+        return self._n_frames
+
+    @property
+    def capacity(self):
+        """
+        Returns:
+          capacity: int
+            the number of frame slots in the preallocated buffer
+        """
+        return self._capacity
+
+    @property
+    def buffer(self):
+        """
+        Returns:
+          buffer: ndarray (capacity, *frame_shape) or None
+            the underlying buffer. None until the first reset.
+        """
+        return self._buffer
+
+    def allocate(self, frame):
+        """
+        Allocates the buffer using the shape and dtype of the argued
+        frame.
+
+        Args:
+          frame: ndarray
+            a single frame (or a batch of frames from a vector env)
+        """
+        frame = np.asarray(frame)
+        self._buffer = np.zeros(
+            (self.capacity, *frame.shape),
+            dtype=frame.dtype
+        )
+        self._head = -1
+
+    def reset(self, frame, env_idxs=None):
+        """
+        Fills every slot of the current stack with the argued frame.
+        This is the conventional way to start a new episode.
+
+        Args:
+          frame: ndarray
+            the first frame of the episode. If env_idxs is not None,
+            the frame should only contain the entries for those envs.
+          env_idxs: None or array like of ints
+            for batched frames from a vector env, only the stacks of
+            the argued envs are reset. if None, all stacks are reset.
+        """
+        frame = np.asarray(frame)
+        if self._buffer is None or (
+                env_idxs is None and frame.shape!=self._buffer.shape[1:]):
+            self.allocate(frame)
+        k = self.n_frames
+        if env_idxs is None:
+            self._head = k-1
+            self._buffer[:k] = frame
+        else:
+            start = self._head-k+1
+            self._buffer[start:self._head+1, env_idxs] = frame
+
+    def push(self, frame):
+        """
+        Writes a new frame into the buffer, making it the most recent
+        frame of the stack.
+
+        Args:
+          frame: ndarray
+            the newest frame
+        """
+        if self._buffer is None:
+            self.reset(frame)
+            return
+        self._head += 1
+        if self._head >= self.capacity:
+            # Move the k-1 most recent frames to the front
+            k = self.n_frames
+            self._buffer[:k-1] = self._buffer[self.capacity-k+1:]
+            self._head = k-1
+        self._buffer[self._head] = frame
+
+    def stack(self, batch_first: bool=False):
+        """
+        Returns the last n_frames frames as a view into the buffer. The
+        view remains valid for at least capacity-n_frames subsequent
+        pushes. Copy it if it must be kept longer than that.
+
+        Args:
+          batch_first: bool
+            if true, the leading batch axis of vector env frames is
+            swapped in front of the stack axis. This is still a view.
+        Returns:
+          stack: ndarray (n_frames, *frame_shape)
+            the stacked frames, oldest first. If batch_first is true,
+            the shape is (n_envs, n_frames, *frame_shape[1:])
+        """
+        stack = self._buffer[self._head-self.n_frames+1:self._head+1]
+        if batch_first: return stack.swapaxes(0,1)
+        return stack
+
+class FrameStack:
+    """
+    Wraps a NumberLine env (or a vector env producing batched frames)
+    so that observations are the last n_frames frames stacked along
+    the first axis. All other attributes are forwarded to the wrapped
+    env.
+    """
+    def __init__(self,
+                 env,
+                 n_frames: int=4,
+                 capacity: int or None=None,
+                 n_envs: int or None=None):
+        """
+        Args:
+          env: NumberLine or vector env
+            the environment to wrap
+          n_frames: int
+            the number of frames in each stacked observation
+          capacity: int or None
+            the number of frames held by the preallocated buffer.
+            defaults to 4*n_frames
+          n_envs: int or None
+            the number of sub environments if env is a vector env. In
+            this case observations are returned with shape
+            (n_envs, n_frames, H, W), the stacks of sub envs that are
+            done are reset to their next observation and the action
+            masks of the info dict are stacked into a bool array of
+            shape (n_envs, 7). Vector envs with the gym 0.26 API, that
+            return (obs, info) from reset and (obs, rew, terminated,
+            truncated, info) from step, keep their API.
+        """
+        self.env = env
+        self.n_envs = n_envs
+        # Each frame is copied into the buffer, so the env can hand out
+        # views of its grid rather than copies of its own
+        if n_envs is None and hasattr(env, "copy_obs"):
+            env.copy_obs = False
+        self.frames = FrameBuffer(n_frames=n_frames, capacity=capacity)
+
+    def __getattr__(self, name):
+        return getattr(self.env, name)
+
+    def reset(self, *args, **kwargs):
+        """
+        Returns:
+            stack: ndarray
+                view of the stacked observations
+            info: dict
+                only returned if the wrapped env returns (obs, info)
+        """
+        out = self.env.reset(*args, **kwargs)
+        if isinstance(out, tuple):
+            obs, info = out
+            self.frames.reset(obs)
+            return self.get_stack(), self.stack_masks(info)
+        self.frames.reset(out)
+        return self.get_stack()
+
+    def step(self, action):
+        """
+        Args:
+            action: int or array of ints
+                the action(s) for the wrapped env
+        Returns:
+            stack: ndarray
+                view of the stacked observations
+            rew: float or ndarray
+            done: bool or ndarray
+                replaced by terminated and truncated if the wrapped
+                env returns both
+            info: dict or list of dicts
+        """
+        out = self.env.step(action)
+        obs, rew, info = out[0], out[1], self.stack_masks(out[-1])
+        done = out[2] if len(out) == 4 else np.logical_or(out[2], out[3])
+        self.frames.push(obs)
+        if self.n_envs is not None and np.any(done):
+            # Vector envs auto reset, so obs already holds the first
+            # frame of the next episode for the done envs.
+            idxs = np.flatnonzero(done)
+            self.frames.reset(np.asarray(obs)[idxs], env_idxs=idxs)
+        return (self.get_stack(), rew, *out[2:-1], info)
+
+    def get_stack(self):
+        """
+        Returns:
+            stack: ndarray
+                view of the stacked observations, batch first for
+                vector envs
+        """
+        return self.frames.stack(batch_first=self.n_envs is not None)
+
+    def stack_masks(self, info):
+        """
+        gym vector envs collect the action masks of the sub envs into
+        an object array. This stacks them into a single bool array.
+        The sub envs that were auto reset in the step have no mask in
+        the info dict, as flagged by info["_action_mask"], so their
+        rows allow every action.
+
+        Args:
+            info: dict or list of dicts
+        Returns:
+            info: dict or list of dicts
+        """
+        if self.n_envs is None or not isinstance(info, dict): return info
+        masks = info.get("action_mask")
+        if masks is None or np.asarray(masks).dtype != object: return info
+        stacked = np.ones((self.n_envs, 7), dtype=bool)
+        for i,mask in enumerate(masks):
+            if mask is not None: stacked[i] = mask
+        info["action_mask"] = stacked
+        return info
@@ -75,7 +75,7 @@ class Grid:
           zoom_idx: int
             The index of the zoom meta unit.
         """
-        return self.n_val_units + 1
+        return self.n_val_units + 0
 
     @property
     def operator_idx(self):
@@ -84,7 +84,7 @@ class Grid:
           operator_idx: int
             The index of the operator meta unit.
         """
-        return self.n_val_units + 2
+        return self.n_val_units + 1
 
     @property
     def operand_idx(self):
@@ -93,7 +93,7 @@ class Grid:
           operand_idx: int
             The index of the operand meta unit.
         """
-        return self.n_val_units + 3
+        return self.n_val_units + 2
 
     @property
     def trans_idx(self):
@@ -102,7 +102,7 @@ class Grid:
           trans_idx: int
             The index of the translation meta unit.
         """
-        return self.n_val_units + 4
+        return self.n_val_units + 3
 
     @property
     def density(self):
@@ -153,6 +153,18 @@ class Grid:
     def grid(self):
         return self._grid.copy()
 
+    def view(self):
+        """
+        Returns a read-only view of the grid array. The view reflects
+        every later draw, so it must be copied to be kept.
+
+        Returns:
+          grid: ndarray (H,W)
+        """
+        view = self._grid.view()
+        view.flags.writeable = False
+        return view
+
     @property
     def middle_row(self):
         """
@@ -311,6 +323,19 @@ class Grid:
         """
         self._grid = self.make_grid()
 
+    def clone(self):
+        """
+        Returns a new grid with the same specifications and a newly
+        allocated, cleared array. Nothing is drawn to the new grid.
+
+        Returns:
+          grid: Grid
+        """
+        grid = Grid.__new__(Grid)
+        grid.__dict__.update(self.__dict__)
+        grid._grid = np.full_like(self._grid, COLORS[DEFAULT])
+        return grid
+
     def clear_unit(self, coord):
         """
         Clears a single coordinate in place. More efficient than using
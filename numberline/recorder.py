@@ -0,0 +1,394 @@
+import os
+import json
+import numpy as np
+from numberline.constants import *
+from numberline.registry import STATE_DTYPE
+
+"""
+Records the transitions of a NumberLine env into compact memory mapped
+column arrays for offline learning.
+
+Transitions are written into shards. Each shard is a directory holding
+one preallocated .npy file per column with room for `shard_size`
+transitions:
+
+    actions.npy  (shard_size,) int16
+    rews.npy     (shard_size,) float32
+    dones.npy    (shard_size,) bool
+    states.npy   (shard_size,) STATE_DTYPE, the state after each action
+    colors.npy   (shard_size, n_units), optional. The color of each
+                 grid unit after each action. Frames are recovered
+                 with `batch.colors2frames`.
+
+and an episode index, episodes.npy, with the offset, length, seed,
+target value and initial state (and initial colors) of each episode.
+Episodes are never split across shards, so any episode is a slice of
+the columns of a single shard.
+
+Only primitive actions are recorded, so envs with macro actions are
+refused. States beyond the int64 range of STATE_DTYPE, e.g. at deep
+zooms, have the out of range fields recorded as
+`registry.RECORD_OVERFLOW`.
+"""
+
+def get_episode_dtype(n_units=None, color_dtype=np.float32):
+    """
+    Returns the dtype of the episode index of a shard.
+
+    Args:
+      n_units: int or None
+        the number of grid units if colors are recorded
+      color_dtype: numpy dtype
+    Returns:
+      dtype: numpy dtype
+    """
+    fields = [
+        ("offset", np.int64),
+        ("length", np.int64),
+        ("seed", np.int64),
+        ("targ_val", np.float64),
+        ("init_state", STATE_DTYPE),
+    ]
+    if n_units is not None:
+        fields.append(("init_colors", color_dtype, (n_units,)))
+    return np.dtype(fields)
+
+def get_unit_colors(grid):
+    """
+    Returns the color of each unit of the argued grid array. Every
+    pixel of a unit's drawing space has the unit's color, so the first
+    pixel of each unit is used.
+
+    Args:
+      grid: ndarray (pixel_density, n_units*pixel_density)
+    Returns:
+      colors: ndarray (n_units,)
+    """
+    return grid[0, ::grid.shape[0]]
+
+def check_primitive(env):
+    """
+    Raises a ValueError if the argued env has macro actions enabled.
+    The actions column only holds primitive action indices.
+
+    Args:
+      env: NumberLine
+    """
+    if env.controller.macro_actions:
+        raise ValueError(
+            "macro actions cannot be recorded, create the env with "
+            "macro_actions=False"
+        )
+
+class Shard:
+    """
+    A read-only view of a recorded shard. The columns are memory
+    mapped and trimmed to the number of recorded transitions, so
+    slicing an episode does not copy any data.
+    """
+    def __init__(self, path):
+        """
+        Args:
+          path: str
+            the directory of the shard
+        """
+        self.path = path
+        with open(os.path.join(path, "shard.json"), "r") as f:
+            self.config = json.load(f)
+        n = self.config["n_transitions"]
+        load = lambda name: np.load(
+            os.path.join(path, name+".npy"),
+            mmap_mode="r"
+        )[:n]
+        self.actions = load("actions")
+        self.rews = load("rews")
+        self.dones = load("dones")
+        self.states = load("states")
+        self.colors = None
+        if self.config["record_colors"]:
+            self.colors = load("colors")
+        self.episodes = np.load(os.path.join(path, "episodes.npy"))
+
+    def __len__(self):
+        return len(self.episodes)
+
+    @property
+    def n_transitions(self):
+        return len(self.actions)
+
+    def get_episode(self, idx):
+        """
+        Returns the columns of the argued episode as views into the
+        shard.
+
+        Args:
+          idx: int
+            the index of the episode within the shard
+        Returns:
+          episode: dict
+            keys: "actions", "rews", "dones", "states", "colors" and
+            the fields of the episode index
+        """
+        ep = self.episodes[idx]
+        span = slice(ep["offset"], ep["offset"]+ep["length"])
+        episode = {name: ep[name] for name in self.episodes.dtype.names}
+        episode["actions"] = self.actions[span]
+        episode["rews"] = self.rews[span]
+        episode["dones"] = self.dones[span]
+        episode["states"] = self.states[span]
+        episode["colors"] = None
+        if self.colors is not None: episode["colors"] = self.colors[span]
+        return episode
+
+def list_shards(directory):
+    """
+    Returns the paths of the shards within the argued directory and
+    its subdirectories, in sorted order.
+
+    Args:
+      directory: str
+    Returns:
+      paths: list of str
+    """
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        if "shard.json" in files: paths.append(root)
+    return paths
+
+class TrajectoryRecorder:
+    """
+    Wraps a NumberLine env and records every transition. All other
+    attributes are forwarded to the wrapped env. Call `close` to write
+    the final shard.
+    """
+    def __init__(self,
+                 env,
+                 directory: str,
+                 shard_size: int=2**16,
+                 record_colors: bool=False,
+                 color_dtype=np.float32):
+        """
+        Args:
+          env: NumberLine
+            the environment to record
+          directory: str
+            the directory that the shards are written into. created if
+            it does not exist.
+          shard_size: int
+            the number of transitions in each shard. A new shard is
+            started when the current one is full. Must be larger than
+            the longest episode.
+          record_colors: bool
+            if true, the color of each grid unit is recorded after
+            every step, which is enough to recover the frames.
+          color_dtype: numpy dtype
+            the dtype of the recorded colors
+        Raises:
+          ValueError: if the env has macro actions enabled
+        """
+        check_primitive(env)
+        self.env = env
+        self.directory = directory
+        self.shard_size = shard_size
+        self.record_colors = record_colors
+        self.color_dtype = np.dtype(color_dtype)
+        self.n_units = None
+        if record_colors:
+            self.n_units = env.controller.grid.n_val_units +\
+                           env.controller.grid.n_meta_units
+        self.episode_dtype = get_episode_dtype(
+            self.n_units,
+            self.color_dtype
+        )
+        os.makedirs(directory, exist_ok=True)
+        self.n_shards = 0
+        self.columns = None
+        self.episode = None
+        self.open_shard()
+
+    def __getattr__(self, name):
+        return getattr(self.env, name)
+
+    def open_shard(self):
+        """
+        Preallocates the columns of a new shard.
+        """
+        self.shard_path = os.path.join(
+            self.directory,
+            "shard_{:05d}".format(self.n_shards)
+        )
+        self.n_shards += 1
+        os.makedirs(self.shard_path, exist_ok=True)
+        dtypes = {
+            "actions": np.int16,
+            "rews": np.float32,
+            "dones": bool,
+            "states": STATE_DTYPE,
+        }
+        shapes = {name: (self.shard_size,) for name in dtypes}
+        if self.record_colors:
+            dtypes["colors"] = self.color_dtype
+            shapes["colors"] = (self.shard_size, self.n_units)
+        self.columns = {
+            name: np.lib.format.open_memmap(
+                os.path.join(self.shard_path, name+".npy"),
+                mode="w+",
+                dtype=dtypes[name],
+                shape=shapes[name],
+            ) for name in dtypes
+        }
+        self.episodes = []
+        self.n_transitions = 0
+
+    def close_shard(self):
+        """
+        Writes the episode index of the current shard and flushes its
+        columns.
+        """
+        episodes = np.asarray(self.episodes, dtype=self.episode_dtype)
+        np.save(os.path.join(self.shard_path, "episodes.npy"), episodes)
+        for column in self.columns.values():
+            column.flush()
+        config = {
+            "n_transitions": self.n_transitions,
+            "record_colors": self.record_colors,
+        }
+        with open(os.path.join(self.shard_path, "shard.json"), "w") as f:
+            json.dump(config, f)
+        self.columns = None
+
+    def end_episode(self):
+        """
+        Adds the current episode to the episode index.
+        """
+        if self.episode is None: return
+        self.episode["length"] = self.n_transitions-self.episode["offset"]
+        if self.episode["length"] > 0:
+            self.episodes.append(tuple(
+                self.episode[name] for name in self.episode_dtype.names
+            ))
+        self.episode = None
+
+    def reset(self, seed=None, **kwargs):
+        """
+        Resets the env and starts a new episode.
+
+        Args:
+          seed: int or None
+            if not None, the env is seeded before the reset so that the
+            episode can be reproduced. Recorded as -1 if None.
+          kwargs: dict
+            keyword arguments for the reset of the env
+        Returns:
+          obs: ndarray
+        """
+        self.end_episode()
+        if seed is not None: self.env.seed(seed)
+        obs = self.env.reset(**kwargs)
+        self.start_episode(seed, obs)
+        return obs
+
+    def start_episode(self, seed=None, obs=None):
+        """
+        Starts a new episode from the current state of the env. Use
+        this with `add_transition` to record an env that is stepped
+        without going through this wrapper.
+
+        Args:
+          seed: int or None
+            the seed of the episode. Recorded as -1 if None.
+          obs: ndarray or None
+            the first observation of the episode. Only used if colors
+            are recorded. if None, the grid of the env is used.
+        Raises:
+          ValueError: if the env has macro actions enabled
+        """
+        self.end_episode()
+        check_primitive(self.env)
+        contr = self.env.controller
+        self.episode = {
+            "offset": self.n_transitions,
+            "seed": -1 if seed is None else seed,
+            "targ_val": contr.targ_val,
+            "init_state": contr.register.get_record(saturate=True),
+        }
+        if self.record_colors:
+            if obs is None: obs = contr.observe()
+            self.episode["init_colors"] = get_unit_colors(obs)
+
+    def step(self, action):
+        """
+        Steps the env and records the transition.
+
+        Args:
+          action: int
+        Returns:
+          obs: ndarray
+          rew: float
+          done: bool
+          info: dict
+        """
+        obs, rew, done, info = self.env.step(action)
+        self.add_transition(action, rew, done, obs)
+        return obs, rew, done, info
+
+    def add_transition(self, action, rew, done, obs=None):
+        """
+        Records a transition that has already been applied to the env.
+        The register state is read from the env.
+
+        Args:
+          action: int
+          rew: float
+          done: bool
+          obs: ndarray or None
+            the observation following the action. Only used if colors
+            are recorded. if None, the grid of the env is used.
+        """
+        if self.n_transitions >= self.shard_size:
+            self.rollover()
+        contr = self.env.controller
+        t = self.n_transitions
+        self.columns["actions"][t] = action
+        self.columns["rews"][t] = rew
+        self.columns["dones"][t] = done
+        self.columns["states"][t] = contr.register.get_record(saturate=True)
+        if self.record_colors:
+            if obs is None: obs = contr.observe()
+            self.columns["colors"][t] = get_unit_colors(obs)
+        self.n_transitions += 1
+        if done: self.end_episode()
+
+    def rollover(self):
+        """
+        Closes the full shard and opens a new one. The transitions of
+        the episode in progress are moved to the new shard so that
+        episodes are never split across shards.
+        """
+        start = self.n_transitions
+        if self.episode is not None: start = self.episode["offset"]
+        if start == 0:
+            raise ValueError("episode is longer than shard_size")
+        partial = {
+            name: np.array(column[start:self.n_transitions])
+            for name, column in self.columns.items()
+        }
+        self.n_transitions = start
+        self.close_shard()
+        self.open_shard()
+        n = len(partial["actions"])
+        for name, column in self.columns.items():
+            column[:n] = partial[name]
+        self.n_transitions = n
+        if self.episode is not None: self.episode["offset"] = 0
+
+    def close(self):
+        """
+        Ends the current episode, writes the final shard and closes
+        the env.
+        """
+        if self.columns is not None:
+            self.end_episode()
+            self.close_shard()
+        self.env.close()
@@ -1,24 +1,408 @@
 from numberline.grid import Grid
 from numberline.constants import *
+from decimal import Decimal
 import math
 import numpy as np
 
+# The layout used to store register states in numpy arrays. The
+# operator is stored as its index in `constants.OPERATOR2IDX` and the
+# fill is stored as an integer count of units valued 10**FILL_EXP.
+STATE_DTYPE = np.dtype([
+    ("fill", np.int64),
+    ("zoom", np.int64),
+    ("trans", np.int64),
+    ("operator", np.int8),
+    ("operand", np.float64),
+])
+
+# Precomputed powers of ten for the fixed point arithmetic
+POW10 = tuple(10**i for i in range(64))
+
+# The largest fill and translation that fit in a STATE_DTYPE record
+MAX_RECORD_INT = int(np.iinfo(np.int64).max)
+
+# Stored in place of a fill or translation that is out of the range of
+# STATE_DTYPE. It is itself out of the range, so it never collides
+# with a recorded value.
+RECORD_OVERFLOW = int(np.iinfo(np.int64).min)
+
+# Colors of meta values too large to be represented as floats
+MAX_COLOR = np.finfo(np.float64).max
+
+def pow10(n):
+    """
+    Returns 10**n as an int using the precomputed table when possible.
+
+    Args:
+        n: int
+            must be non-negative
+    Returns:
+        power: int
+    """
+    if n < len(POW10): return POW10[n]
+    return 10**n
+
+def trunc_div(num, den):
+    """
+    Integer division that truncates toward zero like int(num/den) but
+    without the loss of precision of float division.
+
+    Args:
+        num: int
+        den: int
+            must be positive
+    Returns:
+        quotient: int
+    """
+    if num < 0: return -((-num)//den)
+    return num//den
+
+def to_fixed(val):
+    """
+    Converts a number to an exact fixed point pair (units, exp) such
+    that val == units*10**exp with exp <= 0. Floats are converted
+    using their shortest decimal representation, so 0.1 becomes
+    (1, -1) rather than the binary value nearest to 0.1.
+
+    Args:
+        val: int or float
+    Returns:
+        units: int
+        exp: int
+    """
+    if isinstance(val, (int, np.integer)): return int(val), 0
+    sign,digits,exp = Decimal(repr(float(val))).normalize().as_tuple()
+    units = 0
+    for digit in digits: units = units*10 + digit
+    if sign: units = -units
+    if exp > 0: return units*pow10(exp), 0
+    return units, exp
+
+def floor_log10(n):
+    """
+    Returns floor(log10(n)) computed exactly for a positive int of any
+    size. Unlike np.log10 this neither overflows nor rounds up for
+    values just below a power of ten.
+
+    Args:
+        n: int
+            must be positive
+    Returns:
+        log10: int
+    """
+    # 1233/4096 is just below log10(2), so the estimate is either
+    # exact or one too small
+    log10 = ((n.bit_length()-1)*1233) >> 12
+    if n >= pow10(log10+1): log10 += 1
+    return log10
+
+def trunc_log10(units, exp):
+    """
+    Returns int(log10(units*10**exp)), i.e. the log truncated toward
+    zero, computed exactly for any size of units and exp.
+
+    Args:
+        units: int
+            must be positive
+        exp: int
+    Returns:
+        log10: int
+    """
+    log10 = floor_log10(units)
+    # Truncating a negative non-integer log rounds up
+    if log10+exp < 0 and units != pow10(log10): return log10+exp+1
+    return log10+exp
+
+def int2color(num, den):
+    """
+    Divides an int by a positive denominator for use as a color,
+    saturating at the largest finite float instead of overflowing
+    when the int is too large to be converted to a float.
+
+    Args:
+        num: int
+        den: int or float
+    Returns:
+        color: float
+    """
+    try:
+        return num/den
+    except OverflowError:
+        return MAX_COLOR if num > 0 else -MAX_COLOR
+
 class Register:
     """
     The register handles tracking the meta variables of the game.
     i.e. the register tracks where the state of the game is in space,
     the current zoom level, the operators, the operator numbers, etc
     """
-    def __init__(self, grid: Grid):
+    def __init__(self,
+                 grid: Grid,
+                 zoom_range: tuple or None=None,
+                 scroll_range: tuple or None=None,
+                 frame_cache=None):
         """
         Args:
           grid: Grid
             the grid for the game
+          zoom_range: tuple of inclusive floats | None
+            the minimum and maximum zoom levels. zooms that would leave
+            the range are ignored. None means no limits.
+          scroll_range: tuple of inclusive ints | None
+            the minimum and maximum values that the center of the view
+            can be translated to. translations are clamped to the
+            range. None means no limits.
+          frame_cache: FrameCache or None
+            if not None, drawn frames are cached and reused when the
+            same view is drawn again. See `numberline.cache`
         """
         self.grid = grid
+        self.frame_cache = frame_cache
+        self.zoom_range = zoom_range
+        self.scroll_range = scroll_range
         self.reset()
         self.draw_register()
 
+    @property
+    def scroll_range(self):
+        return self._scroll_range
+
+    @scroll_range.setter
+    def scroll_range(self, new_range):
+        """
+        new_range: tuple of inclusive ints | None
+            the minimum and maximum values that the center of the view
+            can be translated to.
+        """
+        self._scroll_range = new_range
+        self._scroll_bounds = None
+        if new_range is not None:
+            self._scroll_bounds = tuple(to_fixed(b) for b in new_range)
+        # The scroll range in units is cached for a single zoom level
+        self._scroll_zoom = None
+        self._scroll_units = (None, None)
+
+    def get_scroll_units(self):
+        """
+        Returns the minimum and maximum translations, in units of the
+        current zoom level, that keep the center of the view within
+        the scroll range. Computed exactly.
+
+        Returns:
+            min_trans: int or None
+                None if there is no scroll range
+            max_trans: int or None
+                None if there is no scroll range
+        """
+        if self._scroll_bounds is None: return None, None
+        if self._scroll_zoom != self._zoom:
+            units = []
+            for i,(val, exp) in enumerate(self._scroll_bounds):
+                diff = exp - self._zoom
+                if diff >= 0: units.append(val*pow10(diff))
+                # ceil for the lower bound and floor for the upper
+                elif i == 0: units.append(-((-val)//pow10(-diff)))
+                else: units.append(val//pow10(-diff))
+            self._scroll_zoom = self._zoom
+            self._scroll_units = tuple(units)
+        return self._scroll_units
+
+    def get_action_mask(self):
+        """
+        Returns a mask of the primitive actions that change the state
+        of the register under the zoom and scroll ranges. Actions that
+        are masked out would be ignored by the register.
+
+        Returns:
+            mask: ndarray (len(IDX2ACTION),) of bools
+                true for each legal action. Indexed by ACTION2IDX
+        """
+        mask = np.ones(len(IDX2ACTION), dtype=bool)
+        if self.zoom_range is not None:
+            mask[ACTION2IDX[ZOOM_IN]] = self._zoom-1 >= self.zoom_range[0]
+            mask[ACTION2IDX[ZOOM_OUT]] = self._zoom+1 <= self.zoom_range[1]
+        if self._scroll_bounds is not None:
+            min_trans, max_trans = self.get_scroll_units()
+            mask[ACTION2IDX[RIGHT]] = self._trans+1 <= max_trans
+            mask[ACTION2IDX[LEFT]] = self._trans-1 >= min_trans
+        return mask
+
+    def get_state(self):
+        """
+        Returns the compact state of the register. This does not
+        include the grid, which is a pure function of the state.
+
+        Returns:
+            state: tuple
+                (fill, fill_exp, zoom, trans, operator, operand)
+                the fill is stored exactly as the integer fill in
+                units valued 10**fill_exp
+        """
+        return (
+            self._fill,
+            self._fill_exp,
+            self._zoom,
+            self._trans,
+            self._operator,
+            self._operand
+        )
+
+    def set_state(self, state):
+        """
+        Restores a state returned by `get_state`. The grid is not
+        redrawn until the next call to `draw_register` or `refresh`.
+
+        Args:
+            state: tuple
+                (fill, fill_exp, zoom, trans, operator, operand)
+        """
+        self._fill, self._fill_exp, self._zoom, self._trans,\
+            self._operator, self._operand = state
+        self.needs_draw = True
+
+    def get_state_key(self):
+        """
+        Returns a hash of the position of the register, the fill, zoom
+        and translation, for detecting repeated states within an
+        episode. The operator and operand are constant within an
+        episode and are left out.
+
+        Returns:
+            key: int
+        """
+        return hash((self._fill, self._fill_exp, self._zoom, self._trans))
+
+    def grid_is_current(self):
+        """
+        Returns true if the grid shows the current fill, zoom and
+        translation of the register, i.e. nothing but the operator and
+        operand changed since the last draw.
+
+        Returns:
+            is_current: bool
+        """
+        if self.needs_draw: return False
+        return self.drawn_key == self.get_state_key()
+
+    def get_record_fill(self):
+        """
+        Returns the fill as the count of 10**FILL_EXP units that is
+        stored in a `STATE_DTYPE` record, truncated toward zero.
+
+        Returns:
+            fill: int
+        """
+        diff = self._fill_exp - FILL_EXP
+        if diff >= 0: return self._fill*pow10(diff)
+        return trunc_div(self._fill, pow10(-diff))
+
+    def in_record_range(self):
+        """
+        Returns true if the fill and the translation fit in the int64
+        fields of a `STATE_DTYPE` record.
+
+        Returns:
+            in_range: bool
+        """
+        return abs(self._trans) <= MAX_RECORD_INT and\
+               abs(self.get_record_fill()) <= MAX_RECORD_INT
+
+    def get_record(self, saturate: bool=False):
+        """
+        Returns the state of the register in the field order of
+        `STATE_DTYPE` so that it can be assigned directly into a numpy
+        array of states.
+
+        Fills that are finer than 10**FILL_EXP are truncated toward
+        zero as they cannot be stored in the record. The register
+        itself is exact at any zoom, but a fill whose count of
+        10**FILL_EXP units, or a translation, is beyond the int64 range
+        cannot be recorded.
+
+        Args:
+            saturate: bool
+                if true, a fill or translation that is out of the
+                range is recorded as RECORD_OVERFLOW instead of raising
+        Returns:
+            record: tuple (fill, zoom, trans, operator_idx, operand)
+        Raises:
+            ValueError: if the fill or the translation is out of the
+                int64 range of the record and saturate is false
+        """
+        fill = self.get_record_fill()
+        trans = self._trans
+        if abs(fill) > MAX_RECORD_INT or abs(trans) > MAX_RECORD_INT:
+            if not saturate:
+                raise ValueError(
+                    "the register state (fill {}e{}, trans {}) is out "
+                    "of the int64 range of STATE_DTYPE".format(
+                        self._fill, self._fill_exp, self._trans
+                    )
+                )
+            if abs(fill) > MAX_RECORD_INT: fill = RECORD_OVERFLOW
+            if abs(trans) > MAX_RECORD_INT: trans = RECORD_OVERFLOW
+        return (
+            fill,
+            self._zoom,
+            trans,
+            OPERATOR2IDX[self._operator],
+            self._operand
+        )
+
+    def set_record(self, record):
+        """
+        Restores a state stored in the layout of `STATE_DTYPE`. The
+        grid is not redrawn until the next call to `draw_register` or
+        `refresh`.
+
+        Args:
+            record: tuple or numpy record of dtype STATE_DTYPE
+        Raises:
+            ValueError: if the record holds RECORD_OVERFLOW
+        """
+        fill, zoom, trans, operator, operand = record
+        if fill == RECORD_OVERFLOW or trans == RECORD_OVERFLOW:
+            raise ValueError("an overflowed record cannot be restored")
+        fill, fill_exp = int(fill), FILL_EXP
+        while fill_exp < 0 and fill % 10 == 0:
+            fill //= 10
+            fill_exp += 1
+        if fill == 0: fill_exp = 0
+        self.set_state((
+            fill,
+            fill_exp,
+            int(zoom),
+            int(trans),
+            IDX2OPERATOR[int(operator)],
+            operand.item() if hasattr(operand, "item") else operand
+        ))
+
+    def clone(self, grid=None):
+        """
+        Returns a copy of the register without drawing. The copy gets
+        its own grid so that it can be drawn independently. The frame
+        cache is shared.
+
+        Args:
+            grid: Grid or None
+                the grid of the copy. if None, a clone of this
+                register's grid is used.
+        Returns:
+            register: Register
+        """
+        reg = Register.__new__(Register)
+        reg.__dict__.update(self.__dict__)
+        reg.grid = self.grid.clone() if grid is None else grid
+        reg.needs_draw = True
+        return reg
+
+    def refresh(self):
+        """
+        Draws the register to the grid only if the state has been
+        restored or cloned since the last draw.
+        """
+        if self.needs_draw: self.draw_register()
+
     def reset(self, reset_fill=True):
         """
         Resets all member variables to their initial values.
@@ -29,7 +413,10 @@ class Register:
                 across multiple episodes.
         """
         if reset_fill:
+            # The fill is kept exactly as an integer count of units
+            # valued 10**self._fill_exp
             self._fill = 0
+            self._fill_exp = 0
         self._zoom = 0
         self._operator = ADD
         self._operand = 0
@@ -42,15 +429,45 @@ class Register:
         Returns the current value of the number line.
 
         Returns:
-            fill: int
+            fill: int or float
                 the amount of space that should be colored along the
-                numberline
+                numberline. The fill is tracked exactly, it is only
+                returned as the nearest float if it is not integral.
         """
-        return self._fill
+        if self._fill_exp == 0: return self._fill
+        scale = pow10(-self._fill_exp)
+        if self._fill % scale == 0: return self._fill//scale
+        return self._fill/scale
 
     @fill.setter
     def fill(self, new_fill):
-        self._fill = new_fill
+        self._fill, self._fill_exp = to_fixed(new_fill)
+
+    def fill_equals(self, val):
+        """
+        Exactly compares the fill to the argued value.
+
+        Args:
+            val: int or float
+        Returns:
+            equal: bool
+        """
+        units, exp = to_fixed(val)
+        min_exp = min(exp, self._fill_exp)
+        fill = self._fill*pow10(self._fill_exp-min_exp)
+        return fill == units*pow10(exp-min_exp)
+
+    def get_fill_units(self):
+        """
+        Returns the number of units at the current zoom level that the
+        fill spans, truncated toward zero. Computed exactly.
+
+        Returns:
+            fill_units: int
+        """
+        diff = self._fill_exp - self.zoom
+        if diff >= 0: return self._fill*pow10(diff)
+        return trunc_div(self._fill, pow10(-diff))
 
     @property
     def zoom(self):
@@ -152,10 +569,16 @@ class Register:
         this function.
 
         Args:
-            additive: float
-                the amount to change the current fill by
+            additive: int or float
+                the number of units at the current zoom to change the
+                current fill by
         """
-        self._fill += additive*(10**self.zoom)
+        units, exp = to_fixed(additive)
+        exp += self.zoom
+        new_exp = min(exp, self._fill_exp)
+        self._fill = self._fill*pow10(self._fill_exp-new_exp) +\
+                     units*pow10(exp-new_exp)
+        self._fill_exp = new_exp
 
     def unit2val(self, unit):
         """
@@ -170,7 +593,8 @@ class Register:
             val: int
                 a real value along the numberline
         """
-        return unit*10**self.zoom
+        if self.zoom >= 0: return unit*pow10(self.zoom)
+        return unit/pow10(-self.zoom)
 
     def val2unit(self, val):
         """
@@ -185,7 +609,10 @@ class Register:
                 the number of units away from the zero point on the
                 numberline at the current zoom level
         """
-        return int(val/(10**self.zoom))
+        units, exp = to_fixed(val)
+        diff = exp - self.zoom
+        if diff >= 0: return units*pow10(diff)
+        return trunc_div(units, pow10(-diff))
 
     def get_markers(self):
         """
@@ -193,6 +620,10 @@ class Register:
         location in the current view that should be marked as a 10s
         place or 5's place.
 
+        Only the columns that are multiples of 5 units from the zero
+        point are visited and the magnitudes are computed with integer
+        arithmetic, so the cost does not depend on the zoom level.
+
         Returns:
             cols: list of ints
                 the column indices that should be marked
@@ -202,21 +633,20 @@ class Register:
         """
         cols = []
         colors = []
-        for col in range(self.grid.shape[1]):
-            color = 0
-            # Distance from the 0 point on the number line
-            dist = self.trans - self.grid.middle + col
+        # Distance of the first column from the 0 point on the number
+        # line
+        col0 = self.trans - self.grid.middle
+        for col in range((-col0) % 5, self.grid.shape[1], 5):
+            dist = abs(col0 + col)
+            if dist == 0: continue
+            cols.append(col)
             # full marker color if 10s place
-            if dist != 0 and np.abs(dist) % 10 == 0:
-                cols.append(col)
-                log10 = int(np.log10(np.abs(self.unit2val(dist))))
-                color = log10*COLORS[MARKER]+COLORS[MARKER_BASE]
-                colors.append(color)
+            if dist % 10 == 0:
+                log10 = trunc_log10(dist, self.zoom)
+                colors.append(log10*COLORS[MARKER]+COLORS[MARKER_BASE])
             # half marker color if 5s place
-            elif dist != 0 and (np.abs(dist)+5) % 10 == 0:
-                dist = np.abs(dist)+5
-                cols.append(col)
-                log10 = int(np.log10(np.abs(self.unit2val(dist))))
+            else:
+                log10 = trunc_log10(dist+5, self.zoom)
                 color = log10*COLORS[MARKER]+COLORS[MARKER_BASE]
                 colors.append(color/2)
         return cols, colors
@@ -241,30 +671,81 @@ class Register:
     def translate(self, direction):
         """
         Takes a direction and updates the player's perspective to
-        reflect an applied translation. 
+        reflect an applied translation. If there is a scroll range,
+        the translation is clamped so that it never moves the view
+        further outside of the range.
 
         Args:
             direction: str
                 the argued value translates the game's perspective
                 that many grid units
         """
-        self._trans += direction
+        new_trans = self._trans + direction
+        if self._scroll_bounds is not None:
+            min_trans, max_trans = self.get_scroll_units()
+            if direction > 0:
+                new_trans = min(new_trans, max(self._trans, max_trans))
+            else:
+                new_trans = max(new_trans, min(self._trans, min_trans))
+        self._trans = new_trans
 
     def zoom_in(self):
         """
         Zooms in one notch. Sets the value of a single grid unit to
-        0.1 of its current value.
+        0.1 of its current value. Ignored if it would leave the zoom
+        range.
         """
+        if self.zoom_range is not None and self._zoom-1<self.zoom_range[0]:
+            return
         self._zoom -= 1
         self._trans = self.trans*10
 
     def zoom_out(self):
         """
         Zooms out one notch. Sets the value of a single grid unit to
-        10 of its current value.
+        10 of its current value. Ignored if it would leave the zoom
+        range.
         """
+        if self.zoom_range is not None and self._zoom+1>self.zoom_range[1]:
+            return
         self._zoom += 1
-        self._trans = int(self.trans/10)
+        self._trans = trunc_div(self.trans, 10)
+
+    def set_zoom(self, zoom):
+        """
+        Jumps directly to the argued zoom level. The translation is
+        updated exactly as if zoom_in or zoom_out had been called
+        once for each level of difference. The zoom is clamped to the
+        zoom range.
+
+        Args:
+            zoom: int
+                the new zoom level
+        """
+        if self.zoom_range is not None:
+            zoom = int(min(max(zoom, math.ceil(self.zoom_range[0])),
+                           math.floor(self.zoom_range[1])))
+        diff = zoom - self.zoom
+        if diff < 0:
+            self._trans = self.trans*pow10(-diff)
+        elif diff > 0:
+            # repeated truncation toward zero equals a single one
+            self._trans = trunc_div(int(self.trans), pow10(diff))
+        self._zoom = zoom
+
+    def translate_to_fill(self):
+        """
+        Translates the center of the view directly onto the edge of
+        the fill at the current zoom level, or as close to it as the
+        scroll range allows.
+
+        Returns:
+            n_units: int
+                the number of units that the view was translated
+        """
+        trans = self.trans
+        self.translate(self.val2unit(self.fill) - trans)
+        return self.trans - trans
 
     def zero_idx(self):
         """
@@ -292,15 +773,37 @@ class Register:
         The draw process wipes the grid to the default value, then for
         each coordinate all GameObjects at that coordinate sum their
         colors together which is then drawn to the grid at that coord.
+
+        If the register has a frame cache and the current view has
+        been drawn before, the cached frame is copied into the grid
+        instead.
         """
         # clears all information on the grid but maintains intial
         # ndarray reference self.grid._grid.
+        self.needs_draw = False
+        self.drawn_key = self.get_state_key()
+        zero_idx = self.zero_idx()
+        startx, endx = None, None
+        if self._fill != 0:
+            startx, endx = self.get_fill_range(zero_idx)
+        if self.frame_cache is not None:
+            key = (
+                startx,
+                endx,
+                self._zoom,
+                self._trans,
+                self._operator,
+                self._operand
+            )
+            frame = self.frame_cache.get(key)
+            if frame is not None:
+                self.grid._grid[...] = frame
+                return
         self.grid.clear()
         self.grid.set_zoom_color(self.zoom/ZOOM_DIVISOR)
         self.grid.set_operator_color(COLORS[self.operator])
         self.grid.set_operand_color(self.operand/OPERAND_DIVISOR)
-        self.grid.set_trans_color(self.trans/TRANS_DIVISOR)
-        zero_idx = self.zero_idx()
+        self.grid.set_trans_color(int2color(self.trans, TRANS_DIVISOR))
         if self.grid.col_inbounds(zero_idx):
             self.grid.draw(
                 zero_idx,
@@ -308,10 +811,10 @@ class Register:
                 add_color=False
             )
         self.draw_markers()
-        if self.fill != 0:
-            startx, endx = self.get_fill_range(zero_idx)
-            if startx is not None and endx is not None:
-                self.grid.draw_fill(startx, endx)
+        if startx is not None and endx is not None:
+            self.grid.draw_fill(startx, endx)
+        if self.frame_cache is not None:
+            self.frame_cache.put(key, self.grid._grid)
 
     def get_fill_range(self, zero_idx):
         """
@@ -338,9 +841,9 @@ class Register:
         col0ufz = self.trans-middle 
         # zoom is 1 when grid units are each 1 value
         # zoom is the log base 10 of the value that a single grid unit
-        # represents whereas self.fill is the floating point value
-        # that the numberline is supposed to represent
-        fill_units = int(self.fill / (10**self.zoom))
+        # represents whereas self.fill is the exact value that the
+        # numberline is supposed to represent
+        fill_units = self.get_fill_units()
         if fill_units == 0: return None, None
         fillx = fill_units - col0ufz
         # Need to add onto the zero index and the fill index to ensure
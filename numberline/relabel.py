@@ -0,0 +1,289 @@
+import os
+import json
+import numpy as np
+from numberline.constants import *
+from numberline.grid import Grid
+from numberline.recorder import Shard, list_shards
+from numberline.batch import OPERATOR_COLORS
+from numberline.registry import RECORD_OVERFLOW
+import numberline.utils as utils
+
+"""
+Hindsight relabeling of recorded episodes. The goal of an episode only
+appears in the operator and operand meta units of its frames, so an
+episode can be relabeled with a new target, usually the fill that it
+achieved, by recomputing the operand and the rewards and patching the
+two meta units. The number line itself is never re-simulated or
+re-rendered.
+
+All of the functions operate on whole arrays of transitions. Fills are
+the int64 fixed point fills of `STATE_DTYPE`, so rewards are computed
+with the same exact comparison as `Register.fill_equals`.
+"""
+
+def fill2val(fills):
+    """
+    Converts the integer fill units of `STATE_DTYPE` to values.
+
+    Args:
+        fills: array like of int64
+    Returns:
+        vals: ndarray of float64
+    """
+    return np.asarray(fills)/10.0**(-FILL_EXP)
+
+def get_operands(operators, init_fills, targ_fills):
+    """
+    Computes the operand of each task in the same way as
+    `Controller.reset`, see `utils.get_operands`. Tasks that multiply
+    or divide a zero initial value become additions.
+
+    Args:
+        operators: ndarray (N,) of ints
+            the operator of each task as its index in
+            `constants.OPERATOR2IDX`
+        init_fills: ndarray (N,) of int64
+        targ_fills: ndarray (N,) of int64
+    Returns:
+        operators: ndarray (N,) of int8
+        operands: ndarray (N,) of float64
+    """
+    return utils.get_operands(
+        operators,
+        fill2val(np.asarray(init_fills, dtype=np.int64)),
+        fill2val(np.asarray(targ_fills, dtype=np.int64)),
+    )
+
+def get_rewards(actions, rews, fills, targ_fills):
+    """
+    Recomputes the rewards of transitions for new targets. Only the
+    reward of the end game action depends on the target, every other
+    reward, including the penalty of the step limit, is kept.
+
+    Args:
+        actions: ndarray (N,) of ints
+        rews: ndarray (N,)
+            the recorded rewards
+        fills: ndarray (N,) of int64
+            the fill after each transition
+        targ_fills: ndarray (N,) of int64
+            the new target of each transition
+    Returns:
+        rews: ndarray (N,)
+    """
+    ends = np.asarray(actions) == ACTION2IDX[END_GAME]
+    hits = np.where(np.asarray(fills) == np.asarray(targ_fills), 1, -1)
+    return np.where(ends, hits, rews).astype(np.asarray(rews).dtype)
+
+def relabel_states(states, operators, operands):
+    """
+    Writes the operators and operands into the argued states in place.
+
+    Args:
+        states: ndarray (N,) of dtype STATE_DTYPE
+        operators: ndarray (N,) of ints
+        operands: ndarray (N,) of floats
+    """
+    states["operator"] = operators
+    states["operand"] = operands
+
+def relabel_colors(colors, operators, operands, grid=None):
+    """
+    Patches the operator and operand meta units of unit colors (see
+    `batch.get_unit_colors`) in place.
+
+    Args:
+        colors: ndarray (N, n_units)
+        operators: ndarray (N,) of ints
+        operands: ndarray (N,) of floats
+        grid: Grid or None
+            a grid with the layout of the colors
+    """
+    if grid is None: grid = Grid()
+    colors[:, grid.operator_idx] = OPERATOR_COLORS[operators]
+    colors[:, grid.operand_idx] = operands/OPERAND_DIVISOR
+
+def relabel_frames(frames, operators, operands, pixel_density: int=5):
+    """
+    Patches the pixels of the operator and operand meta units of frames
+    in place. Only the drawing space of the two units is written.
+
+    Args:
+        frames: ndarray (N, H, W)
+        operators: ndarray (N,) of ints
+        operands: ndarray (N,) of floats
+        pixel_density: int
+    """
+    grid = Grid(pixel_density=pixel_density)
+    d = pixel_density
+    draw_space = max(1, d-1)
+    metas = [
+        (grid.operator_idx, OPERATOR_COLORS[operators]),
+        (grid.operand_idx, np.asarray(operands)/OPERAND_DIVISOR),
+    ]
+    for idx, color in metas:
+        start = idx*d
+        frames[:, :draw_space, start:start+draw_space] =\
+            color[:, None, None]
+
+def relabel_episodes(columns, episodes, operators=None, targ_fills=None):
+    """
+    Relabels the episodes of a shard. The argued arrays are not
+    modified. Transitions that are not within an indexed episode, and
+    episodes whose initial or target fill is `RECORD_OVERFLOW`, keep
+    their recorded labels.
+
+    Args:
+        columns: dict
+            the columns of a shard, see `recorder.Shard`. The
+            "colors" column is optional.
+        episodes: ndarray (E,)
+            the episode index of the shard
+        operators: int or ndarray (E,) of ints or None
+            the new operator of each episode as its index in
+            `constants.OPERATOR2IDX`. if None, the recorded operators
+            are kept.
+        targ_fills: ndarray (E,) of int64 or None
+            the new target of each episode as fill units. if None, the
+            final fill of each episode is used.
+    Returns:
+        columns: dict
+            the relabeled copies of the columns
+        episodes: ndarray (E,)
+            the relabeled copy of the episode index
+    """
+    episodes = episodes.copy()
+    offsets = episodes["offset"]
+    lengths = episodes["length"]
+    init_states = episodes["init_state"]
+    states = np.array(columns["states"])
+    if targ_fills is None:
+        targ_fills = states["fill"][offsets + lengths - 1]
+    targ_fills = np.asarray(targ_fills, dtype=np.int64)
+    if operators is None:
+        operators = init_states["operator"]
+    operators = np.broadcast_to(operators, (len(episodes),))
+    labeled = (init_states["fill"] != RECORD_OVERFLOW) &\
+              (targ_fills != RECORD_OVERFLOW)
+    operators, operands = get_operands(
+        operators[labeled],
+        init_states["fill"][labeled],
+        targ_fills[labeled]
+    )
+    targ_fills = targ_fills[labeled]
+    episodes["targ_val"][labeled] = fill2val(targ_fills)
+    init_states = init_states[labeled]
+    relabel_states(init_states, operators, operands)
+    episodes["init_state"][labeled] = init_states
+
+    # Maps each transition to its labeled episode by the offset and
+    # length of the episode. Transitions outside of every labeled
+    # episode are left as they are.
+    ep_idxs = np.full(len(episodes), -1, dtype=np.int64)
+    ep_idxs[labeled] = np.arange(len(operators))
+    starts = np.cumsum(lengths) - lengths
+    positions = np.repeat(offsets-starts, lengths) + np.arange(lengths.sum())
+    idxs = np.full(len(states), -1, dtype=np.int64)
+    idxs[positions] = np.repeat(ep_idxs, lengths)
+    mask = idxs >= 0
+    idxs = idxs[mask]
+
+    labeled_states = states[mask]
+    relabel_states(labeled_states, operators[idxs], operands[idxs])
+    states[mask] = labeled_states
+    rews = np.array(columns["rews"])
+    rews[mask] = get_rewards(
+        columns["actions"][mask],
+        rews[mask],
+        labeled_states["fill"],
+        targ_fills[idxs]
+    )
+    relabeled = {
+        "actions": np.array(columns["actions"]),
+        "dones": np.array(columns["dones"]),
+        "states": states,
+        "rews": rews,
+    }
+    if columns.get("colors") is not None:
+        relabeled["colors"] = np.array(columns["colors"])
+        colors = relabeled["colors"][mask]
+        relabel_colors(colors, operators[idxs], operands[idxs])
+        relabeled["colors"][mask] = colors
+        init_colors = episodes["init_colors"][labeled]
+        relabel_colors(init_colors, operators, operands)
+        episodes["init_colors"][labeled] = init_colors
+    return relabeled, episodes
+
+def save_shard(path, columns, episodes):
+    """
+    Writes relabeled columns as a shard that can be opened with
+    `recorder.Shard`.
+
+    Args:
+        path: str
+            the directory of the shard. created if it does not exist.
+        columns: dict
+        episodes: ndarray (E,)
+    """
+    os.makedirs(path, exist_ok=True)
+    for name, column in columns.items():
+        np.save(os.path.join(path, name+".npy"), column)
+    np.save(os.path.join(path, "episodes.npy"), episodes)
+    config = {
+        "n_transitions": len(columns["actions"]),
+        "record_colors": "colors" in columns,
+    }
+    with open(os.path.join(path, "shard.json"), "w") as f:
+        json.dump(config, f)
+
+def relabel_shards(src_dir, dst_dir, operators=None):
+    """
+    Relabels every recorded episode within the argued directory with
+    the fill that it achieved as its target.
+
+    Args:
+        src_dir: str
+            a directory of shards, see `recorder.list_shards`
+        dst_dir: str
+            the output directory. The relabeled shards are written at
+            the same relative paths as their sources.
+        operators: sequence of str or None
+            if None, each episode keeps its recorded operator.
+            Otherwise every episode is relabeled once under each of the
+            argued operators into the subdirectory named after the
+            operator.
+    Returns:
+        n_episodes: int
+            the number of relabeled episodes written
+    """
+    n_episodes = 0
+    for path in list_shards(src_dir):
+        shard = Shard(path)
+        columns = {
+            "actions": shard.actions,
+            "rews": shard.rews,
+            "dones": shard.dones,
+            "states": shard.states,
+            "colors": shard.colors,
+        }
+        rel_path = os.path.relpath(path, src_dir)
+        labels = [(None, dst_dir)]
+        if operators is not None:
+            labels = [
+                (OPERATOR2IDX[op], os.path.join(dst_dir, op))
+                for op in operators
+            ]
+        for operator, directory in labels:
+            relabeled, episodes = relabel_episodes(
+                columns,
+                shard.episodes,
+                operators=operator,
+            )
+            save_shard(
+                os.path.join(directory, rel_path),
+                relabeled,
+                episodes
+            )
+            n_episodes += len(episodes)
+        del shard, columns
+    return n_episodes
@@ -0,0 +1,204 @@
+import numpy as np
+from numberline.constants import *
+from numberline.registry import STATE_DTYPE, RECORD_OVERFLOW
+import numberline.batch as batch
+
+"""
+A replay buffer that stores the compact register state of each
+observation instead of its frame. Frames are a pure function of the
+state and the pixel density, so they are rendered in a single
+vectorized pass with `batch.render_states` when a batch is sampled.
+A transition takes 40 bytes, so 100M transitions fit in about 4GB.
+
+Only primitive actions are stored, and states beyond the int64 range of
+STATE_DTYPE cannot be rendered, so neither is accepted.
+"""
+
+class ReplayBuffer:
+    def __init__(self,
+                 capacity: int,
+                 pixel_density: int=5,
+                 n_frames: int=1,
+                 rng=None):
+        """
+        Args:
+          capacity: int
+            the maximum number of transitions. The oldest transitions
+            are overwritten once the buffer is full.
+          pixel_density: int
+            the pixel density of the rendered frames
+          n_frames: int
+            the number of frames in each sampled observation. Stacks
+            are reconstructed from the preceding states of the episode
+            and the first frame is repeated at the start of an
+            episode, the same as `FrameStack`.
+          rng: numpy Generator or None
+            the generator used for sampling
+        """
+        assert capacity > 1
+        assert n_frames >= 1
+        self.capacity = capacity
+        self.pixel_density = pixel_density
+        self.n_frames = n_frames
+        if rng is None: rng = np.random.default_rng()
+        self.rng = rng
+        self.states = np.zeros(capacity, dtype=STATE_DTYPE)
+        self.actions = np.zeros(capacity, dtype=np.int16)
+        self.rews = np.zeros(capacity, dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=bool)
+        # true for the first transition of each episode
+        self.firsts = np.zeros(capacity, dtype=bool)
+        self.head = 0
+        self.size = 0
+        self.new_episode = True
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return self.states.nbytes + self.actions.nbytes +\
+               self.rews.nbytes + self.dones.nbytes + self.firsts.nbytes
+
+    def add(self, state, action: int, rew: float, done: bool):
+        """
+        Adds a transition. The state is that of the observation on
+        which the action was taken, i.e. the register record from
+        before the step. The next observation is the state of the
+        following transition.
+
+        Args:
+          state: tuple or numpy record of dtype STATE_DTYPE
+            usually `env.controller.register.get_record()`
+          action: int
+          rew: float
+          done: bool
+            the episode of the following transition starts with its
+            own state
+        Raises:
+          ValueError: if the action is a macro action or the state
+            holds RECORD_OVERFLOW
+        """
+        if isinstance(action, tuple) or action >= len(IDX2ACTION):
+            raise ValueError(
+                "macro action {!r} cannot be stored".format(action)
+            )
+        state = np.asarray(state, dtype=STATE_DTYPE)
+        if state["fill"] == RECORD_OVERFLOW or\
+                state["trans"] == RECORD_OVERFLOW:
+            raise ValueError("an overflowed state cannot be rendered")
+        i = self.head
+        self.states[i] = state
+        self.actions[i] = action
+        self.rews[i] = rew
+        self.dones[i] = done
+        self.firsts[i] = self.new_episode
+        self.new_episode = done
+        self.head = (i+1) % self.capacity
+        self.size = min(self.size+1, self.capacity)
+
+    def get_n_valid(self):
+        """
+        Returns the number of transitions that can be sampled. The
+        most recent transition is excluded because its next state has
+        not been added yet, unless its episode ended.
+
+        Returns:
+          n_valid: int
+        """
+        if self.size == 0: return 0
+        if self.dones[(self.head-1) % self.capacity]: return self.size
+        return self.size-1
+
+    def age2idx(self, ages):
+        """
+        Converts the ages of transitions, 0 being the oldest in the
+        buffer, to their buffer indices.
+
+        Args:
+          ages: ndarray of ints
+        Returns:
+          idxs: ndarray of ints
+        """
+        return (self.head - self.size + ages) % self.capacity
+
+    def get_stack_idxs(self, idxs):
+        """
+        Returns the indices of the states of the frames in the stacks
+        of the argued transitions and of their next observations.
+
+        Args:
+          idxs: ndarray (B,) of ints
+        Returns:
+          stack_idxs: ndarray (B, n_frames+1) of ints
+            the observation of transition idxs[b] is stacked from
+            stack_idxs[b,:-1] and its next observation from
+            stack_idxs[b,1:]
+        """
+        k = self.n_frames
+        # Age of each transition, 0 for the oldest in the buffer
+        ages = (idxs - self.head + self.size) % self.capacity
+        stack_idxs = np.empty((len(idxs), k+1), dtype=np.int64)
+        stack_idxs[:, k-1] = idxs
+        # Steps back in time, stopping at the start of each episode or
+        # at the oldest transition in the buffer
+        at_start = self.firsts[idxs] | (ages == 0)
+        for j in range(k-2, -1, -1):
+            prev = (stack_idxs[:, j+1]-1) % self.capacity
+            stack_idxs[:, j] = np.where(at_start, stack_idxs[:, j+1], prev)
+            ages = np.where(at_start, ages, ages-1)
+            at_start = at_start | self.firsts[prev] | (ages == 0)
+        # The next state of terminal transitions is unused
+        next_idxs = (idxs+1) % self.capacity
+        stack_idxs[:, k] = np.where(self.dones[idxs], idxs, next_idxs)
+        return stack_idxs
+
+    def render(self, idxs):
+        """
+        Renders the frames of the states at the argued indices.
+
+        Args:
+          idxs: ndarray of ints
+        Returns:
+          frames: ndarray (*idxs.shape, H, W)
+        """
+        uniques, inverse = np.unique(idxs, return_inverse=True)
+        frames = batch.render_states(self.states[uniques], self.pixel_density)
+        return frames[inverse.reshape(idxs.shape)]
+
+    def sample(self, batch_size: int):
+        """
+        Samples a batch of transitions uniformly and renders their
+        observations.
+
+        Args:
+          batch_size: int
+        Returns:
+          batch: dict
+            "obs": ndarray (B, n_frames, H, W)
+                the stacked observations. The stack axis is omitted if
+                n_frames is 1.
+            "actions": ndarray (B,)
+            "rews": ndarray (B,)
+            "dones": ndarray (B,)
+            "next_obs": ndarray (B, n_frames, H, W)
+                the stacked next observations. Meaningless for
+                terminal transitions.
+            "idxs": ndarray (B,)
+                the buffer indices of the transitions
+        """
+        n_valid = self.get_n_valid()
+        assert n_valid > 0, "no transitions to sample"
+        idxs = self.age2idx(self.rng.integers(n_valid, size=batch_size))
+        frames = self.render(self.get_stack_idxs(idxs))
+        obs, next_obs = frames[:, :-1], frames[:, 1:]
+        if self.n_frames == 1:
+            obs, next_obs = obs[:, 0], next_obs[:, 0]
+        return {
+            "obs": obs,
+            "actions": self.actions[idxs],
+            "rews": self.rews[idxs],
+            "dones": self.dones[idxs],
+            "next_obs": next_obs,
+            "idxs": idxs,
+        }
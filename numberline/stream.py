@@ -0,0 +1,248 @@
+import queue
+import threading
+import multiprocessing
+import numpy as np
+from numberline.constants import *
+
+"""
+Streams batches of transitions from NumberLine envs that are stepped by
+a policy in a background thread or process:
+
+    for batch in numberline_stream(config, batch_size=256):
+        learn(batch["obs"], batch["actions"], batch["rews"], ...)
+
+The batches are written into a fixed set of preallocated slots. Only
+slot indices pass through the queues: the producer takes a free slot,
+fills it with `batch_size` transitions and hands its index to the
+consumer. The number of slots bounds how far the producer can run
+ahead, so it blocks once `prefetch` batches are waiting. With the
+process backend the slots live in a shared `multiprocessing.RawArray`.
+"""
+
+def get_batch_spec(config, batch_size):
+    """
+    Returns the shape and dtype of each array of a batch.
+
+    Args:
+        config: dict
+            keyword arguments for the NumberLine envs
+        batch_size: int
+    Returns:
+        spec: dict
+            name: (shape, dtype)
+    """
+    from numberline.envs import NumberLine
+    env = NumberLine(**config)
+    obs_shape = env.controller.grid.raw_shape
+    env.close()
+    return {
+        "obs": ((batch_size, *obs_shape), np.float64),
+        "actions": ((batch_size,), np.int16),
+        "rews": ((batch_size,), np.float32),
+        "dones": ((batch_size,), bool),
+        "next_obs": ((batch_size, *obs_shape), np.float64),
+    }
+
+def get_slot_nbytes(spec):
+    """
+    Args:
+        spec: dict
+            see `get_batch_spec`
+    Returns:
+        nbytes: int
+            the number of bytes of a batch
+    """
+    return sum(
+        int(np.prod(shape))*np.dtype(dtype).itemsize
+        for shape, dtype in spec.values()
+    )
+
+def get_slots(buf, spec, n_slots):
+    """
+    Lays out the arrays of every slot in the argued buffer.
+
+    Args:
+        buf: buffer
+            at least n_slots*get_slot_nbytes(spec) bytes
+        spec: dict
+            see `get_batch_spec`
+        n_slots: int
+    Returns:
+        slots: list of dicts
+            the arrays of each slot
+    """
+    slots = []
+    offset = 0
+    for _ in range(n_slots):
+        slot = dict()
+        for name, (shape, dtype) in spec.items():
+            slot[name] = np.ndarray(shape, dtype, buffer=buf, offset=offset)
+            offset += slot[name].nbytes
+        slots.append(slot)
+    return slots
+
+def produce(slots, free_q, ready_q, stop, config, policy, n_envs, seed):
+    """
+    Steps the envs with the policy and fills free slots with
+    transitions until the stop event is set. Each filled slot index is
+    put into the ready queue. An exception is reported by
+    putting its description into the ready queue.
+
+    Args:
+        slots: list of dicts
+            the preallocated arrays of each slot
+        free_q: Queue
+            indices of the slots that may be filled
+        ready_q: Queue
+            indices of the filled slots
+        stop: Event
+            set by the consumer when it is done. A None is put into the
+            free queue at the same time to wake up the producer.
+        config: dict
+            keyword arguments for the NumberLine envs
+        policy: callable
+            `policy(env) -> action`, for example a `numberline.oracles`
+            Oracle
+        n_envs: int
+            the number of envs that are stepped in turn
+        seed: int or None
+    """
+    try:
+        from numberline.envs import NumberLine
+        seeds = np.random.SeedSequence(seed).generate_state(n_envs)
+        envs = []
+        obs = []
+        for s in seeds:
+            env = NumberLine(**config)
+            env.seed(int(s))
+            envs.append(env)
+            obs.append(env.reset())
+        e = 0
+        while True:
+            idx = free_q.get()
+            if idx is None or stop.is_set(): break
+            slot = slots[idx]
+            for b in range(len(slot["actions"])):
+                env = envs[e]
+                actn = policy(env)
+                slot["obs"][b] = obs[e]
+                next_obs, rew, done, _ = env.step(actn)
+                slot["actions"][b] = actn
+                slot["rews"][b] = rew
+                slot["dones"][b] = done
+                slot["next_obs"][b] = next_obs
+                obs[e] = env.reset() if done else next_obs
+                e = (e+1) % n_envs
+            ready_q.put(idx)
+    except Exception as e:
+        ready_q.put("{}: {}".format(type(e).__name__, e))
+
+def _produce_shared(buf, spec, n_slots, *args):
+    produce(get_slots(buf, spec, n_slots), *args)
+
+def numberline_stream(config=None,
+                      batch_size: int=256,
+                      policy=None,
+                      n_envs: int=1,
+                      prefetch: int=4,
+                      backend: str="thread",
+                      seed: int or None=None,
+                      n_batches: int or None=None):
+    """
+    Yields batches of transitions that are generated in the
+    background.
+
+    The yielded arrays are views into a preallocated slot that is
+    refilled once the next batch is requested. Copy them to keep them
+    longer.
+
+    Args:
+        config: dict or None
+            keyword arguments for the NumberLine envs
+        batch_size: int
+            the number of transitions in each batch
+        policy: callable or None
+            `policy(env) -> action` used to step the envs, for example
+            `oracles.RandOracle()`. Defaults to
+            `oracles.DirectOracle("numberline-v0")` which plays
+            `zoom_solution`. It must be picklable if the spawn start
+            method is used with the process backend.
+        n_envs: int
+            the number of envs that are stepped in turn. The
+            transitions of a batch are interleaved across the envs.
+        prefetch: int
+            the maximum number of ready batches waiting for the
+            consumer. The producer blocks once the limit is reached.
+        backend: str
+            "thread" or "process". The process backend steps the envs
+            in a separate process and shares the slots through shared
+            memory.
+        seed: int or None
+            seeds the envs
+        n_batches: int or None
+            the number of batches to yield. if None, batches are
+            yielded until the generator is closed.
+    Yields:
+        batch: dict
+            "obs": ndarray (B, H, W)
+            "actions": ndarray (B,)
+            "rews": ndarray (B,)
+            "dones": ndarray (B,)
+            "next_obs": ndarray (B, H, W)
+                the observation following each action. For terminal
+                transitions this is the final observation of the
+                episode, not the first observation of the next one.
+    """
+    assert backend in {"thread", "process"}
+    assert prefetch >= 1
+    if config is None: config = dict()
+    if policy is None:
+        from numberline.oracles import DirectOracle
+        policy = DirectOracle("numberline-v0")
+    spec = get_batch_spec(config, batch_size)
+    # One extra slot is held by the consumer
+    n_slots = prefetch + 1
+    nbytes = n_slots*get_slot_nbytes(spec)
+    if backend == "thread":
+        buf = bytearray(nbytes)
+        free_q = queue.Queue(n_slots)
+        ready_q = queue.Queue(n_slots)
+        stop = threading.Event()
+    else:
+        ctx = multiprocessing.get_context()
+        buf = ctx.RawArray("B", nbytes)
+        free_q = ctx.Queue(n_slots)
+        ready_q = ctx.Queue(n_slots)
+        stop = ctx.Event()
+    slots = get_slots(buf, spec, n_slots)
+    for idx in range(prefetch): free_q.put(idx)
+    args = (free_q, ready_q, stop, config, policy, n_envs, seed)
+    if backend == "thread":
+        worker = threading.Thread(
+            target=produce,
+            args=(slots, *args),
+            daemon=True
+        )
+    else:
+        worker = ctx.Process(
+            target=_produce_shared,
+            args=(buf, spec, n_slots, *args),
+            daemon=True
+        )
+    worker.start()
+    held = prefetch
+    try:
+        count = 0
+        while n_batches is None or count < n_batches:
+            idx = ready_q.get()
+            if isinstance(idx, str):
+                raise RuntimeError("stream worker failed: " + idx)
+            # The previously yielded slot can now be refilled
+            free_q.put(held)
+            held = idx
+            yield slots[idx]
+            count += 1
+    finally:
+        stop.set()
+        free_q.put(None)
+        worker.join()
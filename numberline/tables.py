@@ -0,0 +1,361 @@
+import os
+import json
+import numpy as np
+from numberline.constants import *
+from numberline.registry import STATE_DTYPE
+import numberline.batch as batch
+
+"""
+Table driven transitions for bounded game configurations. When the
+zoom, scroll and fill of the register are bounded, the set of
+reachable (fill, zoom, trans) states is finite. `compile_table`
+enumerates it with a breadth first search over the vectorized
+`batch.step_states` and stores the successor of every state under each
+primitive action in a dense integer table, so stepping is a single
+array lookup per env.
+
+The operator and operand of the register are constant within a game
+and do not affect the transitions, so they are not part of the table
+states.
+"""
+
+N_ACTIONS = len(IDX2ACTION)
+
+class TransitionTable:
+    def __init__(self,
+                 states,
+                 next_idxs,
+                 key_space,
+                 zoom_range: tuple,
+                 scroll_range: tuple,
+                 fill_range: tuple):
+        """
+        Args:
+          states: ndarray (S,) of dtype STATE_DTYPE
+            the reachable states. The operator and operand fields are
+            unused.
+          next_idxs: ndarray (S, 7) of int32
+            next_idxs[s,a] is the index of the state that follows
+            state s under action a
+          key_space: KeySpace
+            the encoding of the states into dense integer keys
+          zoom_range: tuple of inclusive ints
+          scroll_range: tuple of inclusive ints
+          fill_range: tuple of inclusive numbers
+            the ranges that the table was compiled with
+        """
+        self.states = states
+        self.next_idxs = next_idxs
+        self.key_space = key_space
+        self.zoom_range = zoom_range
+        self.scroll_range = scroll_range
+        self.fill_range = fill_range
+        # Maps each key of the key space to its state index or -1
+        self.key2idx = np.full(key_space.size, -1, dtype=np.int32)
+        keys = key_space.get_keys(states)
+        self.key2idx[keys] = np.arange(len(states), dtype=np.int32)
+
+    @property
+    def n_states(self):
+        return len(self.states)
+
+    def save(self, directory):
+        """
+        Saves the table into the argued directory so that it can be
+        loaded without recompiling.
+
+        Args:
+          directory: str
+            created if it does not exist
+        """
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "states.npy"), self.states)
+        np.save(os.path.join(directory, "next_idxs.npy"), self.next_idxs)
+        ks = self.key_space
+        config = {
+            "fill_bounds": [int(b) for b in ks.fill_bounds],
+            "fill_step": int(ks.fill_step),
+            "zoom_bounds": [int(b) for b in ks.zoom_bounds],
+            "trans_bounds": [int(b) for b in ks.trans_bounds],
+            "zoom_range": list(self.zoom_range),
+            "scroll_range": list(self.scroll_range),
+            "fill_range": list(self.fill_range),
+        }
+        with open(os.path.join(directory, "table.json"), "w") as f:
+            json.dump(config, f)
+
+    @staticmethod
+    def load(directory, mmap_mode: str or None="r"):
+        """
+        Loads a table saved with `save`.
+
+        Args:
+          directory: str
+          mmap_mode: str or None
+            the mmap mode of the state and successor arrays. See
+            `np.load`
+        Returns:
+          table: TransitionTable
+        """
+        with open(os.path.join(directory, "table.json"), "r") as f:
+            config = json.load(f)
+        key_space = KeySpace(
+            fill_bounds=tuple(config["fill_bounds"]),
+            fill_step=config["fill_step"],
+            zoom_bounds=tuple(config["zoom_bounds"]),
+            trans_bounds=tuple(config["trans_bounds"]),
+        )
+        load = lambda name: np.load(
+            os.path.join(directory, name),
+            mmap_mode=mmap_mode
+        )
+        return TransitionTable(
+            states=load("states.npy"),
+            next_idxs=load("next_idxs.npy"),
+            key_space=key_space,
+            zoom_range=tuple(config["zoom_range"]),
+            scroll_range=tuple(config["scroll_range"]),
+            fill_range=tuple(config["fill_range"]),
+        )
+
+    def get_indices(self, states):
+        """
+        Returns the table indices of the argued states.
+
+        Args:
+          states: ndarray (N,) of dtype STATE_DTYPE
+        Returns:
+          idxs: ndarray (N,) of int32
+            -1 for each state that is not in the table
+        """
+        keys = self.key_space.get_keys(states)
+        valid = self.key_space.contains(states)
+        return np.where(valid, self.key2idx[np.where(valid, keys, 0)], -1)
+
+    def index(self, state):
+        """
+        Returns the table index of the argued state.
+
+        Args:
+          state: tuple or numpy record of dtype STATE_DTYPE
+            a record as returned by `Register.get_record`
+        Returns:
+          idx: int
+            raises a KeyError if the state is not in the table
+        """
+        idx = int(self.get_indices(np.asarray([state], STATE_DTYPE))[0])
+        if idx < 0: raise KeyError(state)
+        return idx
+
+    def get_reward_table(self, targ_val):
+        """
+        Returns the reward of each action from each state for a game
+        with the argued target value.
+
+        Args:
+          targ_val: int or float
+        Returns:
+          rews: ndarray (S, 7) of int8
+            only the END_GAME column is non-zero
+        """
+        rews = np.zeros((self.n_states, N_ACTIONS), dtype=np.int8)
+        correct = self.states["fill"] == batch.val2fill(targ_val)
+        rews[:, ACTION2IDX[END_GAME]] = np.where(correct, 1, -1)
+        return rews
+
+    def step(self, idxs, actns, targ_vals):
+        """
+        Applies one action to each of the argued state indices.
+
+        Args:
+          idxs: ndarray (N,) of ints
+            the table indices of the current states
+          actns: ndarray (N,) of ints
+            the primitive action for each state. See IDX2ACTION
+          targ_vals: ndarray (N,)
+            the target value of the game of each state
+        Returns:
+          next_idxs: ndarray (N,) of int32
+          rews: ndarray (N,) of ints
+          dones: ndarray (N,) of bools
+        """
+        idxs = np.asarray(idxs)
+        actns = np.asarray(actns)
+        dones = actns == ACTION2IDX[END_GAME]
+        correct = self.states["fill"][idxs] == batch.val2fill(targ_vals)
+        rews = np.where(correct, 1, -1)*dones
+        return self.next_idxs[idxs, actns], rews, dones
+
+class KeySpace:
+    """
+    Encodes bounded (fill, zoom, trans) states into dense integer keys
+    in the range [0, size) using a mixed radix.
+    """
+    def __init__(self, fill_bounds, fill_step, zoom_bounds, trans_bounds):
+        """
+        Args:
+          fill_bounds: tuple of inclusive ints
+            the bounds of the fill in units of 10**FILL_EXP. Both must
+            be multiples of fill_step.
+          fill_step: int
+            every fill is a multiple of fill_step
+          zoom_bounds: tuple of inclusive ints
+          trans_bounds: tuple of inclusive ints
+        """
+        self.fill_bounds = fill_bounds
+        self.fill_step = fill_step
+        self.zoom_bounds = zoom_bounds
+        self.trans_bounds = trans_bounds
+        self.n_fills = (fill_bounds[1]-fill_bounds[0])//fill_step + 1
+        self.n_zooms = zoom_bounds[1]-zoom_bounds[0] + 1
+        self.n_trans = trans_bounds[1]-trans_bounds[0] + 1
+        self.size = self.n_fills*self.n_zooms*self.n_trans
+
+    def get_key(self, fill: int, zoom: int, trans: int):
+        """
+        Scalar version of `get_keys`.
+
+        Args:
+          fill: int
+            the fill in units of 10**FILL_EXP
+          zoom: int
+          trans: int
+        Returns:
+          key: int
+            -1 if the state is not in the key space
+        """
+        fill -= self.fill_bounds[0]
+        zoom -= self.zoom_bounds[0]
+        trans -= self.trans_bounds[0]
+        if fill < 0 or fill % self.fill_step != 0: return -1
+        fill //= self.fill_step
+        if fill >= self.n_fills or not 0 <= zoom < self.n_zooms or\
+                not 0 <= trans < self.n_trans:
+            return -1
+        return (fill*self.n_zooms + zoom)*self.n_trans + trans
+
+    def contains(self, states):
+        """
+        Args:
+          states: ndarray (N,) of dtype STATE_DTYPE
+        Returns:
+          contained: ndarray (N,) of bools
+            true for each state that has a key in the key space
+        """
+        fill = states["fill"]
+        zoom = states["zoom"]
+        trans = states["trans"]
+        return (fill >= self.fill_bounds[0]) &\
+               (fill <= self.fill_bounds[1]) &\
+               (fill % self.fill_step == 0) &\
+               (zoom >= self.zoom_bounds[0]) &\
+               (zoom <= self.zoom_bounds[1]) &\
+               (trans >= self.trans_bounds[0]) &\
+               (trans <= self.trans_bounds[1])
+
+    def get_keys(self, states):
+        """
+        Args:
+          states: ndarray (N,) of dtype STATE_DTYPE
+            the states must be contained in the key space
+        Returns:
+          keys: ndarray (N,) of int64
+        """
+        fill = (states["fill"]-self.fill_bounds[0])//self.fill_step
+        zoom = states["zoom"]-self.zoom_bounds[0]
+        trans = states["trans"]-self.trans_bounds[0]
+        return (fill*self.n_zooms + zoom)*self.n_trans + trans
+
+def compile_table(contr, fill_range: tuple or None=None):
+    """
+    Enumerates the states that are reachable from the initial states
+    of the argued controller and builds their transition table.
+
+    Args:
+      contr: Controller
+        the controller must have a zoom_range and a scroll_range. The
+        initial states are the integer fills in its init_range at zoom
+        0 and translation 0.
+      fill_range: tuple of inclusive ints | None
+        the range of values that the fill is bounded to. Adds and
+        subtracts that would leave the range leave the state unchanged.
+        if None, defaults to the span of the init_range and the
+        targ_range of the controller.
+    Returns:
+      table: TransitionTable
+    """
+    zoom_range = contr.zoom_range
+    scroll_range = contr.scroll_range
+    assert zoom_range is not None and scroll_range is not None
+    if fill_range is None:
+        fill_range = (
+            min(contr.init_range[0], contr.targ_range[0]),
+            max(contr.init_range[1], contr.targ_range[1]),
+        )
+    min_fill, max_fill = batch.val2fill(fill_range)
+    init_vals = np.arange(contr.init_range[0], contr.init_range[1]+1)
+    init_fills = batch.val2fill(init_vals)
+
+    # The zoom starts at 0 and the translation at 0, even if they are
+    # outside of the ranges. Translations never move further from the
+    # ranges and truncate toward zero when zooming out, so their bounds
+    # are those of the range and 0 at the finest zoom.
+    min_zoom = min(int(np.ceil(zoom_range[0])), 0)
+    max_zoom = max(int(np.floor(zoom_range[1])), 0)
+    assert min_zoom >= FILL_EXP
+    min_trans, max_trans = batch.get_scroll_units(
+        np.asarray(min_zoom),
+        scroll_range
+    )
+    fill_step = int(batch.POW10[min(min_zoom, 0) - FILL_EXP])
+    key_space = KeySpace(
+        fill_bounds=(
+            min(min_fill, init_fills.min())//fill_step*fill_step,
+            -(-max(max_fill, init_fills.max())//fill_step)*fill_step,
+        ),
+        fill_step=fill_step,
+        zoom_bounds=(min_zoom, max_zoom),
+        trans_bounds=(min(int(min_trans), 0), max(int(max_trans), 0)),
+    )
+
+    key2idx = np.full(key_space.size, -1, dtype=np.int32)
+    frontier = np.zeros(len(init_vals), dtype=STATE_DTYPE)
+    frontier["fill"] = init_fills
+    keys, firsts = np.unique(
+        key_space.get_keys(frontier),
+        return_index=True
+    )
+    key2idx[keys] = np.arange(len(keys))
+    frontier = frontier[firsts]
+    n_states = len(keys)
+
+    states = [frontier]
+    next_idxs = []
+    while len(frontier) > 0:
+        succs, _, _, _ = batch.lookahead(
+            frontier,
+            np.zeros(len(frontier)),
+            zoom_range=zoom_range,
+            scroll_range=scroll_range,
+        )
+        fills = succs["fill"]
+        out = (fills < min_fill) | (fills > max_fill)
+        succs[out] = np.broadcast_to(frontier[:,None], succs.shape)[out]
+
+        succs = succs.reshape(-1)
+        keys = key_space.get_keys(succs)
+        is_new = key2idx[keys] < 0
+        new_keys, firsts = np.unique(keys[is_new], return_index=True)
+        key2idx[new_keys] = np.arange(n_states, n_states+len(new_keys))
+        n_states += len(new_keys)
+        next_idxs.append(key2idx[keys].reshape(-1, N_ACTIONS))
+        frontier = succs[is_new][firsts]
+        states.append(frontier)
+    return TransitionTable(
+        states=np.concatenate(states),
+        next_idxs=np.concatenate(next_idxs),
+        key_space=key_space,
+        zoom_range=zoom_range,
+        scroll_range=scroll_range,
+        fill_range=fill_range,
+    )
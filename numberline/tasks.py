@@ -0,0 +1,194 @@
+import numpy as np
+from numberline.constants import *
+from numberline.utils import get_multiples
+import numberline.utils as utils
+
+"""
+Samples exact (init_val, operator, operand, targ_val) tasks in
+vectorized batches.
+
+`Controller.reset` computes the operand from the initial value and the
+target, so a MULTIPLY task whose target is not a multiple of the
+initial value gets an operand like 7/3 whose decimal expansion never
+ends, and MULTIPLY and DIVIDE silently become ADD when the initial
+value is 0. The sampler only draws tasks whose operands are integers:
+
+    MULTIPLY: init_val * operand = targ_val, drawn from a table of the
+              multiples of every non-zero initial value that lie in the
+              target range
+    DIVIDE:   operand = targ_val * init_val, the same operand as
+              `Controller.reset`, with a non-zero initial value
+    ADD and SUBTRACT are always exact.
+
+Every operand is then an integer whose magnitude is bounded by the
+ranges, which keeps `get_magnitude_counts` and the step limit small.
+"""
+
+# The layout of a sampled task
+TASK_DTYPE = np.dtype([
+    ("init_val", np.int64),
+    ("operator", np.int8),
+    ("operand", np.int64),
+    ("targ_val", np.int64),
+])
+
+class FactorTable:
+    """
+    Every (init_val, targ_val) pair of the ranges such that targ_val is
+    a multiple of a non-zero init_val, stored as flat arrays.
+    """
+    def __init__(self, init_range: tuple, targ_range: tuple):
+        """
+        Args:
+            init_range: tuple of inclusive ints
+            targ_range: tuple of inclusive ints
+        """
+        inits, targs = [], []
+        for init_val in range(init_range[0], init_range[1]+1):
+            if init_val == 0: continue
+            multiples = get_multiples(init_val, *targ_range)
+            inits.append(np.full(len(multiples), init_val, dtype=np.int64))
+            targs.append(multiples)
+        empty = np.zeros(0, dtype=np.int64)
+        self.inits = np.concatenate(inits) if inits else empty
+        self.targs = np.concatenate(targs) if targs else empty
+
+    def __len__(self):
+        return len(self.inits)
+
+    def sample(self, n: int, rng):
+        """
+        Samples pairs uniformly.
+
+        Args:
+            n: int
+            rng: numpy Generator
+        Returns:
+            inits: ndarray (n,) of int64
+            targs: ndarray (n,) of int64
+        """
+        idxs = rng.integers(0, len(self), size=n)
+        return self.inits[idxs], self.targs[idxs]
+
+class TaskSampler:
+    def __init__(self,
+                 init_range: tuple=(0,0),
+                 targ_range: tuple=(1,100),
+                 operators: list or set={ADD, SUBTRACT}):
+        """
+        Args:
+            init_range: tuple of inclusive ints
+            targ_range: tuple of inclusive ints
+            operators: list or set of str
+                each operator is sampled with equal probability
+        """
+        self.init_range = init_range
+        self.targ_range = targ_range
+        self.operators = list(operators)
+        self.factors = None
+        if MULTIPLY in self.operators:
+            self.factors = FactorTable(init_range, targ_range)
+            if len(self.factors) == 0:
+                raise ValueError(
+                    "no exact multiplication tasks in the ranges"
+                )
+        self.nonzero_inits = np.arange(
+            init_range[0],
+            init_range[1]+1,
+            dtype=np.int64
+        )
+        self.nonzero_inits = self.nonzero_inits[self.nonzero_inits != 0]
+        if DIVIDE in self.operators and len(self.nonzero_inits) == 0:
+            raise ValueError("division requires a non-zero init_range")
+
+    def sample(self, n: int, rng=None):
+        """
+        Samples n exact tasks.
+
+        Args:
+            n: int
+            rng: numpy Generator or None
+        Returns:
+            tasks: ndarray (n,) of dtype TASK_DTYPE
+        """
+        if rng is None: rng = np.random.default_rng()
+        tasks = np.zeros(n, dtype=TASK_DTYPE)
+        op_idxs = rng.integers(0, len(self.operators), size=n)
+        tasks["init_val"] = rng.integers(
+            self.init_range[0],
+            self.init_range[1]+1,
+            size=n
+        )
+        tasks["targ_val"] = rng.integers(
+            self.targ_range[0],
+            self.targ_range[1]+1,
+            size=n
+        )
+        for i,operator in enumerate(self.operators):
+            rows = op_idxs == i
+            tasks["operator"][rows] = OPERATOR2IDX[operator]
+            n_rows = np.count_nonzero(rows)
+            if operator == MULTIPLY:
+                inits, targs = self.factors.sample(n_rows, rng)
+                tasks["init_val"][rows] = inits
+                tasks["targ_val"][rows] = targs
+            elif operator == DIVIDE:
+                tasks["init_val"][rows] = rng.choice(
+                    self.nonzero_inits,
+                    size=n_rows
+                )
+        tasks["operand"] = get_operands(tasks)
+        return tasks
+
+    def sample_next(self, init_val, rng=None):
+        """
+        Samples an exact task that starts from the argued value, like
+        the next task of a task stream starting from the current fill.
+        The value need not be in the init range. Operators without an
+        exact task from the value are skipped, and ADD is used if none
+        of the operators have one.
+
+        Args:
+            init_val: int or float
+            rng: numpy Generator or None
+        Returns:
+            operator: str
+            targ_val: int
+        """
+        if rng is None: rng = np.random.default_rng()
+        is_int = init_val != 0 and init_val == int(init_val)
+        multiples = None
+        if MULTIPLY in self.operators and is_int:
+            multiples = get_multiples(init_val, *self.targ_range)
+        operators = [
+            op for op in self.operators
+            if op in {ADD, SUBTRACT}
+            or (op == DIVIDE and is_int)
+            or (op == MULTIPLY and multiples is not None and len(multiples))
+        ]
+        if len(operators) == 0: operators = [ADD]
+        operator = operators[rng.integers(0, len(operators))]
+        if operator == MULTIPLY:
+            return operator, int(rng.choice(multiples))
+        targ_val = int(rng.integers(
+            self.targ_range[0],
+            self.targ_range[1]+1
+        ))
+        return operator, targ_val
+
+def get_operands(tasks):
+    """
+    Computes the operands of exact tasks in the same way as
+    `Controller.set_task`, see `utils.get_operands`.
+
+    Args:
+        tasks: ndarray (N,) of dtype TASK_DTYPE
+    Returns:
+        operands: ndarray (N,) of int64
+    """
+    _, operands = utils.get_operands(
+        tasks["operator"],
+        tasks["init_val"],
+        tasks["targ_val"]
+    )
+    return np.rint(operands).astype(np.int64)
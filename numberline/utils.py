@@ -1,5 +1,165 @@
 import numpy as np
 from collections import defaultdict
+from numberline.constants import ADD, SUBTRACT, MULTIPLY, DIVIDE
+from numberline.constants import OPERATOR2IDX
+
+# Reused to construct bit generators cheaply in copy_rng. The seed is
+# irrelevant because the state is overwritten.
+_SEED_SEQ = np.random.SeedSequence(0)
+
+def get_coord_array(objs):
+    """
+    Collects the coordinates of the argued objects into an array.
+
+    Args:
+        objs: list like of GameObjects
+    Returns:
+        coords: ndarray (N, 2) of int64
+            the (row, col) of each object in iteration order
+    """
+    coords = np.fromiter(
+        (c for obj in objs for c in obj.coord),
+        dtype=np.int64
+    )
+    return coords.reshape(-1, 2)
+
+def get_coord_keys(coords):
+    """
+    Encodes each coordinate as a single int that preserves the
+    (row, col) lexicographic order, which lets coordinates be counted
+    and compared with one dimensional numpy operations.
+
+    Args:
+        coords: ndarray (N, 2) of ints
+    Returns:
+        keys: ndarray (N,) of int64
+    """
+    coords = np.asarray(coords, dtype=np.int64).reshape(-1, 2)
+    if len(coords) == 0: return np.zeros(0, dtype=np.int64)
+    low = coords.min(0)
+    n_cols = coords[:,1].max() - low[1] + 1
+    return (coords[:,0]-low[0])*n_cols + (coords[:,1]-low[1])
+
+def count_rows_and_cols(coords):
+    """
+    Array version of `get_row_and_col_counts`.
+
+    Args:
+        coords: ndarray (N, 2) of ints
+    Returns:
+        rows: ndarray (R,) of int64
+            the sorted unique row values
+        row_counts: ndarray (R,) of int64
+            the number of coordinates with each row value
+        cols: ndarray (C,) of int64
+            the sorted unique col values
+        col_counts: ndarray (C,) of int64
+            the number of coordinates with each col value
+    """
+    coords = np.asarray(coords, dtype=np.int64).reshape(-1, 2)
+    rows, row_counts = np.unique(coords[:,0], return_counts=True)
+    cols, col_counts = np.unique(coords[:,1], return_counts=True)
+    return rows, row_counts, cols, col_counts
+
+def count_coords(coords):
+    """
+    Array version of `get_coord_counts`.
+
+    Args:
+        coords: ndarray (N, 2) of ints
+    Returns:
+        counts: ndarray (N,) of int64
+            the number of occurences of the coordinate of each row
+            within the array
+    """
+    keys = get_coord_keys(coords)
+    _, inverse, counts = np.unique(
+        keys,
+        return_inverse=True,
+        return_counts=True
+    )
+    return counts[inverse]
+
+def get_majority_row(coords, min_row: int=None, ret_count: bool=False):
+    """
+    Array version of `get_max_row`. Finds the row in which the majority
+    of coordinates reside. Returns the earliest row in case of equal
+    counts.
+
+    Args:
+        coords: ndarray (N, 2) of ints
+        min_row: int or None (inclusive)
+            determines the minimum row available for counting. if None
+            all rows are available.
+        ret_count: bool
+            if true, returns the count associated with the max row
+    Returns:
+        max_row: int or None
+            the row with the largest number of coordinates. None if no
+            coordinates are available.
+        count: int
+            the count of the coordinates along the max_row
+    """
+    coords = np.asarray(coords, dtype=np.int64).reshape(-1, 2)
+    rows = coords[:,0]
+    if min_row is not None: rows = rows[rows >= min_row]
+    max_row, count = None, 0
+    if len(rows) > 0:
+        rows, counts = np.unique(rows, return_counts=True)
+        idx = np.argmax(counts)
+        max_row, count = int(rows[idx]), int(counts[idx])
+    if ret_count: return max_row, count
+    return max_row
+
+def get_unaligned_mask(coords, targ_coords, min_row: int=2):
+    """
+    Array version of `get_unaligned_items`. Marks the coordinates that
+    are not aligned along the majority row or do not have a target in
+    their column. Only one item for one target is allowed, so all but
+    the first of the items sharing an aligned coordinate are marked.
+
+    Args:
+        coords: ndarray (N, 2) of ints
+            the coordinates of the items in the register
+        targ_coords: ndarray (M, 2) of ints
+            the coordinates of the targets in the register
+        min_row: int
+            the minimum row that is allowed to be the majority row. If
+            items are below this row, they are automatically considered
+            loners.
+    Returns:
+        mask: ndarray (N,) of bools
+            true for the loners
+    """
+    coords = np.asarray(coords, dtype=np.int64).reshape(-1, 2)
+    targ_coords = np.asarray(targ_coords, dtype=np.int64).reshape(-1, 2)
+    max_row = get_majority_row(coords, min_row=min_row)
+    mask = ~np.isin(coords[:,1], targ_coords[:,1])
+    if max_row is None: mask[:] = True
+    else: mask |= coords[:,0] != max_row
+    idxs = np.flatnonzero(~mask)
+    if len(idxs) > 1:
+        _, firsts = np.unique(get_coord_keys(coords[idxs]), return_index=True)
+        mask[idxs] = True
+        mask[idxs[firsts]] = False
+    return mask
+
+def get_nearest_idx(ref_coord, coords):
+    """
+    Array version of `nearest_obj`.
+
+    Args:
+        ref_coord: sequence of ints (row, col)
+        coords: ndarray (N, 2) of ints
+    Returns:
+        idx: int or None
+            the index of the first of the closest coordinates. None if
+            coords is empty.
+    """
+    coords = np.asarray(coords).reshape(-1, 2)
+    if len(coords) == 0: return None
+    diffs = coords - np.asarray(ref_coord)
+    return int(np.argmin(np.einsum("ij,ij->i", diffs, diffs)))
 
 def get_rows_and_cols(objs: set):
     """
@@ -14,13 +174,13 @@ def get_rows_and_cols(objs: set):
         cols: set of ints
             a set of the column values
     """
-    rows, cols = get_row_and_col_counts(objs)
-    return set(rows.keys()), set(cols.keys())
+    coords = get_coord_array(objs)
+    return set(coords[:,0].tolist()), set(coords[:,1].tolist())
 
 def get_row_and_col_counts(objs: set):
     """
     Finds and returns dicts of the row and column values and their
-    corresponding counts.
+    corresponding counts. See `count_rows_and_cols`.
 
     Args:
         objs: set of GameObjects
@@ -36,20 +196,17 @@ def get_row_and_col_counts(objs: set):
             vals: int
                 the number of objects with that col value
     """
-    rows = dict()
-    cols = dict()
-    for obj in objs:
-        row,col = obj.coord
-        if row not in rows: rows[row] = 1
-        else: rows[row] += 1
-        if col not in cols: cols[col] = 1
-        else: cols[col] += 1
+    rows, row_counts, cols, col_counts = count_rows_and_cols(
+        get_coord_array(objs)
+    )
+    rows = dict(zip(rows.tolist(), row_counts.tolist()))
+    cols = dict(zip(cols.tolist(), col_counts.tolist()))
     return rows, cols
 
 def get_coord_counts(objs: set):
     """
     Counts the number of occurences of the coordinates each object
-    within the sequence.
+    within the sequence. See `count_coords`.
 
     Args:
         objs: list like of GameObjects
@@ -60,15 +217,17 @@ def get_coord_counts(objs: set):
             vals: int
                 the counts
     """
+    objs = list(objs)
     counts = defaultdict(lambda: 0)
-    for obj in objs:
-        counts[obj.coord] += 1
+    coord_counts = count_coords(get_coord_array(objs))
+    for obj,count in zip(objs, coord_counts.tolist()):
+        counts[obj.coord] = count
     return counts
 
 def get_max_row(objs: set, min_row: int=None, ret_count: bool=False):
     """
     Finds the row in which the majority of objects reside. Returns the
-    earliest row in case of equal counts.
+    earliest row in case of equal counts. See `get_majority_row`.
 
     Args:
         objs: set of GameObjects
@@ -83,21 +242,17 @@ def get_max_row(objs: set, min_row: int=None, ret_count: bool=False):
         count: int
             the count of the items along the max_row
     """
-    rows, _ = get_row_and_col_counts(objs)
-    if min_row is not None:
-        for i in range(min_row):
-            if i in rows: del rows[i]
-    max_row = max_key(rows)
-    if ret_count:
-        if max_row in rows: return max_row, rows[max_row]
-        else: return max_row, 0
-    return max_row
+    return get_majority_row(
+        get_coord_array(objs),
+        min_row=min_row,
+        ret_count=ret_count
+    )
 
 def get_unaligned_items(items: set, targs: set, min_row: int=2):
     """
     Returns all items that are not aligned along the majority
     row and do not have a target in their column. Only one item
-    for one target is allowed.
+    for one target is allowed. See `get_unaligned_mask`.
 
     Args:
         items: set of GameObjects
@@ -114,20 +269,13 @@ def get_unaligned_items(items: set, targs: set, min_row: int=2):
             their column or do not align on the row with the
             maximum number of target aligned items
     """
-    coord_counts = get_coord_counts(items)
-    max_row = get_max_row(items, min_row=min_row)
-    _, targ_cols = get_rows_and_cols(targs)
-
-    loners = set()
-    for item in items:
-        if item.coord[1] not in targ_cols:
-            loners.add(item)
-        elif item.coord[0] != max_row:
-            loners.add(item)
-        elif coord_counts[item.coord] > 1:
-            coord_counts[item.coord] -= 1
-            loners.add(item)
-    return loners
+    items = list(items)
+    mask = get_unaligned_mask(
+        get_coord_array(items),
+        get_coord_array(targs),
+        min_row=min_row
+    )
+    return {items[i] for i in np.flatnonzero(mask)}
 
 def get_aligned_items(items: set, targs: set, min_row: int=1):
     """
@@ -170,13 +318,15 @@ def max_key(d):
     max_count = 0
     m_key = None
     for k,v in d.items():
-        if v > max_count: m_key = k
+        if v > max_count:
+            max_count = v
+            m_key = k
     return m_key
 
 def nearest_obj(ref_obj, objs):
     """
     Searches through the objs set for the nearest object to the
-    ref_obj.
+    ref_obj. See `get_nearest_idx`.
 
     Args:
         ref_obj: GameObject
@@ -185,15 +335,10 @@ def nearest_obj(ref_obj, objs):
         nearest: GameObject
             the closest object to the ref_obj
     """
-    ref_coord = np.asarray(ref_obj.coord)
-    min_dist = np.inf
-    nearest = None
-    for obj in objs:
-        dist = np.linalg.norm(ref_coord - np.asarray(obj.coord))
-        if dist < min_dist:
-            min_dist = dist
-            nearest = obj
-    return nearest
+    objs = list(objs)
+    idx = get_nearest_idx(ref_obj.coord, get_coord_array(objs))
+    if idx is None: return None
+    return objs[idx]
 
 def euc_distance(coord1, coord2):
     """
@@ -235,15 +380,14 @@ def coord_add(coord0, coord1):
 
 def decompose(val, atoms):
     """
-    Decomposes the argued value into the available atoms starting with
-    the biggest atom and continuing down the line.. For example, if
+    Decomposes the argued value into the fewest atoms. For example, if
     the atoms were [1,4,10] and the val was 7, the result would be
-    {4: 1, 1: 3} There is one 4 and three ones to make 7.
+    {10: 0, 4: 1, 1: 3}. There is one 4 and three ones to make 7. If
+    the atoms are [1,7,10] and the val is 14, the result is two 7s.
 
-    WARNING: in special circumstances it is possible to not get the
-    fewest number of atoms. For example, if the atoms are [1,7,10] and
-    the val is 14, this function will return one 10 and four 1s rather
-    than two 7s.
+    The decomposition is computed with the memoized dynamic program of
+    `get_decomposer`. Values that cannot be made from the atoms are
+    decomposed greedily from the biggest atom, leaving a remainder.
 
     Args:
         val: int
@@ -260,13 +404,9 @@ def decompose(val, atoms):
     """
     atoms = list(reversed(sorted(atoms)))
     counts = {atom: 0 for atom in atoms}
-    remaining = int(val)
-    for atom in atoms:
-        if remaining <= 0 or atom <= 0: break
-        count = remaining/atom
-        if int(count) == count: remaining = 0
-        else: remaining = remaining - int(count)*atom
-        counts[atom] = int(count)
+    decomposer = get_decomposer(atoms)
+    for atom,count in zip(decomposer.atoms, decomposer.decompose_one(val)):
+        counts[atom] = count
     return counts
 
 def get_multiples_pairs(val):
@@ -288,6 +428,288 @@ def get_multiples_pairs(val):
             multiples.append((i, val//i))
     return multiples
 
+def decompose_batch(vals, atoms):
+    """
+    Decomposes each of the argued values into the fewest atoms, see
+    `decompose`.
+
+    Args:
+        vals: array like of ints (N,)
+        atoms: list of ints (K,)
+    Returns:
+        counts: ndarray (N, K) of int64
+            the count of each atom in the order of the argued atoms
+    """
+    decomposer = get_decomposer(atoms)
+    counts = decomposer.decompose(vals)
+    # Reorder the columns from the ascending positive atoms of the
+    # decomposer to the argued atoms
+    col = {atom: i for i,atom in enumerate(decomposer.atoms)}
+    out = np.zeros((len(counts), len(atoms)), dtype=np.int64)
+    for i,atom in enumerate(atoms):
+        if atom in col: out[:,i] = counts[:,col[atom]]
+    return out
+
+# The memoized decomposers keyed by their atoms
+_DECOMPOSERS = dict()
+
+def get_decomposer(atoms):
+    """
+    Returns the memoized Decomposer of the argued atoms.
+
+    Args:
+        atoms: list of ints
+    Returns:
+        decomposer: Decomposer
+    """
+    key = tuple(sorted(set(int(atom) for atom in atoms)))
+    if key not in _DECOMPOSERS: _DECOMPOSERS[key] = Decomposer(key)
+    return _DECOMPOSERS[key]
+
+class Decomposer:
+    """
+    Minimum count decompositions of values into a fixed set of atoms.
+
+    The dynamic program fills a table of the fewest atoms for every
+    value up to the largest value that has been asked for. Each atom is
+    added to the table in a single vectorized pass: along every residue
+    class of the atom, the best count of a value v*atom+r after the
+    pass is min over i <= v of best[i*atom+r] + (v-i), which is a prefix
+    minimum. The number of copies of the atom used at each value is
+    stored so that decompositions are recovered with one lookup per
+    atom.
+
+    An optimal decomposition never holds as many as `a_max` atoms that
+    are smaller than the biggest atom a_max, as some of them would sum
+    to a multiple of a_max and could be replaced by fewer copies of
+    a_max. So every value at or above a_max*a_prev, where a_prev is the
+    second biggest atom, is reduced by copies of a_max into
+    [a_max*a_prev, a_max*a_prev + a_max) and the table never grows
+    beyond that.
+    """
+    def __init__(self, atoms, max_table_size: int=2**24):
+        """
+        Args:
+            atoms: sequence of ints
+                atoms that are not positive are ignored
+            max_table_size: int
+                the maximum number of values in the table. Values that
+                would require a bigger table are decomposed greedily.
+        """
+        self.atoms = sorted(set(int(a) for a in atoms if a > 0))
+        self.max_table_size = max_table_size
+        self.threshold = None
+        if len(self.atoms) > 1:
+            self.threshold = self.atoms[-1]*self.atoms[-2]
+        self.best = np.zeros(1, dtype=np.int64)
+        self.counts = [np.zeros(1, dtype=np.int64) for _ in self.atoms]
+
+    @property
+    def size(self):
+        return len(self.best)
+
+    def build(self, size: int):
+        """
+        Fills the table for the values 0 through size-1.
+
+        Args:
+            size: int
+        """
+        inf = size + 1
+        best = np.full(size, inf, dtype=np.int64)
+        best[0] = 0
+        self.counts = []
+        for atom in self.atoms:
+            n_rows = -(-size//atom)
+            padded = np.full(n_rows*atom, inf, dtype=np.int64)
+            padded[:size] = best
+            padded = padded.reshape(n_rows, atom)
+            rows = np.arange(n_rows, dtype=np.int64)[:,None]
+            # The prefix minimum of best[i]-i along each residue class,
+            # keyed with the row so that the minimizing row is kept
+            keys = (padded - rows + n_rows)*n_rows + rows
+            keys = np.minimum.accumulate(keys, axis=0)
+            starts = keys % n_rows
+            padded = keys//n_rows - n_rows + rows
+            counts = rows - starts
+            unreachable = padded >= inf
+            padded[unreachable] = inf
+            counts[unreachable] = 0
+            best = padded.reshape(-1)[:size]
+            self.counts.append(counts.reshape(-1)[:size])
+        self.best = best
+
+    def reduce(self, vals):
+        """
+        Removes the copies of the biggest atom that every optimal
+        decomposition of each value contains.
+
+        Args:
+            vals: ndarray of int64
+        Returns:
+            vals: ndarray of int64
+            n_biggest: ndarray of int64
+                the number of removed copies of the biggest atom
+        """
+        n_biggest = np.zeros_like(vals)
+        if len(self.atoms) == 1:
+            n_biggest = vals//self.atoms[0]
+            return vals - n_biggest*self.atoms[0], n_biggest
+        if self.threshold is not None:
+            big = self.atoms[-1]
+            above = vals >= self.threshold
+            n_biggest[above] = (vals[above] - self.threshold)//big
+            vals = vals - n_biggest*big
+        return vals, n_biggest
+
+    def decompose_one(self, val):
+        """
+        Decomposes a single value without creating any arrays once the
+        table covers it.
+
+        Args:
+            val: int
+        Returns:
+            counts: list of ints
+                the count of each atom in ascending order of the atoms
+        """
+        val = int(val)
+        n_atoms = len(self.atoms)
+        if val <= 0 or n_atoms == 0: return [0]*n_atoms
+        big = self.atoms[-1]
+        n_biggest = 0
+        if n_atoms == 1:
+            n_biggest = val//big
+        elif val >= self.threshold:
+            n_biggest = (val - self.threshold)//big
+        rem = val - n_biggest*big
+        if rem >= self.size:
+            return [int(c) for c in self.decompose([val])[0]]
+        if self.best[rem] > self.size:
+            return [int(c) for c in self.decompose([val])[0]]
+        counts = [0]*n_atoms
+        counts[-1] = n_biggest
+        for k in range(n_atoms-1, -1, -1):
+            c = int(self.counts[k][rem])
+            counts[k] += c
+            rem -= c*self.atoms[k]
+        return counts
+
+    def decompose(self, vals):
+        """
+        Args:
+            vals: array like of ints (N,)
+        Returns:
+            counts: ndarray (N, K) of int64
+                the count of each atom in ascending order of the atoms.
+                Rows of values that are not positive are zeros.
+        """
+        vals = np.asarray(vals, dtype=np.int64).reshape(-1)
+        counts = np.zeros((len(vals), len(self.atoms)), dtype=np.int64)
+        if len(self.atoms) == 0: return counts
+        vals = np.maximum(vals, 0)
+        rems, n_biggest = self.reduce(vals)
+        counts[:,-1] = n_biggest
+        max_val = int(rems.max()) if len(rems) else 0
+        if max_val >= self.size and max_val < self.max_table_size:
+            # Grow geometrically to amortize rebuilding the table
+            size = min(max(max_val+1, 2*self.size), self.max_table_size)
+            self.build(size)
+        in_table = rems < self.size
+        idxs = np.where(in_table, rems, 0)
+        reachable = in_table & (self.best[idxs] < self.size+1)
+        for k in reversed(range(len(self.atoms))):
+            c = np.where(reachable, self.counts[k][idxs], 0)
+            counts[:,k] += c
+            idxs = idxs - c*self.atoms[k]
+        # Greedy fallback for unreachable values and values beyond the
+        # table
+        greedy = ~reachable
+        if np.any(greedy):
+            rem = rems[greedy]
+            for k in reversed(range(len(self.atoms))):
+                c = rem//self.atoms[k]
+                counts[greedy,k] += c
+                rem = rem - c*self.atoms[k]
+        return counts
+
+def get_multiples(val, low, high):
+    """
+    Returns all multiples of the argued value within an inclusive
+    range in ascending order.
+
+    Args:
+        val: int
+            must be non-zero
+        low: int
+        high: int
+    Returns:
+        multiples: ndarray of int64
+    """
+    val = abs(int(val))
+    first = -(-low//val)
+    last = high//val
+    return np.arange(first, last+1, dtype=np.int64)*val
+
+def get_operand(operator, init_val, targ_val):
+    """
+    Computes the operand of a task, such that the operator applied to
+    the initial value and the operand gives the target. Tasks that
+    multiply or divide an initial value of 0 become additions.
+
+    Args:
+        operator: str
+        init_val: int or float
+        targ_val: int or float
+    Returns:
+        operator: str
+        operand: int or float
+            integral ratios of MULTIPLY tasks are ints
+    """
+    if operator == SUBTRACT:
+        operand = init_val - targ_val
+    elif operator == ADD or init_val == 0:
+        operator = ADD
+        operand = targ_val - init_val
+    elif operator == MULTIPLY:
+        operand = targ_val/init_val
+        if operand == int(operand): operand = int(operand)
+    elif operator == DIVIDE:
+        operand = targ_val*init_val
+    return operator, operand
+
+def get_operands(operators, init_vals, targ_vals):
+    """
+    Vectorized `get_operand`.
+
+    Args:
+        operators: array like (N,) of ints
+            the operator of each task as its index in
+            `constants.OPERATOR2IDX`
+        init_vals: array like (N,) of ints or floats
+        targ_vals: array like (N,) of ints or floats
+    Returns:
+        operators: ndarray (N,) of int8
+        operands: ndarray (N,) of float64
+    """
+    operators = np.array(operators, dtype=np.int8)
+    init_vals = np.asarray(init_vals)
+    targ_vals = np.asarray(targ_vals)
+    is_zero = init_vals == 0
+    mul = OPERATOR2IDX[MULTIPLY]
+    div = OPERATOR2IDX[DIVIDE]
+    operators[is_zero & ((operators == mul) | (operators == div))] =\
+        OPERATOR2IDX[ADD]
+    operands = np.where(
+        operators == OPERATOR2IDX[SUBTRACT],
+        init_vals - targ_vals,
+        targ_vals - init_vals
+    ).astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        operands = np.where(operators == mul, targ_vals/init_vals, operands)
+    operands = np.where(operators == div, targ_vals*init_vals, operands)
+    return operators, operands
+
 def widest_width(block_sizes):
     """
     Returns the width of the widest block.
@@ -367,3 +789,20 @@ def get_magnitude_counts(num):
         if count > 0: counts[len(ints)-1-i] = count
     return counts
 
+
+def copy_rng(rng):
+    """
+    Returns an independent copy of a numpy Generator. This is several
+    times faster than copy.deepcopy because the new bit generator is
+    constructed from a cached SeedSequence before its state is
+    overwritten.
+
+    Args:
+        rng: numpy Generator
+    Returns:
+        copy: numpy Generator
+            a generator that will produce the same stream as rng
+    """
+    bit_gen = type(rng.bit_generator)(_SEED_SEQ)
+    bit_gen.state = rng.bit_generator.state
+    return np.random.Generator(bit_gen)
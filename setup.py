@@ -3,6 +3,9 @@ from setuptools import setup
 setup(name='numberline',
       version='0.0.1',
       author="Satchel Grant",
-      install_requires=['gym', 'numpy', 'matplotlib'],
+      install_requires=['gym', 'numpy'],
+      extras_require={'render': ['matplotlib']},
+      # gym calls register_envs when it is imported after numberline
+      entry_points={'gym.envs': ['__root__ = numberline:register_envs']},
       python_requires='>=3'
 )
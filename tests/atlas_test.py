@@ -0,0 +1,81 @@
+from numberline.controllers import Controller
+from numberline.constants import *
+from numberline.atlas import ObservationAtlas, get_tasks
+import numpy as np
+import tempfile
+import unittest
+
+def make_controller(atlas=None):
+    return Controller(
+        pixel_density=2,
+        targ_range=(1, 5),
+        operators={ADD, SUBTRACT},
+        zoom_range=(-1, 0),
+        scroll_range=(-3, 8),
+        atlas=atlas,
+    )
+
+class ObservationAtlasTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.atlas = ObservationAtlas.build(cls.tmp.name, make_controller())
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_get_tasks(self):
+        tasks = get_tasks(make_controller())
+        self.assertEqual(len(tasks), 10)
+        self.assertEqual(len(self.atlas.tasks), 10)
+
+    def test_matches_drawing(self):
+        drawn = make_controller()
+        mapped = make_controller(atlas=ObservationAtlas.load(self.tmp.name))
+        rng = np.random.default_rng(0)
+        for targ_val in [2, 5]:
+            obs = drawn.reset(targ_val=targ_val, operator=SUBTRACT)
+            atlas_obs = mapped.reset(targ_val=targ_val, operator=SUBTRACT)
+            self.assertTrue(np.array_equal(obs, atlas_obs))
+            for actn in rng.integers(0, len(IDX2ACTION)-1, size=100):
+                obs, rew, done, _ = drawn.step(actn)
+                atlas_obs, atlas_rew, atlas_done, _ = mapped.step(actn)
+                self.assertTrue(np.array_equal(obs, atlas_obs))
+                self.assertEqual(rew, atlas_rew)
+                self.assertEqual(done, atlas_done)
+
+    def test_zero_copy(self):
+        contr = make_controller(atlas=self.atlas)
+        contr.reset(targ_val=3, operator=ADD)
+        obs, _, _, _ = contr.step(ACTION2IDX[ADD_ONE])
+        self.assertTrue(np.shares_memory(obs, self.atlas.frames))
+        self.assertFalse(obs.flags.writeable)
+        # The grid is drawn lazily
+        self.assertTrue(np.array_equal(contr.observe(), obs))
+
+    def test_fallback(self):
+        contr = make_controller(atlas=self.atlas)
+        contr.reset(targ_val=3, operator=ADD)
+        # The fill is bounded to the targ_range in the atlas
+        for _ in range(7): contr.step(ACTION2IDX[ADD_ONE])
+        obs, _, _, _ = contr.step(ACTION2IDX[ADD_ONE])
+        self.assertFalse(np.shares_memory(obs, self.atlas.frames))
+
+    def test_deep_zoom(self):
+        # Without a zoom range the translation leaves the int64 range
+        # of the records, where the frames are drawn instead
+        kwargs = {"pixel_density": 2, "targ_range": (1, 5)}
+        drawn = Controller(**kwargs)
+        mapped = Controller(atlas=self.atlas, **kwargs)
+        for contr in [drawn, mapped]:
+            contr.reset(targ_val=3, operator=ADD, init_val=0)
+            contr.step(ACTION2IDX[RIGHT])
+        for _ in range(25):
+            obs, _, _, _ = drawn.step(ACTION2IDX[ZOOM_IN])
+            atlas_obs, _, _, _ = mapped.step(ACTION2IDX[ZOOM_IN])
+            self.assertTrue(np.array_equal(obs, atlas_obs))
+        self.assertFalse(mapped.register.in_record_range())
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+from numberline.grid import Grid
+from numberline.registry import Register, STATE_DTYPE, trunc_log10
+from numberline.controllers import Controller
+from numberline.constants import *
+import numberline.batch as batch
+import numpy as np
+import unittest
+
+def random_states(n, seed=0):
+    rng = np.random.default_rng(seed)
+    states = np.zeros(n, dtype=STATE_DTYPE)
+    fills = rng.integers(-30000, 30000, size=n)/100
+    states["fill"] = batch.val2fill(fills)
+    states["zoom"] = rng.integers(-3, 4, size=n)
+    states["trans"] = rng.integers(-400, 400, size=n)
+    states["operator"] = rng.integers(0, len(IDX2OPERATOR), size=n)
+    states["operand"] = rng.integers(-100, 100, size=n)
+    return states
+
+class BatchTests(unittest.TestCase):
+    def test_render_matches_register(self):
+        for density in [1, 3]:
+            states = random_states(200, seed=density)
+            frames = batch.render_states(states, density)
+            reg = Register(Grid(density))
+            for state, frame in zip(states, frames):
+                reg.set_record(state)
+                reg.draw_register()
+                self.assertTrue(np.array_equal(reg.grid.grid, frame))
+
+    def test_lookahead_matches_controller(self):
+        states = random_states(50)
+        targ_vals = np.random.default_rng(1).integers(-300, 300, size=50)
+        targ_vals = targ_vals.astype(float)
+        targ_vals[::2] = np.round(states["fill"][::2]*10.0**FILL_EXP, 2)
+        next_states, rews, dones, frames = batch.lookahead(
+            states,
+            targ_vals,
+            pixel_density=2
+        )
+        self.assertEqual(next_states.shape, (50, 7))
+        self.assertEqual(frames.shape, (50, 7, 2, 210))
+        contr = Controller(pixel_density=2)
+        for i in range(len(states)):
+            contr.targ_val = targ_vals[i]
+            for a in range(7):
+                contr.register.set_record(states[i])
+                obs, rew, done, _ = contr.step(a)
+                reg = contr.register
+                self.assertEqual(next_states[i,a].tolist(), reg.get_record())
+                self.assertEqual(rews[i,a], rew)
+                self.assertEqual(dones[i,a], done)
+                self.assertTrue(np.array_equal(frames[i,a], obs))
+
+    def test_trunc_log10_matches_register(self):
+        units = np.asarray([1, 5, 10, 15, 100, 999, 10**18, 10**18+1])
+        for exp in [-20, -3, 0, 3]:
+            log10s = batch.trunc_log10(units, np.full(len(units), exp))
+            for n, log10 in zip(units, log10s):
+                self.assertEqual(log10, trunc_log10(int(n), exp))
+
+    def test_masks_match_register(self):
+        states = random_states(200)
+        zoom_range, scroll_range = (-2, 2), (-150, 2500)
+        masks = batch.get_action_masks(states, zoom_range, scroll_range)
+        contr = Controller(
+            pixel_density=1,
+            zoom_range=zoom_range,
+            scroll_range=scroll_range,
+        )
+        contr.targ_val = 0
+        next_states, _, _, _ = batch.lookahead(
+            states,
+            np.zeros(len(states)),
+            zoom_range=zoom_range,
+            scroll_range=scroll_range,
+        )
+        for i in range(len(states)):
+            contr.register.set_record(states[i])
+            mask = contr.register.get_action_mask()
+            self.assertEqual(masks[i].tolist(), mask.tolist())
+            for a in range(4):
+                contr.register.set_record(states[i])
+                contr.apply_action(a)
+                record = contr.register.get_record()
+                self.assertEqual(next_states[i,a].tolist(), record)
+
+    def test_no_frames(self):
+        states = random_states(5)
+        _, _, _, frames = batch.lookahead(states, np.zeros(5))
+        self.assertIsNone(frames)
+
+    def test_get_states(self):
+        contrs = [Controller(pixel_density=1) for _ in range(3)]
+        for i,contr in enumerate(contrs):
+            contr.reset(targ_val=i+1, operator=ADD, init_val=0)
+        states, targ_vals = batch.get_states(contrs)
+        self.assertEqual(list(targ_vals), [1,2,3])
+        self.assertEqual(list(states["operand"]), [1,2,3])
+
+if __name__=="__main__":
+    unittest.main()
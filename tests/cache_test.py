@@ -0,0 +1,45 @@
+from numberline.controllers import Controller
+from numberline.constants import *
+from numberline.cache import FrameCache
+import numpy as np
+import unittest
+
+class FrameCacheTests(unittest.TestCase):
+    def test_lru_eviction(self):
+        frame = np.zeros(10)
+        cache = FrameCache(max_bytes=3*frame.nbytes)
+        for key in range(3): cache.put(key, frame+key)
+        self.assertIsNotNone(cache.get(0))
+        cache.put(3, frame+3)
+        self.assertEqual(len(cache), 3)
+        self.assertNotIn(1, cache)
+        self.assertIn(0, cache)
+        self.assertEqual(cache.nbytes, 3*frame.nbytes)
+        self.assertIsNone(cache.get(1))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(cache.hit_rate, .5)
+
+    def test_put_copies(self):
+        cache = FrameCache()
+        frame = np.zeros(4)
+        cache.put("a", frame)
+        frame[0] = 1
+        self.assertEqual(cache.get("a")[0], 0)
+
+    def test_matches_drawing(self):
+        drawn = Controller(pixel_density=2)
+        cached = Controller(pixel_density=2, cache_bytes=2**20)
+        rng = np.random.default_rng(0)
+        for _ in range(3):
+            drawn.reset(targ_val=30, operator=ADD, init_val=0)
+            obs = cached.reset(targ_val=30, operator=ADD, init_val=0)
+            for actn in rng.integers(0, len(IDX2ACTION)-1, size=200):
+                obs, _, _, _ = drawn.step(actn)
+                cached_obs, _, _, _ = cached.step(actn)
+                self.assertTrue(np.array_equal(obs, cached_obs))
+        cache = cached.frame_cache
+        self.assertGreater(cache.hits, 0)
+        self.assertLessEqual(cache.nbytes, 2**20)
+
+if __name__=="__main__":
+    unittest.main()
@@ -1,7 +1,251 @@
 import numberline.controllers as controllers
 from   numberline.constants import *
 from   numberline.ai import zoom_solution
+from   numberline.registry import RECORD_OVERFLOW
 import matplotlib.pyplot as plt
+import numpy as np
+import unittest
+
+class MacroActionTests(unittest.TestCase):
+    def test_add_units(self):
+        contr = controllers.Controller(macro_actions=True)
+        contr.reset(targ_val=70, operator=ADD, init_val=0)
+        contr.step(ACTION2IDX[ZOOM_OUT])
+        obs, rew, done, info = contr.step((MACRO2IDX[ADD_UNITS], 7))
+        self.assertEqual(contr.register.fill, 70)
+        self.assertEqual(info["n_steps"], 7)
+        obs, rew, done, info = contr.step(ACTION2IDX[END_GAME])
+        self.assertEqual(rew, 1)
+
+    def test_set_zoom_matches_primitives(self):
+        contr = controllers.Controller(macro_actions=True)
+        contr.reset(targ_val=5, operator=ADD, init_val=0)
+        contr.register.trans = -1234
+        for _ in range(3): contr.step(ACTION2IDX[ZOOM_OUT])
+        for _ in range(2): contr.step(ACTION2IDX[ZOOM_IN])
+        prim_obs = contr.grid.grid
+        prim_trans = contr.register.trans
+
+        contr.register.set_zoom(0)
+        contr.register.trans = -1234
+        obs, _, _, info = contr.step((MACRO2IDX[SET_ZOOM], 3))
+        obs, _, _, info = contr.step((MACRO2IDX[SET_ZOOM], 1))
+        self.assertEqual(info["n_steps"], 2)
+        self.assertEqual(contr.register.trans, prim_trans)
+        self.assertTrue(np.array_equal(obs, prim_obs))
+
+    def test_set_zoom_clamped(self):
+        contr = controllers.Controller(macro_actions=True, zoom_range=(-2,2))
+        contr.reset(targ_val=5, operator=ADD, init_val=0)
+        obs, _, _, info = contr.step((MACRO2IDX[SET_ZOOM], 40))
+        self.assertEqual(contr.register.zoom, 2)
+        self.assertEqual(info["n_steps"], 2)
+        obs, _, _, info = contr.step((MACRO2IDX[SET_ZOOM], 40))
+        self.assertEqual(info["n_steps"], 0)
+
+    def test_macro_args(self):
+        contr = controllers.Controller(macro_actions=True)
+        contr.reset(targ_val=5, operator=ADD, init_val=0)
+        for macro in [SET_ZOOM, ADD_UNITS]:
+            with self.assertRaises(ValueError):
+                contr.step(MACRO2IDX[macro])
+            with self.assertRaises(ValueError):
+                contr.step((MACRO2IDX[macro], 1.5))
+
+    def test_translate_to_fill(self):
+        contr = controllers.Controller(macro_actions=True)
+        contr.reset(targ_val=5, operator=ADD, init_val=0)
+        contr.step((MACRO2IDX[ADD_UNITS], 23))
+        obs, _, _, info = contr.step(MACRO2IDX[TRANSLATE_TO_FILL])
+        self.assertEqual(contr.register.trans, 23)
+        self.assertEqual(info["n_steps"], 23)
+
+    def test_disabled(self):
+        contr = controllers.Controller()
+        contr.reset()
+        with self.assertRaises(AssertionError):
+            contr.step(MACRO2IDX[TRANSLATE_TO_FILL])
+
+class RangeTests(unittest.TestCase):
+    def test_zoom_range(self):
+        contr = controllers.Controller(zoom_range=(-1, 2))
+        contr.reset()
+        for _ in range(4): contr.step(ACTION2IDX[ZOOM_OUT])
+        self.assertEqual(contr.register.zoom, 2)
+        for _ in range(4):
+            _, _, _, info = contr.step(ACTION2IDX[ZOOM_IN])
+        self.assertEqual(contr.register.zoom, -1)
+        self.assertFalse(info["action_mask"][ACTION2IDX[ZOOM_IN]])
+        self.assertTrue(info["action_mask"][ACTION2IDX[ZOOM_OUT]])
+
+    def test_scroll_range(self):
+        contr = controllers.Controller(scroll_range=(-20, 35))
+        contr.reset()
+        for _ in range(40): contr.step(ACTION2IDX[RIGHT])
+        self.assertEqual(contr.register.trans, 35)
+        contr.step(ACTION2IDX[ZOOM_OUT])
+        # 30 is the largest multiple of 10 within the range
+        self.assertEqual(contr.register.trans, 3)
+        _, _, _, info = contr.step(ACTION2IDX[RIGHT])
+        self.assertEqual(contr.register.trans, 3)
+        self.assertFalse(info["action_mask"][ACTION2IDX[RIGHT]])
+        for _ in range(10): contr.step(ACTION2IDX[LEFT])
+        self.assertEqual(contr.register.trans, -2)
+        contr.step(ACTION2IDX[ZOOM_IN])
+        for _ in range(10): contr.step(ACTION2IDX[LEFT])
+        self.assertEqual(contr.register.trans, -20)
+
+    def test_mask_matches_transitions(self):
+        contr = controllers.Controller(
+            zoom_range=(-2, 2),
+            scroll_range=(-15, 15)
+        )
+        contr.reset()
+        rng = np.random.default_rng(0)
+        for actn in rng.integers(0, 4, size=300):
+            mask = contr.register.get_action_mask()
+            state = contr.register.get_state()
+            contr.step(actn)
+            changed = state != contr.register.get_state()
+            self.assertEqual(changed, mask[actn])
+
+class ExactRewardTests(unittest.TestCase):
+    def test_decimal_target(self):
+        contr = controllers.Controller(pixel_density=1)
+        contr.reset(targ_val=1.23, operator=ADD, init_val=0)
+        actns = [ADD_ONE, ZOOM_IN] + [ADD_ONE]*2 + [ZOOM_IN]
+        actns = actns + [ADD_ONE]*3 + [END_GAME]
+        for actn in [ACTION2IDX[a] for a in actns]:
+            obs, rew, done, info = contr.step(actn)
+        self.assertEqual(info["fill"], 1.23)
+        self.assertEqual(rew, 1)
+
+class StepSequenceTests(unittest.TestCase):
+    def make_actns(self, contr):
+        actns = []
+        done = False
+        while not done:
+            actn = zoom_solution(contr)
+            actns.append(actn)
+            _, _, done, _ = contr.step(actn)
+        return actns
+
+    def test_matches_step(self):
+        np.random.seed(0)
+        contr = controllers.Controller(pixel_density=2)
+        contr.reset(targ_val=87, operator=ADD, init_val=0)
+        actns = self.make_actns(contr)
+        goal = contr.grid.grid
+
+        contr.reset(targ_val=87, operator=ADD, init_val=0)
+        obs = []
+        for actn in actns:
+            obs.append(contr.step(actn)[0])
+        contr.reset(targ_val=87, operator=ADD, init_val=0)
+        frames, rews, dones, states = contr.step_sequence(
+            actns,
+            frame_stride=1
+        )
+        self.assertTrue(np.array_equal(frames, np.asarray(obs)))
+        self.assertTrue(np.array_equal(contr.grid.grid, goal))
+        self.assertEqual(rews[-1], 1)
+        self.assertTrue(dones[-1] and not np.any(dones[:-1]))
+        self.assertEqual(states["fill"][-1], 87*10**(-FILL_EXP))
+
+    def test_stride_and_early_stop(self):
+        contr = controllers.Controller(pixel_density=1)
+        contr.reset(targ_val=3, operator=ADD, init_val=0)
+        actns = [ACTION2IDX[ADD_ONE]]*5 + [ACTION2IDX[END_GAME]]
+        actns = actns + [ACTION2IDX[ADD_ONE]]*4
+        frames, rews, dones, states = contr.step_sequence(
+            actns,
+            frame_stride=2
+        )
+        self.assertEqual(len(rews), 6)
+        self.assertEqual(len(frames), 3)
+        self.assertEqual(rews[-1], -1)
+        fills = states["fill"]*10**FILL_EXP
+        self.assertEqual(list(fills), [1,2,3,4,5,5])
+
+        contr.reset(targ_val=3, operator=ADD, init_val=0)
+        frames, rews, dones, states = contr.step_sequence(actns)
+        self.assertIsNone(frames)
+
+    def test_extreme_records(self):
+        contr = controllers.Controller(pixel_density=1)
+        zoom_in = [ACTION2IDX[RIGHT]] + [ACTION2IDX[ZOOM_IN]]*20
+        fill_out = [ACTION2IDX[ZOOM_OUT]]*14 + [ACTION2IDX[ADD_ONE]]
+        for actns, field in [(zoom_in, "trans"), (fill_out, "fill")]:
+            contr.reset(targ_val=3, operator=ADD, init_val=0)
+            with self.assertRaises(ValueError):
+                for actn in actns: contr.step(actn)
+                contr.register.get_record()
+            self.assertFalse(contr.register.in_record_range())
+            contr.reset(targ_val=3, operator=ADD, init_val=0)
+            frames, rews, dones, states = contr.step_sequence(
+                actns,
+                frame_stride=1,
+            )
+            self.assertEqual(len(frames), len(actns))
+            self.assertEqual(states[field][-1], RECORD_OVERFLOW)
+            self.assertNotEqual(states[field][0], RECORD_OVERFLOW)
+            with self.assertRaises(ValueError):
+                contr.register.set_record(states[-1])
+        self.assertEqual(contr.register.fill, 10**14)
+        # The largest records still fit
+        contr.reset(targ_val=3, operator=ADD, init_val=0)
+        _, _, _, states = contr.step_sequence(fill_out[2:])
+        self.assertEqual(states["fill"][-1], 10**12*10**(-FILL_EXP))
+
+class TaskStreamTests(unittest.TestCase):
+    def test_next_task_in_place(self):
+        contr = controllers.Controller(
+            pixel_density=2,
+            operators={ADD},
+            task_stream=True
+        )
+        contr.reset(targ_val=12, operator=ADD, init_val=0)
+        done = False
+        n_tasks = 0
+        while n_tasks < 5:
+            actn = zoom_solution(contr)
+            prev = contr.register.get_record()
+            obs, rew, done, info = contr.step(actn)
+            self.assertFalse(done)
+            if info["new_task"]:
+                n_tasks += 1
+                self.assertEqual(rew, 1)
+                # The position of the register carries over
+                record = contr.register.get_record()
+                self.assertEqual(record[:3], prev[:3])
+                self.assertEqual(
+                    contr.operand,
+                    contr.targ_val - contr.register.fill
+                )
+                # Only the meta units changed, the grid still matches
+                # a full redraw
+                obs = obs.copy()
+                contr.register.draw_register()
+                self.assertTrue(np.array_equal(obs, contr.grid.grid))
+
+    def test_failed_end(self):
+        contr = controllers.Controller(task_stream=True)
+        contr.reset(targ_val=12, operator=ADD, init_val=0)
+        _, rew, done, info = contr.step(ACTION2IDX[END_GAME])
+        self.assertEqual(rew, -1)
+        self.assertTrue(done)
+        self.assertFalse(info["new_task"])
+
+    def test_stale_grid_is_redrawn(self):
+        contr = controllers.Controller(pixel_density=2, task_stream=True)
+        contr.reset(targ_val=2, operator=ADD, init_val=0)
+        # The actions are applied without drawing
+        contr.step_sequence([ACTION2IDX[ADD_ONE]]*2)
+        obs, _, done, info = contr.step(ACTION2IDX[END_GAME])
+        self.assertTrue(info["new_task"])
+        obs = obs.copy()
+        contr.register.draw_register()
+        self.assertTrue(np.array_equal(obs, contr.grid.grid))
 
 if __name__=="__main__":
     kwargs = {
@@ -0,0 +1,29 @@
+from numberline.cycles import CycleDetector
+import unittest
+
+class CycleDetectorTests(unittest.TestCase):
+    def test_repeats(self):
+        detector = CycleDetector(max_repeats=2, table_size=8)
+        detector.reset(key=3)
+        self.assertFalse(detector.add(5))
+        self.assertFalse(detector.add(3))
+        self.assertFalse(detector.add(5))
+        self.assertTrue(detector.add(3))
+
+    def test_collisions_never_detect(self):
+        # Keys 0 and 4 share a slot and keep evicting each other
+        detector = CycleDetector(max_repeats=1, table_size=4)
+        for _ in range(10):
+            self.assertFalse(detector.add(0))
+            self.assertFalse(detector.add(4))
+
+    def test_clone(self):
+        detector = CycleDetector(max_repeats=1)
+        detector.add(7)
+        clone = detector.clone()
+        self.assertTrue(clone.add(7))
+        detector.reset()
+        self.assertFalse(detector.add(7))
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+from numberline.envs import NumberLine
+from numberline.constants import *
+from numberline.registry import STATE_DTYPE
+from numberline.batch import render_states
+from numberline.decoder import decode_frames, decode_states, units2fill
+import numpy as np
+import unittest
+
+def make_states(n, seed=0):
+    """
+    Random states whose fills are at the resolution of their zooms.
+    """
+    rng = np.random.default_rng(seed)
+    states = np.zeros(n, dtype=STATE_DTYPE)
+    states["zoom"] = rng.integers(-3, 4, size=n)
+    states["trans"] = rng.integers(-200, 200, size=n)
+    states["fill"] = units2fill(rng.integers(-200, 200, size=n), states["zoom"])
+    states["operator"] = rng.integers(0, len(IDX2OPERATOR), size=n)
+    states["operand"] = rng.integers(-500, 500, size=n)/rng.choice([1, 4], n)
+    return states
+
+class DecoderTests(unittest.TestCase):
+    def test_round_trip(self):
+        states = make_states(2000)
+        for pixel_density in [1, 3]:
+            frames = render_states(states, pixel_density)
+            decoded = decode_states(frames, pixel_density)
+            for name in ["zoom", "trans", "operator", "operand"]:
+                self.assertTrue(np.array_equal(decoded[name], states[name]))
+            rerendered = render_states(decoded, pixel_density)
+            self.assertTrue(np.array_equal(rerendered, frames))
+            # Fills whose far end is on screen are recovered exactly
+            info = decode_frames(frames, pixel_density)
+            exact = ~info["fill_clipped"] & (info["fill_end"] > info["fill_start"])
+            self.assertGreater(np.count_nonzero(exact), 0)
+            self.assertTrue(np.array_equal(
+                decoded["fill"][exact],
+                states["fill"][exact]
+            ))
+            self.assertTrue(np.array_equal(
+                info["zero_idx"],
+                50 - states["trans"]
+            ))
+
+    def test_edge_fills(self):
+        # A single filled unit at either edge of the screen
+        states = np.zeros(2, dtype=STATE_DTYPE)
+        states["trans"] = [55, -55]
+        states["fill"] = units2fill(np.asarray([5, -5]), states["zoom"])
+        info = decode_frames(render_states(states, 1), 1)
+        self.assertEqual(info["fill_start"].tolist(), [0, 100])
+        self.assertEqual(info["fill_end"].tolist(), [1, 101])
+        self.assertEqual(info["fill_units"].tolist(), [5, -5])
+
+    def test_env_frames(self):
+        env = NumberLine(
+            pixel_density=2,
+            targ_range=(-30, 30),
+            operators={ADD, SUBTRACT, MULTIPLY, DIVIDE},
+            init_range=(0, 3),
+        )
+        env.seed(1)
+        rng = np.random.default_rng(1)
+        frames, states = [], []
+        for _ in range(5):
+            obs = env.reset()
+            done = False
+            while not done:
+                frames.append(obs)
+                states.append(env.controller.register.get_record())
+                obs, _, done, _ = env.step(int(rng.integers(len(IDX2ACTION))))
+        frames = np.asarray(frames)
+        states = np.asarray(states, dtype=STATE_DTYPE)
+        decoded = decode_states(frames, 2)
+        for name in ["zoom", "trans", "operator", "operand"]:
+            self.assertTrue(np.array_equal(decoded[name], states[name]))
+        self.assertTrue(np.array_equal(render_states(decoded, 2), frames))
+
+    def test_bad_shape(self):
+        with self.assertRaises(ValueError):
+            decode_frames(np.zeros((2, 3, 105*2)), 3)
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+from numberline.demos import generate_demos, generate_chunk
+from numberline.recorder import Shard, list_shards
+from numberline.envs import NumberLine
+from numberline.ai import zoom_solution
+import numberline.batch as batch
+import numpy as np
+import os
+import tempfile
+import unittest
+
+def load_episodes(directory):
+    episodes = []
+    for path in list_shards(directory):
+        shard = Shard(path)
+        for i in range(len(shard)):
+            ep = shard.get_episode(i)
+            episodes.append((ep["seed"], np.array(ep["actions"])))
+    return episodes
+
+class DemoTests(unittest.TestCase):
+    def test_deterministic(self):
+        kwargs = {"targ_range": (-50, 50), "pixel_density": 1}
+        with tempfile.TemporaryDirectory() as directory:
+            dir1 = os.path.join(directory, "1")
+            dir2 = os.path.join(directory, "2")
+            n1 = generate_demos(dir1, 23, n_workers=1, seed=3,
+                                env_kwargs=kwargs, chunk_size=5,
+                                verbose=False)
+            n2 = generate_demos(dir2, 23, n_workers=2, seed=3,
+                                env_kwargs=kwargs, chunk_size=5,
+                                verbose=False)
+            self.assertEqual(n1, n2)
+            eps1 = load_episodes(dir1)
+            eps2 = load_episodes(dir2)
+            self.assertEqual(len(eps1), 23)
+            for (seed1, actns1), (seed2, actns2) in zip(eps1, eps2):
+                self.assertEqual(seed1, seed2)
+                self.assertTrue(np.array_equal(actns1, actns2))
+
+    def test_expert_episodes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            generate_chunk(
+                directory,
+                seeds=range(10),
+                env_kwargs={"pixel_density": 2},
+                record_colors=True,
+            )
+            shard = Shard(list_shards(directory)[0])
+            self.assertEqual(len(shard), 10)
+            for i in range(len(shard)):
+                ep = shard.get_episode(i)
+                self.assertEqual(ep["rews"][-1], 1)
+                self.assertTrue(ep["dones"][-1])
+                frames = batch.colors2frames(
+                    ep["colors"].astype(np.float64), 2
+                )
+                rendered = batch.render_states(ep["states"], 2)
+                self.assertTrue(np.allclose(frames, rendered, atol=1e-6))
+            del shard
+
+    def test_matches_env_step(self):
+        # The expert revisits states, so the cycle detection truncates
+        # some of the episodes
+        kwargs = {"pixel_density": 1, "targ_range": (-500, 500),
+                  "max_repeats": 1}
+        env = NumberLine(**kwargs)
+        with tempfile.TemporaryDirectory() as directory:
+            generate_chunk(directory, seeds=range(10), env_kwargs=kwargs)
+            shard = Shard(list_shards(directory)[0])
+            for i in range(len(shard)):
+                ep = shard.get_episode(i)
+                env.seed(int(ep["seed"]))
+                env.reset()
+                rews, done = [], False
+                while not done:
+                    actn = zoom_solution(env.controller)
+                    _, rew, done, _ = env.step(actn)
+                    rews.append(rew)
+                self.assertEqual(rews, ep["rews"].tolist())
+            del shard
+
+    def test_task_stream(self):
+        kwargs = {"pixel_density": 1, "task_stream": True}
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(ValueError):
+                generate_chunk(directory, seeds=range(2), env_kwargs=kwargs)
+            with self.assertRaises(ValueError):
+                generate_demos(directory, 2, n_workers=1,
+                               env_kwargs=kwargs, verbose=False)
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+from numberline.discrete import Discrete, BatchDiscrete
+from numberline.envs import NumberLine
+from gym import spaces
+import numpy as np
+import unittest
+
+class DiscreteTests(unittest.TestCase):
+    def test_contains(self):
+        space = Discrete(7)
+        for i in range(7):
+            self.assertTrue(space.contains(i))
+            self.assertTrue(np.int64(i) in space)
+        self.assertTrue(space.contains(2.0))
+        self.assertFalse(space.contains(2.5))
+        self.assertFalse(space.contains(-1))
+        self.assertFalse(space.contains(7))
+        self.assertFalse(space.contains("a"))
+
+    def test_sample(self):
+        space = Discrete(7, rng=np.random.default_rng(1))
+        actn = space.sample()
+        self.assertTrue(space.contains(actn))
+        actns = space.sample_n(1000)
+        self.assertEqual(actns.shape, (1000,))
+        self.assertEqual(set(actns), set(range(7)))
+
+        space.seed(3)
+        goal = space.sample_n(10)
+        space.seed(3)
+        self.assertTrue(np.array_equal(space.sample_n(10), goal))
+        self.assertIs(space.np_random, space.rng)
+
+    def test_mask(self):
+        space = Discrete(7, rng=np.random.default_rng(2))
+        mask = np.zeros(7, dtype=np.int8)
+        mask[[1, 4]] = 1
+        actns = {space.sample(mask=mask) for _ in range(100)}
+        self.assertEqual(actns, {1, 4})
+        self.assertEqual(space.sample(np.zeros(7, dtype=np.int8)), 0)
+        batch = BatchDiscrete(7, 3, rng=np.random.default_rng(2))
+        masks = np.zeros((3, 7), dtype=bool)
+        masks[0, 2] = masks[1, [3, 6]] = True
+        for _ in range(20):
+            actns = batch.sample(masks)
+            self.assertEqual(actns[0], 2)
+            self.assertIn(actns[1], {3, 6})
+            self.assertEqual(actns[2], 0)
+
+    def test_gym_interop(self):
+        space = Discrete(7)
+        self.assertIsInstance(space, spaces.Discrete)
+        self.assertEqual(space.shape, ())
+        batch = BatchDiscrete(7, 4)
+        self.assertIsInstance(batch, spaces.MultiDiscrete)
+        self.assertEqual(batch.shape, (4,))
+
+    def test_batch(self):
+        space = BatchDiscrete(7, 4, rng=np.random.default_rng(0))
+        self.assertEqual(space.sample().shape, (4,))
+        actns = space.sample_n(5)
+        self.assertEqual(actns.shape, (5,4))
+        self.assertTrue(all(space.contains(a) for a in actns))
+        self.assertFalse(space.contains([0,1,2]))
+        self.assertFalse(space.contains([0,1,2,7]))
+
+    def test_env_generator(self):
+        env = NumberLine(pixel_density=1)
+        self.assertIs(env.action_space.rng, env.rng)
+        env.seed(5)
+        obs = env.reset()
+        actns = env.action_space.sample_n(20)
+        targ = env.controller.targ_val
+        env.seed(5)
+        self.assertTrue(np.array_equal(env.reset(), obs))
+        self.assertEqual(env.controller.targ_val, targ)
+        self.assertTrue(np.array_equal(env.action_space.sample_n(20), actns))
+        # Seeding the space reseeds its own sampling through np_random
+        env.action_space.seed(7)
+        actns = [env.action_space.sample() for _ in range(20)]
+        space = Discrete(7)
+        space.seed(7)
+        self.assertEqual(actns, [space.sample() for _ in range(20)])
+
+    def test_global_seed(self):
+        # Controllers without a generator are seeded from the global one
+        np.random.seed(3)
+        env = NumberLine(pixel_density=1)
+        obs = env.reset()
+        np.random.seed(3)
+        env = NumberLine(pixel_density=1)
+        self.assertTrue(np.array_equal(env.reset(), obs))
+
+if __name__=="__main__":
+    unittest.main()
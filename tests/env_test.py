@@ -2,7 +2,165 @@ import numberline
 import gym
 from numberline.constants import *
 from numberline.oracles import DirectOracle
+from numberline.envs import NumberLine
+import numpy as np
 import time
+import unittest
+
+class NumberLineTests(unittest.TestCase):
+    def test_macro_step_count(self):
+        env = NumberLine(pixel_density=1, macro_actions=True)
+        env.reset(targ_val=50, operator=ADD)
+        obs, rew, done, info = env.step((MACRO2IDX[ADD_UNITS], 10))
+        self.assertEqual(env.step_count, 10)
+
+        env.count_macro_steps = False
+        env.reset(targ_val=50, operator=ADD)
+        obs, rew, done, info = env.step((MACRO2IDX[ADD_UNITS], 10))
+        self.assertEqual(env.step_count, 1)
+
+    def test_macro_action_space(self):
+        env = NumberLine(pixel_density=1)
+        self.assertFalse(env.action_space.contains((MACRO2IDX[SET_ZOOM], 2)))
+        env = NumberLine(pixel_density=1, macro_actions=True)
+        space = env.action_space
+        self.assertTrue(space.contains((MACRO2IDX[ADD_UNITS], 3)))
+        self.assertTrue(space.contains((MACRO2IDX[SET_ZOOM], -2)))
+        self.assertTrue(space.contains((ACTION2IDX[ZOOM_IN], 0)))
+        self.assertFalse(space.contains((len(IDX2ACTION)+len(IDX2MACRO), 0)))
+        self.assertIs(space.spaces[0].rng, env.rng)
+        for _ in range(20): self.assertTrue(space.contains(space.sample()))
+        # Sampled arguments are 0-d arrays
+        env.reset(targ_val=5, operator=ADD)
+        _, _, _, info = env.step((MACRO2IDX[ADD_UNITS], np.asarray(3)))
+        self.assertEqual(info["fill"], 3)
+        env.macro_actions = False
+        self.assertEqual(env.action_space.n, len(IDX2ACTION))
+
+    def test_macro_timeout(self):
+        env = NumberLine(pixel_density=1, macro_actions=True)
+        env.reset(targ_val=50, operator=ADD)
+        actn = (MACRO2IDX[ADD_UNITS], env.max_steps+3)
+        obs, rew, done, info = env.step(actn)
+        self.assertTrue(done)
+        self.assertEqual(rew, -1)
+
+    def test_step_sequence_step_limit(self):
+        env = NumberLine(pixel_density=1)
+        env.reset(targ_val=50, operator=ADD)
+        actns = [ACTION2IDX[RIGHT]]*(env.max_steps+10)
+        frames, rews, dones, states = env.step_sequence(actns)
+        self.assertEqual(len(rews), env.max_steps)
+        self.assertEqual(rews[-1], -1)
+        self.assertTrue(dones[-1])
+        self.assertTrue(np.array_equal(env.last_obs, env.grid.grid))
+
+    def test_get_set_state(self):
+        env = NumberLine(pixel_density=2)
+        env.seed(0)
+        env.reset(targ_val=45, operator=ADD)
+        for actn in [ZOOM_OUT, ADD_ONE, ADD_ONE, RIGHT]:
+            env.step(ACTION2IDX[actn])
+        state = env.get_state()
+        goal = env.grid.grid
+        for actn in [ZOOM_IN, ADD_ONE, LEFT, LEFT]:
+            env.step(ACTION2IDX[actn])
+        future = env.reset()
+
+        env.set_state(state)
+        self.assertEqual(env.register.fill, 20)
+        self.assertEqual(env.step_count, 4)
+        self.assertTrue(np.array_equal(env.controller.observe(), goal))
+        self.assertTrue(np.array_equal(env.reset(), future))
+
+    def test_get_set_state_cycles(self):
+        env = NumberLine(pixel_density=1, max_repeats=3)
+        env.reset(targ_val=50)
+        actns = [ACTION2IDX[RIGHT], ACTION2IDX[LEFT]]*3
+        for actn in actns[:3]:
+            env.step(actn)
+        state = env.get_state()
+        branch = env.clone()
+        dones = [env.step(actn)[2] for actn in actns[3:]]
+        self.assertTrue(dones[-1])
+        # Restoring and replaying truncates at the same step
+        env.reset(targ_val=50)
+        env.set_state(state)
+        self.assertEqual([env.step(actn)[2] for actn in actns[3:]], dones)
+        self.assertEqual([branch.step(actn)[2] for actn in actns[3:]], dones)
+
+    def test_clone(self):
+        env = NumberLine(pixel_density=2)
+        env.seed(1)
+        env.reset(targ_val=3, operator=ADD)
+        env.step(ACTION2IDX[ADD_ONE])
+        branch = env.clone()
+        self.assertIsNot(branch.grid, env.grid)
+        self.assertTrue(np.array_equal(branch.controller.observe(),
+                                       env.grid.grid))
+        for _ in range(2):
+            branch.step(ACTION2IDX[ADD_ONE])
+        obs, rew, done, _ = branch.step(ACTION2IDX[END_GAME])
+        self.assertEqual(rew, 1)
+        self.assertEqual(env.register.fill, 1)
+        self.assertEqual(env.step_count, 1)
+        self.assertTrue(np.array_equal(branch.reset(), env.reset()))
+        self.assertIs(branch.action_space.rng, branch.rng)
+        # Macro action spaces share the generator of the copy as well
+        env.macro_actions = True
+        branch = env.clone()
+        self.assertIs(branch.action_space.spaces[0].rng, branch.rng)
+
+    def test_action_mask(self):
+        env = NumberLine(zoom_range=(0, 0))
+        env.reset()
+        mask = env.get_action_mask()
+        self.assertFalse(mask[ACTION2IDX[ZOOM_IN]])
+        self.assertFalse(mask[ACTION2IDX[ZOOM_OUT]])
+        _, _, _, info = env.step(ACTION2IDX[RIGHT])
+        self.assertEqual(info["action_mask"].tolist(), mask.tolist())
+
+    def test_cycle_truncation(self):
+        env = NumberLine(pixel_density=1, max_repeats=3)
+        env.reset(targ_val=50)
+        actns = [ACTION2IDX[RIGHT], ACTION2IDX[LEFT]]*3
+        for t,actn in enumerate(actns):
+            _, rew, done, info = env.step(actn)
+            self.assertEqual(done, t == len(actns)-1)
+            self.assertEqual(info["cycle"], done)
+        self.assertEqual(rew, -1)
+        # The counts are cleared at reset
+        env.reset(targ_val=50)
+        _, _, done, info = env.step(ACTION2IDX[RIGHT])
+        self.assertFalse(done)
+        # Truncation also applies to step sequences
+        env.reset(targ_val=50)
+        _, rews, dones, _ = env.step_sequence(actns*2)
+        self.assertEqual(len(dones), len(actns))
+        self.assertTrue(dones[-1])
+
+    def test_no_cycle_truncation(self):
+        env = NumberLine(pixel_density=1)
+        env.reset(targ_val=50)
+        for _ in range(5):
+            _, _, done, info = env.step(ACTION2IDX[RIGHT])
+            _, _, done, info = env.step(ACTION2IDX[LEFT])
+        self.assertFalse(done)
+        self.assertFalse(info["cycle"])
+
+    def test_task_stream(self):
+        env = NumberLine(pixel_density=1, task_stream=True, max_repeats=4)
+        oracle = DirectOracle("numberline-v0")
+        env.reset()
+        n_tasks = 0
+        for _ in range(200):
+            _, rew, done, info = env.step(oracle(env))
+            self.assertFalse(done)
+            if info["new_task"]:
+                n_tasks += 1
+                self.assertGreater(env.max_steps, env.step_count)
+        self.assertGreater(n_tasks, 2)
+        self.assertEqual(env.step_count, 200)
 
 if __name__=="__main__":
     kwargs = {
@@ -0,0 +1,115 @@
+from numberline.constants import *
+from numberline.oracles import DirectOracle, RandOracle
+from numberline.evaluate import make_suite, evaluate, run_tasks, summarize
+from numberline.evaluate import play_task
+from numberline.envs import NumberLine
+from numberline.ai import zoom_solution
+import numpy as np
+import tempfile
+import unittest
+
+ENV_KWARGS = {"pixel_density": 1}
+
+class CountingOracle(RandOracle):
+    """
+    Counts the number of calls to detect which tasks were played.
+    """
+    def __init__(self):
+        super().__init__()
+        self.n_calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.n_calls += 1
+        return super().__call__(*args, **kwargs)
+
+class EvaluateTests(unittest.TestCase):
+    def test_suite(self):
+        suite = make_suite((0, 2), (1, 5), {ADD, SUBTRACT})
+        self.assertEqual(len(suite), 3*2*5)
+        self.assertEqual(len(np.unique(suite)), len(suite))
+        sampled = make_suite((0, 2), (1, 50), n_tasks=20, seed=1)
+        self.assertTrue(np.array_equal(
+            sampled,
+            make_suite((0, 2), (1, 50), n_tasks=20, seed=1)
+        ))
+
+    def test_expert(self):
+        suite = make_suite((0, 3), (-30, 30), {ADD, SUBTRACT})
+        summary, results = evaluate(
+            DirectOracle("numberline-v0"),
+            suite,
+            env_kwargs=ENV_KWARGS,
+            n_workers=0,
+        )
+        self.assertEqual(summary["success_rate"], 1)
+        self.assertEqual(summary["optimality_gap"], 0)
+        self.assertEqual(summary["n_tasks"], len(suite))
+        self.assertEqual(sorted(summary["by_magnitude"]), [0, 1])
+        n = sum(s["n_tasks"] for s in summary["by_magnitude"].values())
+        self.assertEqual(n, len(suite))
+        self.assertTrue(np.array_equal(results["task"], suite))
+
+    def test_expert_matches_env_step(self):
+        # The expert is cut short by the cycle detection exactly as a
+        # policy stepping the env is
+        suite = make_suite((0, 2), (-500, 500), n_tasks=20, seed=4)
+        results = run_tasks(
+            suite,
+            lambda env: zoom_solution(env.controller),
+            env_kwargs={"pixel_density": 1, "max_repeats": 1},
+            n_workers=0,
+        )
+        self.assertFalse(np.all(results["success"]))
+        self.assertTrue(np.array_equal(
+            results["n_steps"],
+            results["expert_steps"]
+        ))
+
+    def test_task_stream(self):
+        suite = make_suite((0, 2), (1, 5), {ADD})
+        kwargs = {"pixel_density": 1, "task_stream": True}
+        with self.assertRaises(ValueError):
+            run_tasks(suite, RandOracle(), kwargs, n_workers=0)
+        with self.assertRaises(ValueError):
+            play_task(NumberLine(**kwargs), RandOracle(), suite[0])
+
+    def test_pool_matches_serial(self):
+        suite = make_suite((0, 2), (1, 40), n_tasks=30, seed=2)
+        serial = run_tasks(suite, RandOracle(), ENV_KWARGS, n_workers=0)
+        pooled = run_tasks(
+            suite,
+            RandOracle(),
+            ENV_KWARGS,
+            n_workers=2,
+            chunk_size=7
+        )
+        self.assertTrue(np.array_equal(serial, pooled))
+        summary = summarize(serial)
+        self.assertLessEqual(summary["success_rate"], 1)
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            suite = make_suite((0, 0), (1, 10))
+            oracle = CountingOracle()
+            kwargs = {
+                "env_kwargs": ENV_KWARGS,
+                "policy_id": "rand",
+                "cache_dir": cache_dir,
+                "n_workers": 0,
+            }
+            summary1, results1 = evaluate(oracle, suite, **kwargs)
+            n_calls = oracle.n_calls
+            self.assertGreater(n_calls, 0)
+            summary2, results2 = evaluate(oracle, suite, **kwargs)
+            self.assertEqual(oracle.n_calls, n_calls)
+            self.assertTrue(np.array_equal(results1, results2))
+            self.assertEqual(summary1["suite_hash"], summary2["suite_hash"])
+            # Only the new tasks of a grown suite are played
+            grown = make_suite((0, 0), (1, 12))
+            _, results3 = evaluate(oracle, grown, **kwargs)
+            self.assertGreater(oracle.n_calls, n_calls)
+            rows = np.isin(results3["task"], suite)
+            self.assertTrue(np.array_equal(results3[rows], results1))
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+from numberline.framestack import FrameBuffer, FrameStack
+from numberline.envs import NumberLine
+from numberline.constants import *
+from gym.vector import SyncVectorEnv
+from gym.wrappers.compatibility import EnvCompatibility
+import numpy as np
+import unittest
+
+class FrameStackTests(unittest.TestCase):
+    def test_reset_repeats_frame(self):
+        frames = FrameBuffer(n_frames=4)
+        frames.reset(np.ones((2,3)))
+        stack = frames.stack()
+        self.assertEqual(stack.shape, (4,2,3))
+        self.assertTrue(np.all(stack == 1))
+
+    def test_push_order_and_views(self):
+        frames = FrameBuffer(n_frames=3, capacity=5)
+        frames.reset(np.zeros((1,2)))
+        for i in range(1, 20):
+            frames.push(np.full((1,2), i))
+            stack = frames.stack()
+            self.assertTrue(np.shares_memory(stack, frames.buffer))
+            goal = [max(i-2,0), max(i-1,0), i]
+            self.assertEqual(list(stack[:,0,0]), goal)
+
+    def test_batched_reset(self):
+        frames = FrameBuffer(n_frames=2)
+        frames.reset(np.zeros((3,1,2)))
+        frames.push(np.ones((3,1,2)))
+        frames.reset(np.full((1,1,2), 5), env_idxs=[1])
+        stack = frames.stack(batch_first=True)
+        self.assertEqual(stack.shape, (3,2,1,2))
+        self.assertTrue(np.all(stack[1] == 5))
+        self.assertEqual(list(stack[0,:,0,0]), [0,1])
+
+    def test_numberline_wrapper(self):
+        env = FrameStack(NumberLine(pixel_density=1), n_frames=4)
+        obs = env.reset()
+        self.assertEqual(obs.shape, (4,1,105))
+        obs, rew, done, info = env.step(ACTION2IDX[ADD_ONE])
+        self.assertTrue(np.array_equal(obs[-1], env.grid.grid))
+        self.assertTrue(np.array_equal(obs[0], obs[-2]))
+        self.assertFalse(np.array_equal(obs[-1], obs[-2]))
+
+    def test_single_copy(self):
+        env = FrameStack(NumberLine(pixel_density=1), n_frames=2)
+        env.reset()
+        # The env hands out views, the stack holds the only copy
+        raw, _, _, _ = env.env.step(ACTION2IDX[ADD_ONE])
+        self.assertTrue(np.shares_memory(raw, env.grid._grid))
+        self.assertFalse(raw.flags.writeable)
+        obs, _, _, _ = env.step(ACTION2IDX[ADD_ONE])
+        self.assertFalse(np.shares_memory(obs, env.grid._grid))
+        env.step(ACTION2IDX[ADD_ONE])
+        self.assertFalse(np.array_equal(obs[-1], env.grid.grid))
+
+    def test_vector_env(self):
+        make_env = lambda: EnvCompatibility(NumberLine(pixel_density=1))
+        venv = SyncVectorEnv([make_env for _ in range(3)])
+        env = FrameStack(venv, n_frames=4, n_envs=3)
+        obs, info = env.reset(seed=0)
+        self.assertEqual(obs.shape, (3,4,1,105))
+        actns = np.full(3, ACTION2IDX[ADD_ONE])
+        actns[1] = ACTION2IDX[END_GAME]
+        obs, rew, term, trunc, info = env.step(actns)
+        self.assertEqual(obs.shape, (3,4,1,105))
+        self.assertEqual(list(term), [False, True, False])
+        self.assertEqual(info["action_mask"].shape, (3,7))
+        self.assertEqual(info["action_mask"].dtype, bool)
+        self.assertEqual(list(info["_action_mask"]), [True, False, True])
+        # The stack of the done env starts over from its next episode
+        self.assertTrue(np.all(obs[1] == obs[1,-1]))
+        self.assertFalse(np.array_equal(obs[0,-1], obs[0,-2]))
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import sys
+import argparse
+import subprocess
+import numpy as np
+
+"""
+Measures the time that a fresh interpreter takes to import numberline,
+which is paid by every worker process that is spawned. numpy is
+imported first and timed separately because the core engine cannot
+avoid it, so the budget only applies to the time spent on top of numpy.
+Exits with a non-zero status if the median exceeds the budget.
+
+Usage:
+    $ python tests/import_benchmark.py --n_runs 20 --budget 50
+"""
+
+CHILD = """
+import sys, time
+t0 = time.perf_counter()
+import numpy
+t1 = time.perf_counter()
+import numberline
+t2 = time.perf_counter()
+heavy = [m for m in ("gym", "matplotlib") if m in sys.modules]
+print((t1-t0)*1e3, (t2-t1)*1e3, ",".join(heavy))
+"""
+
+def time_import(module="numberline"):
+    """
+    Imports numpy and then the argued module in a fresh interpreter.
+
+    Args:
+        module: str
+    Returns:
+        numpy_ms: float
+            the time spent importing numpy in milliseconds
+        import_ms: float
+            the time spent importing the module after numpy
+        heavy: list of str
+            the optional dependencies that the import pulled in
+    """
+    code = CHILD.replace("import numberline", "import " + module)
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+    heavy = out[2].split(",") if len(out) > 2 else []
+    return float(out[0]), float(out[1]), heavy
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n_runs", type=int, default=20)
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=50,
+        help="the allowed median import time on top of numpy in ms"
+    )
+    args = parser.parse_args()
+
+    runs = np.asarray([time_import()[:2] for _ in range(args.n_runs)])
+    _, _, heavy = time_import()
+    numpy_ms, import_ms = np.median(runs, axis=0)
+    print("numpy:      {:7.1f} ms".format(numpy_ms))
+    print("numberline: {:7.1f} ms (budget {:.1f} ms)".format(
+        import_ms, args.budget
+    ))
+    if heavy: print("imported optional dependencies:", ", ".join(heavy))
+    if import_ms > args.budget:
+        print("over budget")
+        sys.exit(1)
@@ -0,0 +1,76 @@
+import os
+import sys
+import subprocess
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run(code):
+    """
+    Runs the code in a fresh interpreter from the root of the repo and
+    returns its stdout.
+    """
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip()
+
+# Makes any import of gym or matplotlib fail
+BLOCK = "import sys; sys.modules['gym'] = None; sys.modules['matplotlib'] = None\n"
+
+class ImportTests(unittest.TestCase):
+    def test_lightweight(self):
+        out = run(
+            "import sys, numberline\n"
+            "print(sorted(m for m in ('gym', 'matplotlib') if m in sys.modules))"
+        )
+        self.assertEqual(out, "[]")
+
+    def test_headless_core(self):
+        out = run(BLOCK + (
+            "import numberline\n"
+            "from numberline.constants import *\n"
+            "from numberline.oracles import DirectOracle\n"
+            "contr = numberline.Controller(pixel_density=1)\n"
+            "contr.reset(targ_val=3)\n"
+            "space = numberline.Discrete(len(IDX2ACTION))\n"
+            "batch = numberline.BatchDiscrete(len(IDX2ACTION), 3)\n"
+            "assert space.contains(space.sample())\n"
+            "assert batch.contains(batch.sample())\n"
+            "print(numberline.zoom_solution(contr))"
+        ))
+        self.assertEqual(out, "4")
+
+    def test_meta_path(self):
+        out = run(
+            "import sys\n"
+            "finders = list(sys.meta_path)\n"
+            "import numberline\n"
+            "print(sys.meta_path == finders)"
+        )
+        self.assertEqual(out, "True")
+
+    def test_register(self):
+        for code in [
+            "import gym, numberline\n",
+            "import numberline, gym\nnumberline.NumberLine\n",
+            "import numberline, gym\nnumberline.Discrete\n",
+            "import numberline, gym\nimport numberline.envs\n",
+        ]:
+            out = run(code + "print('numberline-v0' in gym.envs.registry)")
+            self.assertEqual(out.splitlines()[-1], "True")
+
+    def test_make_after_import(self):
+        out = run(
+            "import numberline, gym\n"
+            "numberline.NumberLine\n"
+            "env = gym.make('numberline-v0', pixel_density=1)\n"
+            "print(env.reset().shape)"
+        )
+        self.assertEqual(out.splitlines()[-1], "(1, 105)")
+
+if __name__=="__main__":
+    unittest.main()
@@ -1,6 +1,6 @@
+import gym
 import numberline
 from numberline.constants import *
-import gym
 
 if __name__=="__main__":
     args = {
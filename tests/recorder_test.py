@@ -0,0 +1,100 @@
+from numberline.envs import NumberLine
+from numberline.constants import *
+from numberline.recorder import TrajectoryRecorder, Shard, list_shards
+from numberline.registry import RECORD_OVERFLOW
+import numberline.batch as batch
+import numpy as np
+import tempfile
+import unittest
+
+def record(directory, n_episodes, shard_size, record_colors=False):
+    env = NumberLine(pixel_density=2, targ_range=(1, 5))
+    rec = TrajectoryRecorder(
+        env,
+        directory,
+        shard_size=shard_size,
+        record_colors=record_colors,
+        color_dtype=np.float64,
+    )
+    rng = np.random.default_rng(0)
+    episodes = []
+    for seed in range(n_episodes):
+        obs = rec.reset(seed=seed)
+        actns, frames = [], []
+        done = False
+        while not done:
+            actn = int(rng.integers(0, len(IDX2ACTION)))
+            obs, rew, done, _ = rec.step(actn)
+            actns.append(actn)
+            frames.append(obs)
+        episodes.append((actns, frames))
+    rec.close()
+    return episodes
+
+class TrajectoryRecorderTests(unittest.TestCase):
+    def test_episodes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            episodes = record(directory, 20, shard_size=64)
+            paths = list_shards(directory)
+            self.assertGreater(len(paths), 1)
+            shards = [Shard(path) for path in paths]
+            recorded = [
+                shard.get_episode(i)
+                for shard in shards for i in range(len(shard))
+            ]
+            self.assertEqual(len(recorded), len(episodes))
+            for (actns, _), ep in zip(episodes, recorded):
+                self.assertEqual(ep["actions"].tolist(), actns)
+                self.assertEqual(ep["length"], len(actns))
+                self.assertTrue(ep["dones"][-1])
+                self.assertFalse(np.any(ep["dones"][:-1]))
+            self.assertEqual(recorded[3]["seed"], 3)
+            del shards, recorded
+
+    def test_colors(self):
+        with tempfile.TemporaryDirectory() as directory:
+            episodes = record(directory, 3, 1024, record_colors=True)
+            shard = Shard(list_shards(directory)[0])
+            for i,(_, frames) in enumerate(episodes):
+                ep = shard.get_episode(i)
+                decoded = batch.colors2frames(ep["colors"], 2)
+                self.assertTrue(np.array_equal(decoded, np.asarray(frames)))
+                rendered = batch.render_states(ep["states"], 2)
+                self.assertTrue(np.array_equal(rendered, decoded))
+            del shard
+
+    def test_episode_too_long(self):
+        with tempfile.TemporaryDirectory() as directory:
+            env = NumberLine(targ_range=(1, 5))
+            rec = TrajectoryRecorder(env, directory, shard_size=4)
+            rec.reset()
+            with self.assertRaises(ValueError):
+                for _ in range(5): rec.step(ACTION2IDX[RIGHT])
+
+    def test_macro_actions(self):
+        with tempfile.TemporaryDirectory() as directory:
+            env = NumberLine(targ_range=(1, 5), macro_actions=True)
+            with self.assertRaises(ValueError):
+                TrajectoryRecorder(env, directory)
+            env = NumberLine(targ_range=(1, 5))
+            rec = TrajectoryRecorder(env, directory)
+            env.macro_actions = True
+            with self.assertRaises(ValueError): rec.reset()
+
+    def test_deep_zoom(self):
+        with tempfile.TemporaryDirectory() as directory:
+            env = NumberLine(targ_range=(1, 5))
+            rec = TrajectoryRecorder(env, directory)
+            rec.reset()
+            env.max_steps = 100
+            actns = [RIGHT] + [ZOOM_IN]*25
+            for actn in actns: rec.step(ACTION2IDX[actn])
+            rec.close()
+            shard = Shard(list_shards(directory)[0])
+            self.assertEqual(shard.n_transitions, len(actns))
+            self.assertNotEqual(shard.states["trans"][1], RECORD_OVERFLOW)
+            self.assertEqual(shard.states["trans"][-1], RECORD_OVERFLOW)
+            del shard
+
+if __name__=="__main__":
+    unittest.main()
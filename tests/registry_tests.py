@@ -1,5 +1,5 @@
 from numberline.grid import Grid
-from numberline.registry import Register
+from numberline.registry import Register, floor_log10, trunc_log10
 from numberline.constants import *
 import numpy as np
 import matplotlib.pyplot as plt
@@ -163,6 +163,92 @@ class RegisterTests(unittest.TestCase):
         self.assertEqual(g[11*density:].sum(), 0)
 
 
+    def test_get_set_state(self):
+        grid = Grid(3)
+        reg = Register(grid)
+        reg.add_fill(12)
+        reg.translate(4)
+        reg.operator = SUBTRACT
+        reg.draw_register()
+        state = reg.get_state()
+        goal = grid.grid
+        reg.zoom_in()
+        reg.add_fill(-3)
+        reg.draw_register()
+        reg.set_state(state)
+        self.assertTrue(reg.needs_draw)
+        reg.refresh()
+        self.assertTrue(np.array_equal(grid.grid, goal))
+
+    def test_clone(self):
+        grid = Grid(3)
+        reg = Register(grid)
+        reg.add_fill(12)
+        reg.draw_register()
+        clone = reg.clone()
+        clone.add_fill(5)
+        clone.refresh()
+        self.assertEqual(reg.fill, 12)
+        self.assertEqual(clone.fill, 17)
+        self.assertFalse(np.array_equal(grid.grid, clone.grid.grid))
+
+    def test_exact_fill(self):
+        grid = Grid(1)
+        reg = Register(grid)
+        reg.zoom_in()
+        for _ in range(3): reg.add_fill(1)
+        self.assertEqual(reg.fill, 0.3)
+        self.assertTrue(reg.fill_equals(0.3))
+        reg.zoom_in()
+        reg.add_fill(7)
+        self.assertTrue(reg.fill_equals(0.37))
+        self.assertEqual(reg.get_fill_units(), 37)
+        for _ in range(7): reg.add_fill(-1)
+        self.assertEqual(reg.fill, 0.3)
+        reg.zoom_out()
+        reg.zoom_out()
+        reg.add_fill(2)
+        self.assertEqual(reg.fill, 2.3)
+        reg.add_fill(-3)
+        self.assertEqual(reg.fill, -0.7)
+        self.assertEqual(reg.get_fill_units(), 0)
+
+    def test_zoom_out_large_trans(self):
+        grid = Grid(1)
+        reg = Register(grid)
+        reg.trans = -(10**20 + 7)
+        reg.zoom_out()
+        self.assertEqual(reg.trans, -10**19)
+
+    def test_trunc_log10(self):
+        for n in [1, 9, 10, 99, 100, 10**22-1, 10**22, 10**400+3]:
+            self.assertEqual(floor_log10(n), len(str(n))-1)
+        self.assertEqual(trunc_log10(10, -1), 0)
+        self.assertEqual(trunc_log10(20, -2), 0)
+        self.assertEqual(trunc_log10(100, -3), -1)
+        self.assertEqual(trunc_log10(150, -4), -1)
+        self.assertEqual(trunc_log10(10**23, 0), 23)
+
+    def test_deep_zoom(self):
+        grid = Grid(1)
+        reg = Register(grid)
+        for zoom in [-300, 300]:
+            reg.reset()
+            while reg.zoom != zoom:
+                reg.trans += 3
+                if zoom < 0: reg.zoom_in()
+                else: reg.zoom_out()
+            reg.trans = 10**400 + 2
+            reg.add_fill(1)
+            reg.draw_register()
+            cols, colors = reg.get_markers()
+            # dist of col 48 is 10**400
+            self.assertIn(48, cols)
+            color = colors[cols.index(48)]
+            log10 = 400 + zoom
+            self.assertEqual(color, log10*COLORS[MARKER]+COLORS[MARKER_BASE])
+            self.assertTrue(np.all(np.isfinite(grid.grid)))
+
 
 if __name__ == "__main__":
     unittest.main()
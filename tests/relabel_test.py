@@ -0,0 +1,157 @@
+from numberline.envs import NumberLine
+from numberline.grid import Grid
+from numberline.constants import *
+from numberline.recorder import TrajectoryRecorder, Shard, list_shards
+from numberline.relabel import relabel_shards, relabel_frames, get_operands
+from numberline.relabel import relabel_episodes
+from numberline.registry import RECORD_OVERFLOW
+import numberline.batch as batch
+import numpy as np
+import tempfile
+import unittest
+
+def record(directory, n_episodes):
+    env = NumberLine(
+        pixel_density=2,
+        targ_range=(1, 5),
+        init_range=(0, 3),
+        operators={ADD, SUBTRACT, MULTIPLY, DIVIDE},
+    )
+    rec = TrajectoryRecorder(
+        env,
+        directory,
+        shard_size=1024,
+        record_colors=True,
+        color_dtype=np.float64,
+    )
+    rng = np.random.default_rng(0)
+    for seed in range(n_episodes):
+        rec.reset(seed=seed)
+        done = False
+        while not done:
+            actn = int(rng.integers(0, len(IDX2ACTION)))
+            _, _, done, _ = rec.step(actn)
+    rec.close()
+
+class RelabelTests(unittest.TestCase):
+    def test_operands_match_reset(self):
+        env = NumberLine(init_range=(0, 4), targ_range=(-6, 6))
+        contr = env.controller
+        for operator in OPERATORS:
+            for init_val in range(0, 5):
+                for targ_val in range(-6, 7):
+                    contr.reset(
+                        targ_val=targ_val,
+                        operator=operator,
+                        init_val=init_val
+                    )
+                    operators, operands = get_operands(
+                        [OPERATOR2IDX[operator]],
+                        batch.val2fill([init_val]),
+                        batch.val2fill([targ_val]),
+                    )
+                    self.assertEqual(
+                        IDX2OPERATOR[int(operators[0])],
+                        contr.operator
+                    )
+                    self.assertEqual(operands[0], contr.operand)
+
+    def test_relabel_shards(self):
+        with tempfile.TemporaryDirectory() as directory:
+            src = directory + "/src"
+            dst = directory + "/dst"
+            record(src, 20)
+            n = relabel_shards(src, dst, operators=[ADD, MULTIPLY])
+            self.assertEqual(n, 40)
+            source = Shard(list_shards(src)[0])
+            grid = Grid(pixel_density=2)
+            for op in [ADD, MULTIPLY]:
+                paths = list_shards(dst + "/" + op)
+                self.assertEqual(len(paths), 1)
+                shard = Shard(paths[0])
+                self.assertEqual(shard.n_transitions, source.n_transitions)
+                # The relabeled colors are exactly those of the
+                # relabeled states
+                colors = batch.get_unit_colors(shard.states, grid)
+                self.assertTrue(np.array_equal(colors, shard.colors))
+                # Only the meta units changed
+                metas = [grid.operator_idx, grid.operand_idx]
+                same = np.ones(shard.colors.shape[1], dtype=bool)
+                same[metas] = False
+                self.assertTrue(np.array_equal(
+                    shard.colors[:,same],
+                    source.colors[:,same]
+                ))
+                self.assertTrue(np.array_equal(
+                    shard.states["fill"],
+                    source.states["fill"]
+                ))
+                for i in range(len(shard)):
+                    ep = shard.get_episode(i)
+                    fill = ep["states"]["fill"][-1]
+                    self.assertEqual(batch.val2fill(ep["targ_val"]), fill)
+                    if ep["actions"][-1] == ACTION2IDX[END_GAME]:
+                        self.assertEqual(ep["rews"][-1], 1)
+                del shard
+            del source
+
+    def test_unlabeled(self):
+        with tempfile.TemporaryDirectory() as directory:
+            env = NumberLine(pixel_density=2, targ_range=(1, 5))
+            rec = TrajectoryRecorder(env, directory, record_colors=True)
+            rec.reset(targ_val=3, operator=ADD)
+            for actn in [ADD_ONE, ADD_ONE, END_GAME]:
+                rec.step(ACTION2IDX[actn])
+            # The fill of this episode leaves the range of the records
+            rec.reset(targ_val=3, operator=ADD)
+            env.max_steps = 100
+            for actn in [ZOOM_OUT]*14 + [ADD_ONE]:
+                rec.step(ACTION2IDX[actn])
+            rec.end_episode()
+            # Transitions that are not within an indexed episode
+            for actn in [ADD_ONE, ADD_ONE]:
+                env.step(ACTION2IDX[actn])
+                rec.add_transition(ACTION2IDX[actn], 0, False)
+            rec.close()
+            shard = Shard(list_shards(directory)[0])
+            columns = {
+                "actions": shard.actions,
+                "rews": shard.rews,
+                "dones": shard.dones,
+                "states": shard.states,
+                "colors": shard.colors,
+            }
+            self.assertEqual(len(shard), 2)
+            self.assertEqual(shard.n_transitions, 20)
+            self.assertEqual(shard.states["fill"][17], RECORD_OVERFLOW)
+            relabeled, episodes = relabel_episodes(
+                columns,
+                shard.episodes,
+                operators=OPERATOR2IDX[SUBTRACT],
+            )
+            subtract = OPERATOR2IDX[SUBTRACT]
+            self.assertEqual(episodes["init_state"]["operator"][0], subtract)
+            self.assertEqual(episodes["targ_val"][0], 2)
+            self.assertTrue(np.all(
+                relabeled["states"]["operator"][:3] == subtract
+            ))
+            for name, column in relabeled.items():
+                self.assertTrue(np.array_equal(column[3:], columns[name][3:]))
+            self.assertEqual(episodes[1], shard.episodes[1])
+            del shard, columns
+
+    def test_relabel_frames(self):
+        env = NumberLine(pixel_density=3)
+        obs = env.reset(targ_val=4, operator=ADD)
+        frames = obs[None].copy()
+        operators, operands = get_operands(
+            [OPERATOR2IDX[SUBTRACT]],
+            batch.val2fill([0]),
+            batch.val2fill([7]),
+        )
+        relabel_frames(frames, operators, operands, pixel_density=3)
+        obs = env.reset(targ_val=7, operator=SUBTRACT)
+        self.assertTrue(np.array_equal(frames[0], obs))
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+from numberline.envs import NumberLine
+from numberline.constants import *
+from numberline.replay import ReplayBuffer
+import numpy as np
+import unittest
+
+def fill_buffer(buf, n_steps, seed=0):
+    """
+    Steps a random policy, adding each transition to the buffer.
+    Returns the frame and episode step of every added transition, and
+    the frame following it.
+    """
+    env = NumberLine(pixel_density=buf.pixel_density, targ_range=(1, 9))
+    rng = np.random.default_rng(seed)
+    frames, steps, next_frames = [], [], []
+    obs = env.reset()
+    t = 0
+    for _ in range(n_steps):
+        state = env.controller.register.get_record()
+        actn = int(rng.integers(0, len(IDX2ACTION)))
+        next_obs, rew, done, _ = env.step(actn)
+        buf.add(state, actn, rew, done)
+        frames.append(obs)
+        steps.append(t)
+        next_frames.append(next_obs)
+        obs, t = next_obs, t+1
+        if done: obs, t = env.reset(), 0
+    return frames, steps, next_frames
+
+class ReplayBufferTests(unittest.TestCase):
+    def check_samples(self, buf, frames, steps, next_frames):
+        n = len(frames)
+        k = buf.n_frames
+        sample = buf.sample(64)
+        for b, idx in enumerate(sample["idxs"]):
+            # Position of the transition in the full history
+            pos = n - len(buf) + (idx - buf.head) % buf.capacity
+            if len(buf) < buf.capacity: pos = idx
+            oldest = n - len(buf)
+            stack = []
+            for j in range(k-1, -1, -1):
+                back = min(j, steps[pos], pos - oldest)
+                stack.append(frames[pos-back])
+            obs = sample["obs"][b]
+            if k == 1: obs = obs[None]
+            self.assertTrue(np.array_equal(obs, np.asarray(stack)))
+            if not sample["dones"][b]:
+                next_obs = sample["next_obs"][b]
+                if k == 1: next_obs = next_obs[None]
+                self.assertTrue(np.array_equal(next_obs[-1], next_frames[pos]))
+
+    def test_single_frames(self):
+        buf = ReplayBuffer(100, pixel_density=2, rng=np.random.default_rng(0))
+        history = fill_buffer(buf, 60)
+        self.assertEqual(len(buf), 60)
+        self.check_samples(buf, *history)
+
+    def test_stacks_after_wrap(self):
+        buf = ReplayBuffer(
+            50,
+            pixel_density=2,
+            n_frames=4,
+            rng=np.random.default_rng(1),
+        )
+        history = fill_buffer(buf, 137)
+        self.assertEqual(len(buf), 50)
+        self.assertEqual(buf.sample(8)["obs"].shape, (8, 4, 2, 210))
+        for _ in range(5): self.check_samples(buf, *history)
+
+    def test_rejects(self):
+        buf = ReplayBuffer(10)
+        env = NumberLine(targ_range=(1, 5), macro_actions=True)
+        env.reset()
+        state = env.controller.register.get_record()
+        with self.assertRaises(ValueError):
+            buf.add(state, (MACRO2IDX[ADD_UNITS], 2), 0, False)
+        with self.assertRaises(ValueError):
+            buf.add(state, MACRO2IDX[TRANSLATE_TO_FILL], 0, False)
+        for actn in [RIGHT]+[ZOOM_IN]*25: env.step(ACTION2IDX[actn])
+        state = env.controller.register.get_record(saturate=True)
+        with self.assertRaises(ValueError):
+            buf.add(state, ACTION2IDX[ZOOM_IN], 0, False)
+        self.assertEqual(len(buf), 0)
+
+    def test_nbytes(self):
+        buf = ReplayBuffer(1000)
+        self.assertLessEqual(buf.nbytes, 1000*41)
+
+if __name__=="__main__":
+    unittest.main()
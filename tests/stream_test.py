@@ -0,0 +1,71 @@
+from numberline.envs import NumberLine
+from numberline.constants import *
+from numberline.oracles import DirectOracle
+from numberline.stream import numberline_stream
+import numpy as np
+import unittest
+
+CONFIG = {"pixel_density": 2, "targ_range": (-20, 20)}
+
+def rollout(n_steps, seed):
+    """
+    Steps the expert sequentially in the same way as the stream with a
+    single env.
+    """
+    env = NumberLine(**CONFIG)
+    env.seed(int(np.random.SeedSequence(seed).generate_state(1)[0]))
+    policy = DirectOracle("numberline-v0")
+    obs = env.reset()
+    transitions = []
+    for _ in range(n_steps):
+        actn = policy(env)
+        next_obs, rew, done, _ = env.step(actn)
+        transitions.append((obs, actn, rew, done, next_obs))
+        obs = env.reset() if done else next_obs
+    return transitions
+
+class StreamTests(unittest.TestCase):
+    def check_stream(self, backend):
+        batch_size, n_batches = 16, 5
+        expected = rollout(batch_size*n_batches, seed=3)
+        stream = numberline_stream(
+            CONFIG,
+            batch_size=batch_size,
+            backend=backend,
+            seed=3,
+            n_batches=n_batches,
+            prefetch=2,
+        )
+        t = 0
+        for batch in stream:
+            self.assertEqual(len(batch["actions"]), batch_size)
+            for b in range(batch_size):
+                obs, actn, rew, done, next_obs = expected[t]
+                self.assertTrue(np.array_equal(batch["obs"][b], obs))
+                self.assertEqual(batch["actions"][b], actn)
+                self.assertEqual(batch["rews"][b], rew)
+                self.assertEqual(batch["dones"][b], done)
+                self.assertTrue(np.array_equal(batch["next_obs"][b], next_obs))
+                t += 1
+        self.assertEqual(t, batch_size*n_batches)
+
+    def test_thread(self):
+        self.check_stream("thread")
+
+    def test_process(self):
+        self.check_stream("process")
+
+    def test_close_early(self):
+        stream = numberline_stream(CONFIG, batch_size=4, n_envs=3)
+        for i,batch in enumerate(stream):
+            if i == 2: break
+        stream.close()
+
+    def test_error(self):
+        def policy(env): raise ValueError("bad policy")
+        stream = numberline_stream(CONFIG, batch_size=4, policy=policy)
+        with self.assertRaises(RuntimeError):
+            next(stream)
+
+if __name__=="__main__":
+    unittest.main()
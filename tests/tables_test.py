@@ -0,0 +1,80 @@
+from numberline.controllers import Controller
+from numberline.constants import *
+from numberline.tables import compile_table
+from numberline.tables import TransitionTable
+import numpy as np
+import tempfile
+import unittest
+
+class TransitionTableTests(unittest.TestCase):
+    def setUp(self):
+        self.contr = Controller(
+            pixel_density=1,
+            init_range=(1, 3),
+            targ_range=(1, 10),
+            zoom_range=(-1, 1),
+            scroll_range=(-5, 15),
+        )
+        self.table = compile_table(self.contr)
+
+    def test_matches_controller(self):
+        table = self.table
+        contr = self.contr
+        contr.targ_val = 0
+        min_fill, max_fill = table.fill_range
+        rng = np.random.default_rng(0)
+        for i in rng.choice(table.n_states, size=300, replace=False):
+            state = table.states[i]
+            for a in range(len(IDX2ACTION)):
+                contr.register.set_record(state)
+                contr.apply_action(a)
+                fill = contr.register.fill
+                if not min_fill <= fill <= max_fill:
+                    contr.register.set_record(state)
+                idx = table.index(contr.register.get_record())
+                self.assertEqual(table.next_idxs[i, a], idx)
+
+    def test_rollout(self):
+        table = self.table
+        contr = self.contr
+        contr.reset(targ_val=7, operator=ADD, init_val=1)
+        idx = table.index(contr.register.get_record())
+        rng = np.random.default_rng(0)
+        actns = list(rng.integers(0, len(IDX2ACTION)-1, size=200))
+        for actn in actns + [ACTION2IDX[END_GAME]]:
+            record = contr.register.get_record()
+            rew, done, _ = contr.apply_action(actn)
+            # The table bounds the fill to the span of the targ_range
+            if not 1 <= contr.register.fill <= 10:
+                contr.register.set_record(record)
+            idxs, rews, dones = table.step([idx], [actn], [7])
+            idx = idxs[0]
+            self.assertEqual(idx, table.index(contr.register.get_record()))
+            self.assertEqual(rews[0], rew)
+            self.assertEqual(dones[0], done)
+
+    def test_reward_table(self):
+        rews = self.table.get_reward_table(7)
+        end = ACTION2IDX[END_GAME]
+        fills = self.table.states["fill"]*10.0**FILL_EXP
+        self.assertTrue(np.array_equal(rews[:, end] == 1, fills == 7))
+        self.assertEqual(np.abs(rews).sum(), self.table.n_states)
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.table.save(directory)
+            table = TransitionTable.load(directory)
+            self.assertTrue(np.array_equal(table.states, self.table.states))
+            self.assertTrue(np.array_equal(
+                table.next_idxs, self.table.next_idxs
+            ))
+            state = self.table.states[17]
+            self.assertEqual(table.index(state), 17)
+            del table
+
+    def test_unknown_state(self):
+        with self.assertRaises(KeyError):
+            self.table.index((10**12, 0, 0, 0, 0))
+
+if __name__=="__main__":
+    unittest.main()
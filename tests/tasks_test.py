@@ -0,0 +1,113 @@
+from numberline.constants import *
+from numberline.controllers import Controller
+from numberline.envs import NumberLine
+from numberline.tasks import TaskSampler, FactorTable
+from numberline.utils import get_magnitude_counts
+import numpy as np
+import unittest
+
+class TaskSamplerTests(unittest.TestCase):
+    def test_factor_table(self):
+        table = FactorTable((-4, 4), (-20, 20))
+        self.assertTrue(np.all(table.inits != 0))
+        self.assertTrue(np.all(table.targs % table.inits == 0))
+        self.assertTrue(np.all(np.abs(table.targs) <= 20))
+        # Every exact pair is in the table
+        n_pairs = sum(
+            1 for i in range(-4, 5) for t in range(-20, 21)
+            if i != 0 and t % i == 0
+        )
+        self.assertEqual(len(table), n_pairs)
+
+    def test_exact_operands(self):
+        sampler = TaskSampler(
+            init_range=(-9, 9),
+            targ_range=(-500, 500),
+            operators=OPERATORS,
+        )
+        tasks = sampler.sample(10000, np.random.default_rng(0))
+        self.assertEqual(
+            set(tasks["operator"].tolist()),
+            set(OPERATOR2IDX[op] for op in OPERATORS)
+        )
+        self.assertTrue(np.all(tasks["init_val"] >= -9))
+        self.assertTrue(np.all(tasks["targ_val"] <= 500))
+        mul = tasks[tasks["operator"] == OPERATOR2IDX[MULTIPLY]]
+        self.assertTrue(np.all(mul["init_val"] != 0))
+        self.assertTrue(np.array_equal(
+            mul["init_val"]*mul["operand"],
+            mul["targ_val"]
+        ))
+        div = tasks[tasks["operator"] == OPERATOR2IDX[DIVIDE]]
+        self.assertTrue(np.all(div["init_val"] != 0))
+
+    def test_matches_controller(self):
+        sampler = TaskSampler((1, 6), (1, 60), {MULTIPLY, DIVIDE})
+        contr = Controller(init_range=(1, 6), targ_range=(1, 60))
+        for task in sampler.sample(50, np.random.default_rng(1)):
+            contr.reset(
+                targ_val=int(task["targ_val"]),
+                operator=IDX2OPERATOR[int(task["operator"])],
+                init_val=int(task["init_val"]),
+            )
+            self.assertEqual(contr.operand, task["operand"])
+            self.assertIsInstance(contr.operand, int)
+
+    def test_invalid_ranges(self):
+        with self.assertRaises(ValueError):
+            TaskSampler((0, 0), (1, 10), {MULTIPLY})
+        with self.assertRaises(ValueError):
+            TaskSampler((0, 0), (1, 10), {DIVIDE})
+
+    def test_env(self):
+        env = NumberLine(
+            pixel_density=1,
+            init_range=(1, 12),
+            targ_range=(1, 144),
+            operators={MULTIPLY},
+            exact_tasks=True,
+        )
+        for _ in range(30):
+            env.reset()
+            contr = env.controller
+            self.assertEqual(contr.operator, MULTIPLY)
+            self.assertEqual(contr.targ_val % contr.register.fill, 0)
+            counts = get_magnitude_counts(contr.operand)
+            self.assertTrue(all(mag >= 0 for mag in counts))
+
+    def test_sample_next(self):
+        sampler = TaskSampler((1, 6), (1, 60), {MULTIPLY, DIVIDE})
+        rng = np.random.default_rng(2)
+        for _ in range(50):
+            operator, targ_val = sampler.sample_next(7, rng)
+            if operator == MULTIPLY: self.assertEqual(targ_val % 7, 0)
+        # No exact MULTIPLY or DIVIDE task starts from 0
+        self.assertEqual(sampler.sample_next(0, rng)[0], ADD)
+        sampler = TaskSampler((1, 6), (1, 60), OPERATORS)
+        for _ in range(20):
+            operator, _ = sampler.sample_next(0, rng)
+            self.assertIn(operator, {ADD, SUBTRACT})
+
+    def test_task_stream(self):
+        env = NumberLine(
+            pixel_density=1,
+            init_range=(1, 12),
+            targ_range=(1, 144),
+            operators={MULTIPLY, DIVIDE},
+            task_stream=True,
+            exact_tasks=True,
+        )
+        env.seed(3)
+        env.reset()
+        contr = env.controller
+        for _ in range(30):
+            contr.register.fill = contr.targ_val
+            env.step(ACTION2IDX[END_GAME])
+            self.assertTrue(contr.new_task)
+            self.assertIn(contr.operator, {MULTIPLY, DIVIDE})
+            self.assertIsInstance(contr.operand, int)
+            if contr.operator == MULTIPLY:
+                self.assertEqual(contr.targ_val % contr.register.fill, 0)
+
+if __name__=="__main__":
+    unittest.main()
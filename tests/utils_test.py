@@ -1,6 +1,15 @@
 import numberline.utils as utils
+from numberline.constants import *
+import numpy as np
 import unittest
 
+class Obj:
+    def __init__(self, coord):
+        self.coord = coord
+
+def make_objs(rng, n, high=6):
+    return [Obj(tuple(c)) for c in rng.integers(0, high, size=(n, 2)).tolist()]
+
 class UtilsTests(unittest.TestCase):
     def test_get_magnitude_counts(self):
         vals = [1, -1, 2, 123, 123.45, 0.1708, -69.001]
@@ -20,6 +29,128 @@ class UtilsTests(unittest.TestCase):
             for k in counts.keys():
                 self.assertEqual(soln[k], counts[k])
 
+    def test_get_multiples(self):
+        for val in [1, 3, -3, 7]:
+            for low, high in [(-20, 20), (1, 100), (5, 6), (-9, -2)]:
+                goal = [x for x in range(low, high+1) if x % val == 0]
+                multiples = utils.get_multiples(val, low, high)
+                self.assertEqual(multiples.tolist(), goal)
+
+    def test_get_operands(self):
+        for operator in OPERATORS:
+            for init_val in range(-3, 4):
+                for targ_val in [-12, -1, 0, 5, 12]:
+                    op, operand = utils.get_operand(
+                        operator,
+                        init_val,
+                        targ_val
+                    )
+                    if init_val == 0 and operator in {MULTIPLY, DIVIDE}:
+                        self.assertEqual(op, ADD)
+                    ops, operands = utils.get_operands(
+                        [OPERATOR2IDX[operator]],
+                        [init_val],
+                        [targ_val]
+                    )
+                    self.assertEqual(ops[0], OPERATOR2IDX[op])
+                    self.assertEqual(operands[0], operand)
+        self.assertEqual(utils.get_operand(MULTIPLY, 3, 12), (MULTIPLY, 4))
+        self.assertIsInstance(utils.get_operand(MULTIPLY, 3, 12)[1], int)
+
+    def test_get_multiples_pairs(self):
+        self.assertEqual(
+            utils.get_multiples_pairs(36),
+            [(1, 36), (2, 18), (3, 12), (4, 9), (6, 6)]
+        )
+        self.assertEqual(utils.get_multiples_pairs(7), [(1, 7)])
+        self.assertIsNone(utils.get_multiples_pairs(0))
+
+    def test_decompose(self):
+        self.assertEqual(utils.decompose(7, [1, 4, 10]), {10: 0, 4: 1, 1: 3})
+        # The greedy decomposition would be one 10 and four 1s
+        self.assertEqual(utils.decompose(14, [1, 7, 10]), {10: 0, 7: 2, 1: 0})
+        # Unreachable values keep a remainder
+        self.assertEqual(utils.decompose(7, [3, 5]), {5: 1, 3: 0})
+        self.assertEqual(utils.decompose(-3, [1, 2]), {2: 0, 1: 0})
+
+    def test_decompose_batch_is_optimal(self):
+        rng = np.random.default_rng(0)
+        for _ in range(20):
+            atoms = rng.choice(np.arange(1, 25), 3, replace=False).tolist()
+            vals = rng.integers(0, 1500, size=40)
+            # Fewest atoms of every value by brute force
+            fewest = np.full(vals.max()+1, np.inf)
+            fewest[0] = 0
+            for v in range(1, len(fewest)):
+                for atom in atoms:
+                    if atom <= v:
+                        fewest[v] = min(fewest[v], fewest[v-atom]+1)
+            counts = utils.decompose_batch(vals, atoms)
+            for val, row in zip(vals, counts):
+                if np.isinf(fewest[val]): continue
+                self.assertEqual(np.dot(row, atoms), val)
+                self.assertEqual(row.sum(), fewest[val])
+                d = utils.decompose(int(val), atoms)
+                self.assertEqual([d[atom] for atom in atoms], row.tolist())
+
+    def test_row_and_col_counts(self):
+        rng = np.random.default_rng(1)
+        objs = make_objs(rng, 50)
+        rows, cols = utils.get_row_and_col_counts(objs)
+        for i,d in enumerate([rows, cols]):
+            vals = [obj.coord[i] for obj in objs]
+            self.assertEqual(d, {v: vals.count(v) for v in set(vals)})
+        coords = [obj.coord for obj in objs]
+        counts = utils.get_coord_counts(objs)
+        self.assertEqual(dict(counts), {c: coords.count(c) for c in coords})
+        self.assertEqual(utils.get_row_and_col_counts([]), (dict(), dict()))
+
+    def test_majority_row(self):
+        coords = np.asarray([[0, 1], [3, 0], [3, 2], [1, 1], [1, 5], [0, 0]])
+        self.assertEqual(utils.get_majority_row(coords), 0)
+        self.assertEqual(utils.get_majority_row(coords, min_row=1), 1)
+        self.assertEqual(utils.get_majority_row(coords, 2, True), (3, 2))
+        self.assertEqual(utils.get_majority_row(coords, 4, True), (None, 0))
+
+    def test_unaligned_items(self):
+        rng = np.random.default_rng(2)
+        for _ in range(30):
+            items = set(make_objs(rng, rng.integers(0, 20)))
+            targs = set(make_objs(rng, rng.integers(0, 5)))
+            max_row = utils.get_max_row(items, min_row=2)
+            targ_cols = {targ.coord[1] for targ in targs}
+            loners = utils.get_unaligned_items(items, targs, min_row=2)
+            aligned = items - loners
+            for item in loners:
+                if item.coord[1] in targ_cols and item.coord[0] == max_row:
+                    # Only duplicates of an aligned item are loners
+                    self.assertIn(
+                        item.coord,
+                        {obj.coord for obj in aligned}
+                    )
+            for item in aligned:
+                self.assertIn(item.coord[1], targ_cols)
+                self.assertEqual(item.coord[0], max_row)
+            aligned_coords = [obj.coord for obj in aligned]
+            self.assertEqual(len(aligned_coords), len(set(aligned_coords)))
+
+    def test_nearest_obj(self):
+        rng = np.random.default_rng(3)
+        objs = make_objs(rng, 40, high=100)
+        ref = Obj((50, 50))
+        nearest = utils.nearest_obj(ref, objs)
+        dists = [utils.euc_distance(ref.coord, obj.coord) for obj in objs]
+        self.assertEqual(nearest, objs[int(np.argmin(dists))])
+        self.assertIsNone(utils.nearest_obj(ref, set()))
+
+    def test_copy_rng(self):
+        rng = np.random.default_rng(7)
+        rng.integers(10, size=5)
+        copy = utils.copy_rng(rng)
+        goal = rng.integers(1000, size=20)
+        self.assertTrue(np.array_equal(copy.integers(1000, size=20), goal))
+        self.assertIsNot(copy.bit_generator, rng.bit_generator)
+
 
 if __name__=="__main__":
     unittest.main()
@@ -0,0 +1,58 @@
+import time
+import numpy as np
+from numberline.controllers import Controller
+from numberline.constants import *
+
+"""
+Measures the latency of Controller.step at zoom levels from -50 to 50.
+At each level the translation is moved away from the zero point
+before zooming so that the coordinates grow with the zoom depth.
+
+Usage:
+    $ python tests/zoom_benchmark.py
+"""
+
+def go_to_zoom(contr, zoom):
+    """
+    Resets the controller and steps it to the argued zoom level,
+    stepping right at every level along the way.
+
+    Args:
+        contr: Controller
+        zoom: int
+    """
+    contr.reset()
+    zoom_actn = ZOOM_IN if zoom < contr.register.zoom else ZOOM_OUT
+    while contr.register.zoom != zoom:
+        contr.step(ACTION2IDX[RIGHT])
+        contr.step(ACTION2IDX[zoom_actn])
+
+def time_steps(contr, n_steps, rng):
+    """
+    Returns the mean latency in microseconds of n_steps random steps
+    that do not change the zoom level.
+
+    Args:
+        contr: Controller
+        n_steps: int
+        rng: numpy Generator
+    Returns:
+        latency: float
+    """
+    actns = [ACTION2IDX[a] for a in (LEFT, RIGHT, ADD_ONE, SUBTRACT_ONE)]
+    actns = rng.choice(actns, size=n_steps)
+    start_t = time.perf_counter()
+    for actn in actns:
+        contr.step(actn)
+    return (time.perf_counter()-start_t)/n_steps*1e6
+
+if __name__=="__main__":
+    n_steps = 1000
+    rng = np.random.default_rng(0)
+    contr = Controller(pixel_density=5)
+    print("zoom   trans digits   step latency (us)")
+    for zoom in range(-50, 51, 10):
+        go_to_zoom(contr, zoom)
+        latency = time_steps(contr, n_steps, rng)
+        digits = len(str(abs(contr.register.trans)))
+        print("{:4d}   {:12d}   {:17.1f}".format(zoom, digits, latency))